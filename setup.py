@@ -67,7 +67,8 @@ setup(
     entry_points={
         'console_scripts': [
             'lewis=lewis.scripts.run:run_simulation',
-            'lewis-control=lewis.scripts.control:control_simulation'
+            'lewis-control=lewis.scripts.control:control_simulation',
+            'lewis-fleet=lewis.scripts.fleet:run_fleet'
         ],
     },
 )
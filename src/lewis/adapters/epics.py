@@ -17,16 +17,18 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 # *********************************************************************
 
-from datetime import datetime
 from functools import wraps
+import heapq
 import inspect
+import zlib
 
 from lewis.core.adapters import Adapter
 from lewis.core.devices import InterfaceBase
-from six import iteritems, string_types
+from six import iteritems, string_types, PY2
 
 from lewis.core.logging import has_log
-from lewis.core.utils import seconds_since, FromOptionalDependency, format_doc_text
+from lewis.core.utils import monotonic, FromOptionalDependency, format_doc_text, \
+    read_lock
 from lewis.core.exceptions import LewisException, LimitViolationException, AccessViolationException
 
 # pcaspy might not be available. To make EPICS-based adapters show up
@@ -56,51 +58,73 @@ class BoundPV(object):
     are generated automatically by :class:`EpicsAdapter`.
 
     The binding happens by supplying a ``target``-object which has an attribute or a property
-    named according to the property-name stored in the PV-object, and a ``meta_target``-object
-    which has an attribute named according to the meta_data_property in PV.
+    named ``target_property``, and a ``meta_target``-object which has an attribute named
+    ``meta_property``. These names are determined by :meth:`PV.bind`, which does not modify
+    the PV-object, so that one PV can be bound to several devices at the same time.
 
-    The properties ``read_only``, ``config``,  and ``poll_interval`` simply forward the
-    data of PV, while ``doc`` uses the target object to potentially obtain the property's
-    docstring.
+    The properties ``config`` and ``poll_interval`` simply forward the data of PV, while
+    ``doc`` uses the target object to potentially obtain the property's docstring.
+    ``read_only`` is True if the PV is read-only or the target property can not be set.
 
     To get and set the value of the property on the target, the ``value``-property of
     this class can be used, to get the meta data dict, there's a ``meta``-property.
 
     :param pv: PV object to bind to target and meta_target.
-    :param target: Object that has an attribute named pv.property.
-    :param meta_target: Object that has an attribute named pv.meta_data_property.
+    :param target: Object that has an attribute named target_property.
+    :param meta_target: Object that has an attribute named meta_property.
+    :param target_property: Name of the attribute of target that holds the value.
+    :param meta_property: Name of the attribute of meta_target that holds the meta data.
     """
 
-    def __init__(self, pv, target, meta_target=None):
+    def __init__(self, pv, target, meta_target=None, target_property='value',
+                 meta_property='meta'):
         self._meta_target = meta_target
         self._target = target
+        self._target_property = target_property
+        self._meta_property = meta_property
         self._pv = pv
+        self._read_only = pv.read_only or not _can_set(target, target_property)
+        self._depends_on = self._get_depends_on(pv, target, target_property)
+
+    @staticmethod
+    def _get_depends_on(pv, target, target_property):
+        if pv.depends_on is not None:
+            return tuple(pv.depends_on)
+
+        # Only PVs that are bound directly to a plain attribute depend on that member, the
+        # property name differs from the specification otherwise. Properties may compute
+        # their value from other members, so they are polled like methods.
+        if target_property != pv._specifications['value'][0] or isinstance(
+                getattr(type(target), target_property, None), property):
+            return ()
+
+        return (target_property,)
 
     @property
     def value(self):
         """Value of the bound property on the target."""
-        return getattr(self._target, self._pv.property)
+        return getattr(self._target, self._target_property)
 
     @value.setter
     def value(self, new_value):
         if self.read_only:
             raise AccessViolationException(
-                'The property {} is read only.'.format(self._pv.property))
+                'The property {} is read only.'.format(self._target_property))
 
-        setattr(self._target, self._pv.property, new_value)
+        setattr(self._target, self._target_property, new_value)
 
     @property
     def meta(self):
         """Value of the bound meta-property on the target."""
-        if not self._pv.meta_data_property or not self._meta_target:
+        if not self._meta_property or not self._meta_target:
             return {}
 
-        return getattr(self._meta_target, self._pv.meta_data_property)
+        return getattr(self._meta_target, self._meta_property)
 
     @property
     def read_only(self):
         """True if the PV is read-only."""
-        return self._pv.read_only
+        return self._read_only
 
     @property
     def config(self):
@@ -112,11 +136,100 @@ class BoundPV(object):
         """Interval at which to update PV in pcaspy."""
         return self._pv.poll_interval
 
+    @property
+    def depends_on(self):
+        """Names of the members whose changes are reflected in the PV, may be empty."""
+        return self._depends_on
+
     @property
     def doc(self):
         """Docstring of property on target or override specified on PV-object."""
         return self._pv.doc or inspect.getdoc(
-            getattr(type(self._target), self._pv.property, None)) or ''
+            getattr(type(self._target), self._target_property, None)) or ''
+
+    def get_change_key(self, value):
+        """
+        Returns a key that changes whenever the supplied value of the PV changes, or None if
+        the value should be compared to the value of the server instead, which is the case
+        for all PVs except waveforms (see :class:`BoundWaveformPV`).
+
+        :param value: Value of the PV.
+        :return: Change key or None.
+        """
+        return None
+
+
+def _can_set(target, name):
+    """
+    Returns False if the attribute of target with the supplied name is a property without
+    setter, which includes the wrapper properties created by :meth:`PV.bind` for getters.
+    """
+    target_property = getattr(type(target), name, None)
+
+    return not isinstance(target_property, property) or target_property.fset is not None
+
+
+def _get_array_key(value):
+    """
+    Returns a key that changes when the contents of an array change. For objects that
+    support the buffer protocol, such as NumPy arrays, it consists of format, shape and a
+    CRC32 checksum of the data, which is computed without copying contiguous buffers on
+    Python 3. Other sequences are converted to a tuple.
+    """
+    try:
+        view = memoryview(value)
+    except TypeError:
+        return tuple(value)
+
+    # On Python 2, memoryview has no c_contiguous and zlib.crc32 does not accept it
+    if PY2 or not view.c_contiguous:
+        return view.format, view.shape, zlib.crc32(view.tobytes())
+
+    return view.format, view.shape, zlib.crc32(view)
+
+
+class BoundWaveformPV(BoundPV):
+    """
+    This sub-class of :class:`BoundPV` is the result of binding a :class:`WaveformPV`. In
+    addition to value and meta data, it provides the version of the array via the
+    ``version``-property, which is None if the PV does not specify a version_property.
+
+    :param pv: WaveformPV object to bind to the targets.
+    :param target: Object that has an attribute named target_property.
+    :param meta_target: Object that has an attribute named meta_property.
+    :param version_target: Object that has an attribute named version_property.
+    :param target_property: Name of the attribute of target that holds the array.
+    :param meta_property: Name of the attribute of meta_target that holds the meta data.
+    :param version_property: Name of the attribute of version_target that holds the version.
+    """
+
+    def __init__(self, pv, target, meta_target=None, version_target=None,
+                 target_property='value', meta_property='meta', version_property='version'):
+        super(BoundWaveformPV, self).__init__(pv, target, meta_target,
+                                              target_property, meta_property)
+        self._version_target = version_target
+        self._version_property = version_property
+
+    @property
+    def version(self):
+        """Version of the array on the target or None."""
+        if not self._version_property or not self._version_target:
+            return None
+
+        return getattr(self._version_target, self._version_property)
+
+    def get_change_key(self, value):
+        """
+        Returns the version of the array if the PV has a version_property, otherwise a
+        checksum of the array's data. The elements of the array are never compared
+        individually.
+
+        :param value: Value of the PV.
+        :return: Change key.
+        """
+        version = self.version
+
+        return ('version', version) if version is not None else _get_array_key(value)
 
 
 class PV(object):
@@ -194,6 +307,10 @@ class PV(object):
     arguments, setter functions must be callable with exactly one argument. The ``self`` of
     methods does not count towards this.
 
+    If the interface uses change tracking (see :class:`EpicsInterface`), the PV is updated
+    when one of the members in ``depends_on`` has been marked as changed. By default, PVs
+    that are bound to a plain attribute depend on that attribute, PVs that are bound to
+    properties, methods or functions are polled unless ``depends_on`` is specified.
 
     :param target_property: Property or method name, getter function, tuple of getter/setter.
     :param poll_interval: Update interval of the PV.
@@ -201,16 +318,17 @@ class PV(object):
                       read_only if only a getter is supplied.
     :param meta_data_property: Property or method name, getter function, tuple of getter/setter.
     :param doc: Description of the PV. If not supplied, docstring of mapped property is used.
+    :param depends_on: Names of members of device or interface that the PV depends on, only
+                       used for change tracking.
     :param kwargs: Arguments forwarded into pcaspy pvdb-dict.
     """
 
     def __init__(self, target_property, poll_interval=1.0, read_only=False,
-                 meta_data_property=None, doc=None, **kwargs):
-        self.property = 'value'
+                 meta_data_property=None, doc=None, depends_on=None, **kwargs):
         self.read_only = read_only
         self.poll_interval = poll_interval
-        self.meta_data_property = 'meta'
         self.doc = doc
+        self.depends_on = depends_on
         self.config = kwargs
 
         value = self._get_specification(target_property)
@@ -224,17 +342,16 @@ class PV(object):
     def bind(self, *targets):
         """
         Tries to bind the PV to one of the supplied targets. Targets are inspected according to
-        the order in which they are supplied.
+        the order in which they are supplied. The PV-object itself is not modified, so that
+        devices can be bound in a different thread while another device is being served.
 
         :param targets: Objects to inspect from.
         :return: BoundPV instance with the PV bound to the target property.
         """
-        self.property = 'value'
-        self.meta_data_property = 'meta'
+        target, target_property = self._get_target('value', *targets)
+        meta_target, meta_property = self._get_target('meta', *targets)
 
-        return BoundPV(self,
-                       self._get_target(self.property, *targets),
-                       self._get_target(self.meta_data_property, *targets))
+        return BoundPV(self, target, meta_target, target_property, meta_property)
 
     def _get_specification(self, spec):
         """
@@ -260,14 +377,10 @@ class PV(object):
 
         .. seealso:: :meth:`_create_getter`, :meth:`_create_setter`
 
-        :param prop: Property, is either 'value' or 'meta'.
+        :param prop: Property, is either 'value', 'meta' or 'version' (only for waveforms).
         :param targets: List of targets with decreasing priority for finding the wrapped method.
-        :return: Target object to be used by :class:`BoundPV`.
+        :return: Tuple of target object and name of the attribute to use on that object.
         """
-
-        if prop is None:
-            return None
-
         raw_getter, raw_setter = self._specifications.get(prop, (None, None))
 
         target = None
@@ -282,28 +395,17 @@ class PV(object):
                 None)
 
         if target is not None:
-            # If the property is an actual property and has no setter, read_only can be
-            # set to True at this point automatically.
-            target_prop = getattr(type(target), raw_getter, None)
-
-            if prop == 'value' and isinstance(target_prop, property) and target_prop.fset is None:
-                self.read_only = True
-
-            # Now the target does not need to be constructed, property or meta_data_property
-            # needs to change.
-            setattr(self, 'property' if prop == 'value' else 'meta_data_property', raw_getter)
-            return target
+            # The target does not need to be constructed, the attribute is accessed directly.
+            # If it is a property without setter, the bound PV is read only.
+            return target, raw_getter
 
         getter = self._create_getter(raw_getter, *targets)
         setter = self._create_setter(raw_setter, *targets)
 
         if getter is None and setter is None:
-            return None
-
-        if prop == 'value' and setter is None:
-            self.read_only = True
+            return None, None
 
-        return type(prop, (object,), {prop: property(getter, setter)})()
+        return type(prop, (object,), {prop: property(getter, setter)})(), prop
 
     def _create_getter(self, func, *targets):
         """
@@ -394,17 +496,108 @@ class PV(object):
         return len(argspec.args) - len(defaults) == n
 
 
+class WaveformPV(PV):
+    """
+    This sub-class of :class:`PV` exposes an array, for example a NumPy array, as a waveform
+    PV with up to ``count`` elements. The array is passed on to pcaspy as it is, without
+    converting it to a list.
+
+    Waveforms are not compared element by element to detect changes. If a
+    ``version_property`` is specified, the PV is updated when the value of that property
+    changes, so the device should increment it whenever it modifies the array. This is
+    the most efficient option for large arrays that are modified in place:
+
+    .. sourcecode:: Python
+
+        class Detector(Device):
+            def __init__(self):
+                super(Detector, self).__init__()
+
+                self.counts = numpy.zeros(100000)
+                self.counts_version = 0
+
+            def doProcess(self, dt):
+                self.counts += numpy.random.poisson(10.0, self.counts.shape)
+                self.counts_version += 1
+
+        class DetectorEpicsInterface(EpicsInterface):
+            pvs = {
+                'COUNTS': WaveformPV('counts', 100000, version_property='counts_version')
+            }
+
+    Without a version_property, a checksum of the array's data is compared instead. When
+    the array has changed, it is passed to pcaspy while the device lock is held. pcaspy
+    copies arrays when they are set, so the published data is consistent and the array
+    is copied only once per update.
+
+    :param target_property: Property or method name, getter function, tuple of getter/setter.
+    :param count: Maximum number of elements.
+    :param version_property: Property or method name or getter function for the version.
+    :param kwargs: Further arguments for :class:`PV`, the type defaults to ``float``.
+    """
+
+    def __init__(self, target_property, count, version_property=None, **kwargs):
+        kwargs.setdefault('type', 'float')
+
+        super(WaveformPV, self).__init__(target_property, count=count, **kwargs)
+
+        self._specifications['version'] = self._get_specification(version_property)
+
+    def bind(self, *targets):
+        """
+        Tries to bind the PV to one of the supplied targets, like :meth:`PV.bind`.
+
+        :param targets: Objects to inspect from.
+        :return: BoundWaveformPV instance with the PV bound to the target properties.
+        """
+        target, target_property = self._get_target('value', *targets)
+        meta_target, meta_property = self._get_target('meta', *targets)
+        version_target, version_property = self._get_target('version', *targets)
+
+        return BoundWaveformPV(self, target, meta_target, version_target,
+                               target_property, meta_property, version_property)
+
+
 @has_log
 class PropertyExposingDriver(Driver):
-    def __init__(self, interface, device_lock):
+    """
+    The driver of the pcaspy server, it forwards PV writes to the interface and updates
+    the PVs with the values of the interface.
+
+    By default, the values of all PVs are compared to the server's values once their poll
+    interval has elapsed. If the interface uses change tracking, only PVs that depend on
+    members the device has marked as changed are updated (see
+    :meth:`~lewis.core.devices.DeviceBase._mark_changed`), PVs without dependencies
+    are still polled. Polled PVs are kept in a heap ordered by the time at which they
+    are due next, so that each update only needs to look at the PVs that are actually due.
+
+    :param interface: The :class:`EpicsInterface` with the bound PVs.
+    :param device_lock: Lock that is acquired while the device is accessed.
+    :param request_cycle: Function that is called after a PV has been written, the device
+                          has already been marked as changed at that point.
+    """
+
+    def __init__(self, interface, device_lock, request_cycle=None):
         super(PropertyExposingDriver, self).__init__()
 
         self._interface = interface
         self._device_lock = device_lock
+        self._request_cycle = request_cycle or (lambda: None)
         self._set_logging_context(interface)
 
-        self._timers = {k: 0.0 for k in self._interface.bound_pvs.keys()}
-        self._last_update_call = None
+        # Heap of (deadline, pv) for polled PVs and index of PVs by members they depend on,
+        # both are rebuilt if the device is exchanged or change tracking is toggled.
+        self._poll_schedule = []
+        self._dependent_pvs = {}
+        self._scheduled_pvs = None
+        self._scheduled_tracking = None
+        self._tracked_generation = 0
+
+        # Copies of the meta data dicts that have been published for each PV
+        self._published_meta = {}
+
+        # Change keys of the waveforms that have been published, see BoundPV.get_change_key
+        self._published_keys = {}
 
     def write(self, pv, value):
         self.log.debug('PV put request: %s=%s', pv, value)
@@ -417,9 +610,19 @@ class PropertyExposingDriver(Driver):
         try:
             with self._device_lock:
                 pv_object.value = value
-                self.setParam(pv, pv_object.value)
 
-                return True
+                new_value = pv_object.value
+                self.setParam(pv, new_value)
+
+                change_key = pv_object.get_change_key(new_value)
+                if change_key is not None:
+                    self._published_keys[pv] = change_key
+
+                self._interface.device._mark_changed()
+
+            self._request_cycle()
+
+            return True
         except LimitViolationException as e:
             self.log.warning('Rejected writing value %s to PV %s due to limit '
                              'violation. %s', value, pv, e)
@@ -453,41 +656,179 @@ class PropertyExposingDriver(Driver):
     def process_pv_updates(self, force=False):
         """
         Update PV values that have changed for PVs that are due to update according to their
-        respective poll interval timers.
+        respective poll intervals or, if the interface uses change tracking, because the
+        device has marked members they depend on as changed.
+
+        The device lock is only held while the values and meta data of the due PVs are
+        obtained, each of them is evaluated once. They are compared to the values of the
+        server and the meta data that was published last after the lock has been released.
+        Changed waveforms are the exception, they are published while the lock is held.
 
         :param force: If True, will force updates to all PVs regardless of timers.
         """
-        dt = seconds_since(self._last_update_call or datetime.now())
-
         # Cache details of PVs that need to update
         value_updates = []
         meta_updates = []
+        published_waveforms = []
 
-        with self._device_lock:
-            for pv, pv_object in iteritems(self._interface.bound_pvs):
-                self._timers[pv] = self._timers.get(pv, 0.0) + dt
-                if self._timers[pv] >= pv_object.poll_interval or force:
-                    try:
-                        if self.getParam(pv) != pv_object.value or force:
-                            value_updates.append((pv, pv_object.value))
+        for pv, value, meta, value_changed in self._get_snapshots(force):
+            try:
+                if value_changed:
+                    published_waveforms.append((pv, value))
+                elif value_changed is None and (force or self.getParam(pv) != value):
+                    value_updates.append((pv, value))
 
-                        pv_meta = pv_object.meta
-                        if self._get_param_info(pv, pv_meta.keys()) != pv_meta or force:
-                            meta_updates.append((pv, pv_meta))
+                if meta and (force or self._get_published_meta(pv, meta) != meta):
+                    meta_updates.append((pv, meta))
 
-                    except (AttributeError, TypeError):
-                        self.log.exception('An error occurred while updating PV %s.', pv)
-                    finally:
-                        self._timers[pv] = 0.0
+            except (AttributeError, TypeError):
+                self.log.exception('An error occurred while updating PV %s.', pv)
 
-        self._process_value_updates(value_updates)
+        self._process_value_updates(value_updates, published_waveforms)
         self._process_meta_updates(meta_updates)
 
-        self._last_update_call = datetime.now()
+    def _get_snapshots(self, force):
+        """
+        Returns a list of (pv, value, meta, value_changed)-tuples for the PVs that are due for
+        an update. For waveforms, value_changed indicates whether the change key differs from
+        the one that was published last, in that case the array has already been passed to
+        setParam, which copies it. For all other PVs it is None and the value has to be
+        compared to the server's value.
+        """
+        snapshots = []
+
+        with read_lock(self._device_lock):
+            for pv in self._get_due_pvs(monotonic(), force):
+                pv_object = self._interface.bound_pvs[pv]
+
+                try:
+                    value = pv_object.value
+                    value_changed = self._check_change_key(pv, pv_object, value, force)
+
+                    if value_changed:
+                        self.setParam(pv, value)
+
+                    snapshots.append((pv, value, dict(pv_object.meta), value_changed))
+                except (AttributeError, TypeError):
+                    self.log.exception('An error occurred while updating PV %s.', pv)
+
+        return snapshots
+
+    def _check_change_key(self, pv, pv_object, value, force):
+        change_key = pv_object.get_change_key(value)
+
+        if change_key is None:
+            return None
+
+        if not force and change_key == self._published_keys.get(pv):
+            return False
+
+        self._published_keys[pv] = change_key
+        return True
+
+    def _get_published_meta(self, pv, meta):
+        """
+        Returns the meta data that was last published for the PV. Before the first update,
+        the values for the keys of meta are obtained from the server.
+        """
+        if pv not in self._published_meta:
+            self._published_meta[pv] = self._get_param_info(pv, meta.keys())
+
+        return self._published_meta[pv]
+
+    def _get_due_pvs(self, now, force):
+        """
+        Returns the names of the PVs that need to be compared to the values of the interface.
+        All PVs are due if the update is forced or the device has been exchanged. Must be
+        called while holding the device lock.
+        """
+        bound_pvs = self._interface.bound_pvs
+        change_tracking = self._interface.change_tracking
+
+        if (force or self._scheduled_pvs is not bound_pvs
+                or self._scheduled_tracking != change_tracking):
+            self._schedule(bound_pvs, change_tracking, now)
+            return list(bound_pvs.keys())
+
+        due_pvs = self._get_polled_pvs(now)
+
+        if not change_tracking:
+            return due_pvs
+
+        changed_pvs = self._get_changed_pvs()
+
+        if changed_pvs is None:
+            return list(bound_pvs.keys())
+
+        return changed_pvs.union(due_pvs)
+
+    def _schedule(self, bound_pvs, change_tracking, now):
+        """
+        Rebuilds the poll schedule and, if change tracking is used, the index of PVs by
+        the members they depend on.
+        """
+        self._scheduled_pvs = bound_pvs
+        self._scheduled_tracking = change_tracking
+        self._dependent_pvs = {}
+
+        poll_schedule = []
+
+        for pv, pv_object in iteritems(bound_pvs):
+            if change_tracking and pv_object.depends_on:
+                for member in pv_object.depends_on:
+                    self._dependent_pvs.setdefault(member, []).append(pv)
+            else:
+                poll_schedule.append((now + pv_object.poll_interval, pv))
+
+        heapq.heapify(poll_schedule)
+        self._poll_schedule = poll_schedule
+
+        if change_tracking:
+            self._tracked_generation = self._interface.device._change_generation
+
+    def _get_polled_pvs(self, now):
+        """
+        Removes the PVs whose poll interval has elapsed from the schedule and returns their
+        names. Each of them is scheduled again one poll interval after its previous deadline,
+        or after now if the updates have fallen behind.
+        """
+        due = []
+
+        while self._poll_schedule and self._poll_schedule[0][0] <= now:
+            due.append(heapq.heappop(self._poll_schedule))
+
+        for deadline, pv in due:
+            poll_interval = self._interface.bound_pvs[pv].poll_interval
+            next_deadline = deadline + poll_interval
+
+            heapq.heappush(self._poll_schedule, (
+                next_deadline if next_deadline > now else now + poll_interval, pv))
+
+        return [pv for _, pv in due]
+
+    def _get_changed_pvs(self):
+        """
+        Returns the names of the PVs that depend on members that have been marked as changed
+        since the last call, or None if all members may have changed.
+        """
+        device = self._interface.device
+
+        # The generation must be obtained first, changes that are marked while the members
+        # are collected are then reported again on the next call instead of being lost.
+        generation = device._change_generation
+        changed_members = device._get_changed_members(self._tracked_generation)
+        self._tracked_generation = generation
+
+        if changed_members is None:
+            return None
+
+        return {pv for member in changed_members for pv in self._dependent_pvs.get(member, ())}
+
+    def _process_value_updates(self, updates, published_waveforms=()):
+        if updates or published_waveforms:
+            update_log = ['{}=<{} elements>'.format(pv, len(value))
+                          for pv, value in published_waveforms]
 
-    def _process_value_updates(self, updates):
-        if updates:
-            update_log = []
             for pv, value in updates:
                 self.setParam(pv, value)
                 update_log.append('{}={}'.format(pv, value))
@@ -502,6 +843,7 @@ class PropertyExposingDriver(Driver):
             update_log = []
             for pv, info in updates:
                 self.setParamInfo(pv, info)
+                self._published_meta[pv] = dict(info)
                 update_log.append('{}={}'.format(pv, info))
 
             self.log.info('Processed PV-info updates: %s', ', '.join(update_log))
@@ -520,10 +862,14 @@ class EpicsAdapter(Adapter):
             'prefix': 'PVPREFIX:'
         }
 
+    pcaspy keeps its driver and PVs in module-level state and runs one ChannelAccess server
+    per process, so only one EpicsAdapter can run in a process.
+
     :param options: Dictionary with options.
     """
 
     default_options = {'prefix': ''}
+    one_per_process = True
 
     def __init__(self, options=None):
         super(EpicsAdapter, self).__init__(options)
@@ -560,7 +906,8 @@ class EpicsAdapter(Adapter):
             self._server.createPV(prefix=self._options.prefix,
                                   pvdb={k: v.config for k, v in self.interface.bound_pvs.items()})
             self._driver = PropertyExposingDriver(interface=self.interface,
-                                                  device_lock=self.device_lock)
+                                                  device_lock=self.device_lock,
+                                                  request_cycle=self.request_cycle)
             self._driver.process_pv_updates(force=True)
 
             self.log.info('Started serving PVs: %s',
@@ -645,10 +992,29 @@ class EpicsInterface(InterfaceBase):
     protocol specific stuff, such as in the case above where stopping a device
     via EPICS might involve writing a value to a PV, whereas other protocols may
     offer an RPC-way of achieving the same thing.
+
+    For devices with many PVs, comparing the values of all PVs to those of the server
+    in regular intervals can be expensive. If ``change_tracking`` is set to True, PVs are
+    only updated when the device marks a member they depend on as changed, PVs that do not
+    depend on any members (see :class:`PV`) are still polled. The device must then mark
+    changes it makes while processing a cycle:
+
+    .. sourcecode:: Python
+
+        class SimpleDevice(Device):
+            speed = 0.0
+
+            def doProcess(self, dt):
+                self.speed += 1.0
+                self._mark_changed('speed')
+
+    All PVs are updated after changes that are not restricted to certain members, such as
+    writes via adapters or the control server and restoring a snapshot.
     """
 
     protocol = 'epics'
     pvs = None
+    change_tracking = False
 
     def __init__(self):
         super(EpicsInterface, self).__init__()
@@ -665,15 +1031,22 @@ class EpicsInterface(InterfaceBase):
         via ChannelAccess.
 
         In the transformation process, the method tries to find whether the attribute specified by
-        PV's ``property`` (and ``meta_data_property``) is part of the internally stored device
-        or the interface and constructs a BoundPV, which acts as a forwarder to the appropriate
-        objects.
+        PV's ``target_property`` (and ``meta_data_property``) is part of the internally stored
+        device or the interface and constructs a BoundPV, which acts as a forwarder to the
+        appropriate objects.
+        """
+        self._apply_binding(self._create_binding(self.device))
+
+    def _create_binding(self, device):
+        """
+        Returns the dict of :class:`BoundPV` objects for the supplied device, see
+        :meth:`~lewis.core.devices.InterfaceBase._create_binding`.
         """
-        self.bound_pvs = {}
+        bound_pvs = {}
 
         for pv_name, pv in self.pvs.items():
             try:
-                self.bound_pvs[pv_name] = pv.bind(self, self.device)
+                bound_pvs[pv_name] = pv.bind(self, device)
             except (AttributeError, RuntimeError) as e:
                 self.log.debug('An exception was caught during the binding step of PV \'%s\'.',
                                pv_name, exc_info=e)
@@ -681,3 +1054,8 @@ class EpicsInterface(InterfaceBase):
                     'The binding step for PV \'{}\' failed, please check the interface-'
                     'definition or contact the device author. More information is '
                     'available with debug-level logging (-o debug).'.format(pv_name))
+
+        return bound_pvs
+
+    def _apply_binding(self, binding):
+        self.bound_pvs = binding
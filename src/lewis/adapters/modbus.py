@@ -44,6 +44,7 @@ from math import ceil
 from lewis.core.adapters import Adapter
 from lewis.core.devices import InterfaceBase
 from lewis.core.logging import has_log
+from lewis.core.utils import read_lock, ConnectionRegistry
 
 
 class ModbusDataBank(object):
@@ -274,6 +275,9 @@ class ModbusProtocol(object):
     :param datastore: ModbusDataStore instance to reference when processing requests
     """
 
+    # Function Codes of requests that only read from the datastore
+    _read_only_fcodes = (0x01, 0x02, 0x03, 0x04)
+
     def __init__(self, sender, datastore):
         self._buffer = bytearray()
         self._datastore = datastore
@@ -291,7 +295,7 @@ class ModbusProtocol(object):
             0x10: self._handle_write_multiple_registers,
         }
 
-    def process(self, data, device_lock):
+    def process(self, data, device_lock, on_modify=None):
         """
         Process as much of given data as possible.
 
@@ -300,11 +304,22 @@ class ModbusProtocol(object):
 
         :param data: Incoming byte data. Must be compatible with bytearray.
         :param device_lock: threading.Lock instance that is acquired for device interaction.
+        :param on_modify: Function that is called before the lock is released if any of the
+                          processed requests may have modified the device.
+        :return: True if any of the processed requests may have modified the device.
         """
         self._buffer.extend(bytearray(data))
 
+        requests = list(self._buffered_requests())
+
+        # If the data only contains read requests, shared access to the device is sufficient
+        read_only = all(request.fcode in self._read_only_fcodes for request in requests)
+
+        if read_only:
+            device_lock = read_lock(device_lock)
+
         with device_lock:
-            for request in self._buffered_requests():
+            for request in requests:
                 self.log.debug(
                     'Request: %s', str(['{:#04x}'.format(c) for c in request.to_bytearray()]))
 
@@ -316,6 +331,11 @@ class ModbusProtocol(object):
 
                 self._send(response)
 
+            if not read_only and on_modify is not None:
+                on_modify()
+
+        return not read_only
+
     def _buffered_requests(self):
         """Generator to yield all complete modbus requests in the internal buffer"""
         try:
@@ -528,7 +548,7 @@ class ModbusProtocol(object):
 @has_log
 class ModbusHandler(asyncore.dispatcher_with_send):
     def __init__(self, sock, interface, server):
-        asyncore.dispatcher_with_send.__init__(self, sock=sock)
+        asyncore.dispatcher_with_send.__init__(self, sock=sock, map=server.socket_map)
         self._datastore = ModbusDataStore(interface.di, interface.co, interface.ir, interface.hr)
         self._modbus = ModbusProtocol(self.send, self._datastore)
         self._server = server
@@ -538,7 +558,10 @@ class ModbusHandler(asyncore.dispatcher_with_send):
 
     def handle_read(self):
         data = self.recv(8192)
-        self._modbus.process(data, self._server.device_lock)
+        self._server.mark_active(self)
+        if self._modbus.process(data, self._server.device_lock,
+                                self._server.interface.device._mark_changed):
+            self._server.request_cycle()
 
     def handle_close(self):
         self.log.info('Closing connection to client %s:%s', *self.socket.getpeername())
@@ -548,43 +571,109 @@ class ModbusHandler(asyncore.dispatcher_with_send):
 
 @has_log
 class ModbusServer(asyncore.dispatcher):
-    def __init__(self, host, port, interface, device_lock):
-        asyncore.dispatcher.__init__(self)
+    def __init__(self, host, port, interface, device_lock, request_cycle=None,
+                 backlog=socket.SOMAXCONN, max_clients=0, idle_timeout=0):
+        # Each server has its own socket map so that several servers in one process
+        # do not process each other's connections.
+        self.socket_map = {}
+
+        asyncore.dispatcher.__init__(self, map=self.socket_map)
         self.device_lock = device_lock
+        self.request_cycle = request_cycle or (lambda: None)
         self.interface = interface
         self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
         self.set_reuse_addr()
         self.bind((host, port))
-        self.listen(5)
+        self.listen(backlog)
 
         self._set_logging_context(interface)
         self.log.info('Listening on %s:%s', host, port)
 
-        self._accepted_connections = []
+        self._accepted_connections = ConnectionRegistry(max_clients, idle_timeout)
 
     def handle_accept(self):
         pair = self.accept()
         if pair is not None:
-            sock, _ = pair
+            sock, addr = pair
+
+            if self._accepted_connections.is_full:
+                self.log.warning('Refusing connection from %s:%s, the maximum number of '
+                                 'clients is connected.', *addr)
+                sock.close()
+                return
+
             handler = ModbusHandler(sock, self.interface, self)
-            self._accepted_connections.append(handler)
+            self._accepted_connections.add(handler)
 
     def remove_handler(self, handler):
         self._accepted_connections.remove(handler)
 
+    def mark_active(self, handler):
+        self._accepted_connections.touch(handler)
+
+    def get_timeout(self, timeout):
+        """
+        Returns how long the sockets in ``socket_map`` may be polled before
+        :meth:`process_pending` has to be called, the server has no timers of its own.
+
+        :param timeout: Maximum time to wait for socket events in seconds.
+        :return: Time to wait for socket events in seconds.
+        """
+        return timeout
+
+    def process_pending(self):
+        """
+        Closes connections that have been idle for longer than ``idle_timeout``. This must be
+        called after the sockets in ``socket_map`` have been polled.
+        """
+        for handler in self._accepted_connections.idle_connections():
+            self.log.info('Connection to client has been idle for more than %s s.',
+                          self._accepted_connections.idle_timeout)
+            handler.handle_close()
+
+    def handle(self, cycle_delay):
+        """
+        Waits up to ``cycle_delay`` seconds for socket events and processes them, then closes
+        connections that have been idle for longer than ``idle_timeout``.
+
+        :param cycle_delay: Maximum time to wait for socket events in seconds.
+        """
+        asyncore.loop(cycle_delay, count=1, map=self.socket_map)
+        self.process_pending()
+
     def handle_close(self):
         self.log.info('Shutting down server, closing all remaining client connections.')
 
         for handler in self._accepted_connections:
             handler.close()
-        self._accepted_connections = []
+            self._accepted_connections.remove(handler)
         self.close()
 
 
 class ModbusAdapter(Adapter):
+    """
+    The ModbusAdapter exposes a :class:`ModbusInterface` via Modbus TCP.
+
+    Available adapter options are:
+
+     - bind_address: IP of network adapter to bind on (defaults to 0.0.0.0, or all adapters)
+     - port: Port to listen on (defaults to 502)
+     - backlog: Maximum number of connections that are waiting to be accepted (defaults to
+       the system's maximum, ``socket.SOMAXCONN``)
+     - max_clients: Maximum number of connected clients, further connections are closed
+       immediately (defaults to 0, no limit)
+     - idle_timeout: Connections without requests for this many seconds are closed
+       (defaults to 0, connections are never closed)
+
+    :param options: Dictionary with options.
+    """
+
     default_options = {
         'bind_address': '0.0.0.0',
-        'port': 502
+        'port': 502,
+        'backlog': socket.SOMAXCONN,
+        'max_clients': 0,
+        'idle_timeout': 0,
     }
 
     def __init__(self, options=None):
@@ -593,19 +682,25 @@ class ModbusAdapter(Adapter):
 
     def start_server(self):
         self._server = ModbusServer(
-            self._options.bind_address, self._options.port, self.interface, self.device_lock)
+            self._options.bind_address, self._options.port, self.interface, self.device_lock,
+            self.request_cycle, backlog=self._options.backlog,
+            max_clients=self._options.max_clients, idle_timeout=self._options.idle_timeout)
 
     def stop_server(self):
         if self._server is not None:
-            self._server.close()
+            self._server.handle_close()
             self._server = None
 
     @property
     def is_running(self):
         return self._server is not None
 
+    @property
+    def socket_server(self):
+        return self._server
+
     def handle(self, cycle_delay=0.1):
-        asyncore.loop(cycle_delay, count=1)
+        self._server.handle(cycle_delay)
 
 
 class ModbusInterface(InterfaceBase):
@@ -17,146 +17,1258 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 # *********************************************************************
 
-import asynchat
-import asyncore
+import functools
+import heapq
 import inspect
+import itertools
+import os
 import re
 import socket
+import stat
+import struct
 
 from scanf import scanf_compile
 from six import b, string_types
 
 from lewis.core.adapters import Adapter
 from lewis.core.devices import InterfaceBase
+from lewis.core.exceptions import LewisException
 from lewis.core.logging import has_log
-from lewis.core.utils import format_doc_text
+from lewis.core.utils import format_doc_text, monotonic, read_lock, FromOptionalDependency, \
+    ConnectionRegistry, LRUCache
+
+# asyncio is not available in Python 2, while asyncore and asynchat have been removed in
+# Python 3.12. Dummy types are created for whichever is missing, StreamAdapter then
+# uses the other backend by default.
+Protocol = FromOptionalDependency(
+    'asyncio', 'The asyncio backend of the stream adapter requires Python 3.4 or '
+               'later.').do_import('Protocol')
+
+async_chat = FromOptionalDependency(
+    'asynchat', 'The asyncore backend of the stream adapter is not available in this '
+                'version of Python, please use the asyncio backend.').do_import('async_chat')
+
+dispatcher = FromOptionalDependency(
+    'asyncore', 'The asyncore backend of the stream adapter is not available in this '
+                'version of Python, please use the asyncio backend.').do_import('dispatcher')
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+try:
+    import asyncore
+except ImportError:
+    asyncore = None
+
+# Pseudo-terminals are only available on POSIX systems.
+try:
+    import pty
+    import tty
+except ImportError:
+    pty = None
+
+
+def _format_address(address):
+    """
+    Returns a printable form of a socket address, which is a (host, port)-tuple for TCP
+    connections and a path for Unix domain sockets. Clients of Unix domain sockets are
+    usually unnamed.
+    """
+    if isinstance(address, tuple):
+        return ('[{}]:{}' if ':' in address[0] else '{}:{}').format(*address[:2])
+
+    return address or 'unnamed socket'
+
+
+def _remove_socket_file(path):
+    """
+    Removes the Unix domain socket at ``path`` if it exists, for example because a previous
+    simulation was not shut down cleanly. Other types of files are never removed, so that a
+    wrong path does not delete unrelated data.
+    """
+    try:
+        if stat.S_ISSOCK(os.stat(path).st_mode):
+            os.remove(path)
+    except OSError:
+        pass
+
+
+def _create_server_socket(endpoint, backlog):
+    """
+    Returns a socket that is bound to the supplied :class:`Endpoint` and listens for
+    connections. The address family of TCP endpoints is determined from the host, so
+    that both IPv4 and IPv6 addresses can be used. IPv6 sockets only accept IPv6
+    connections, so that the same port can be used for an IPv4 endpoint as well.
+
+    :param endpoint: The :class:`Endpoint` to listen on.
+    :param backlog: Maximum number of pending connections that have not been accepted yet.
+    :return: Listening socket.
+    """
+    if endpoint.path is not None:
+        _remove_socket_file(endpoint.path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        address = endpoint.path
+    else:
+        family, socket_type, proto, _, address = socket.getaddrinfo(
+            endpoint.host, endpoint.port, 0, socket.SOCK_STREAM, 0, socket.AI_PASSIVE)[0]
+        sock = socket.socket(family, socket_type, proto)
+
+        if os.name == 'posix':
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+
+        if endpoint.reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+
+        if family == socket.AF_INET6:
+            sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 1)
+
+    try:
+        sock.bind(address)
+        sock.listen(backlog)
+    except socket.error:
+        sock.close()
+        raise
+
+    return sock
+
+
+def _to_bytes(data):
+    """
+    Returns data as bytes, strings are encoded with latin-1, so that each character
+    corresponds to one byte.
+    """
+    return data if isinstance(data, (bytes, bytearray)) else b(data)
+
+
+class Framing(object):
+    """
+    The framing of a :class:`StreamInterface` determines how the data received from a
+    client is divided into requests (frames) and how replies are sent. By default, the
+    framing is determined by the in- and out-terminators of the interface, but
+    interfaces for binary protocols can assign one of the sub-classes of this class
+    to their ``framing``-attribute:
+
+    .. sourcecode:: Python
+
+        class BinaryDeviceInterface(StreamInterface):
+            framing = LengthFieldFraming(size=2, byteorder='little')
+
+            commands = {
+                Cmd('get_status', b'^\x01$', return_mapping=None),
+            }
+
+    Frames are extracted from the receive buffer of the connection in :meth:`split`.
+    Sub-classes must implement this method, :meth:`frame_reply` can be overridden if
+    replies need to be modified before they are sent.
+    """
+
+    #: If True, a read timeout completes the current frame, otherwise it is an error.
+    read_timeout_completes_frame = False
+
+    def split(self, buffer):
+        """
+        Finds all complete frames at the beginning of the receive buffer. The buffer is not
+        modified, the caller removes the consumed bytes afterwards.
+
+        :param buffer: The receive buffer, a ``bytearray``.
+        :return: Tuple of the list of frames (as bytes) and the number of consumed bytes.
+        """
+        raise NotImplementedError('The split-method must be implemented.')
+
+    def frame_reply(self, reply):
+        """
+        Returns the data that is sent to the client for a reply. The default implementation
+        returns the reply unchanged.
+
+        :param reply: The reply as bytes.
+        :return: The framed reply as bytes.
+        """
+        return reply
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, ', '.join(
+            '{}={!r}'.format(name, value) for name, value in sorted(vars(self).items())))
+
+
+class TerminatorFraming(Framing):
+    """
+    Requests and replies are terminated by a sequence of characters. This is the default
+    framing, it is created from the ``in_terminator`` and ``out_terminator`` attributes of
+    the interface.
+
+    :param in_terminator: Terminator of requests.
+    :param out_terminator: Terminator that is appended to replies.
+    """
+
+    def __init__(self, in_terminator='\r', out_terminator='\r'):
+        self.in_terminator = _to_bytes(in_terminator)
+        self.out_terminator = _to_bytes(out_terminator)
+
+    def split(self, buffer):
+        view = memoryview(buffer)
+        frames = []
+        start = 0
+
+        end = buffer.find(self.in_terminator)
+
+        while end != -1:
+            frames.append(view[start:end].tobytes())
+            start = end + len(self.in_terminator)
+            end = buffer.find(self.in_terminator, start)
+
+        return frames, start
+
+    def frame_reply(self, reply):
+        return reply + self.out_terminator
+
+
+class TimeoutFraming(Framing):
+    """
+    Requests are only completed when no more data is received within the read timeout of
+    the interface. This framing is used if the interface's ``in_terminator`` is empty.
+
+    :param out_terminator: Terminator that is appended to replies.
+    """
+
+    read_timeout_completes_frame = True
+
+    def __init__(self, out_terminator='\r'):
+        self.out_terminator = _to_bytes(out_terminator)
+
+    def split(self, buffer):
+        return [], 0
+
+    def frame_reply(self, reply):
+        return reply + self.out_terminator
+
+
+class FixedLengthFraming(Framing):
+    """
+    All requests have the same length in bytes. Replies are sent unchanged.
+
+    :param length: Length of each request.
+    """
+
+    def __init__(self, length):
+        if length < 1:
+            raise ValueError('The frame length must be at least 1.')
+
+        self.length = length
+
+    def split(self, buffer):
+        view = memoryview(buffer)
+        consumed = len(buffer) - len(buffer) % self.length
+
+        return [view[start:start + self.length].tobytes()
+                for start in range(0, consumed, self.length)], consumed
+
+
+class LengthFieldFraming(Framing):
+    """
+    Each request starts with an unsigned integer field that contains the length of the
+    remaining request. Only the data after the length field is passed on to the commands
+    of the interface, replies are sent with a length field in the same format.
+
+    Some protocols do not count exactly the bytes after the length field, for example
+    because the length includes the field itself. For these cases, an adjustment can be
+    specified, which is added to the value of the field to obtain the number of following
+    bytes. For a length that includes a 2 byte field, the adjustment would be -2.
+
+    :param size: Size of the length field in bytes, 1, 2, 4 or 8.
+    :param byteorder: Byte order of the length field, ``big`` or ``little``.
+    :param adjustment: Value that is added to the length field to obtain the number of
+                       bytes following it.
+    """
+
+    _formats = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+    _byteorders = {'big': '>', 'little': '<'}
+
+    def __init__(self, size=1, byteorder='big', adjustment=0):
+        if size not in self._formats or byteorder not in self._byteorders:
+            raise ValueError('The size of the length field must be one of 1, 2, 4, 8 and the '
+                             'byte order either big or little.')
+
+        self.size = size
+        self.byteorder = byteorder
+        self.adjustment = adjustment
+
+    @property
+    def _format(self):
+        return self._byteorders[self.byteorder] + self._formats[self.size]
+
+    def split(self, buffer):
+        view = memoryview(buffer)
+        frames = []
+        start = 0
+
+        while len(buffer) - start >= self.size:
+            length = struct.unpack_from(self._format, buffer, start)[0] + self.adjustment
+            end = start + self.size + max(length, 0)
+
+            if end > len(buffer):
+                break
+
+            frames.append(view[start + self.size:end].tobytes())
+            start = end
+
+        return frames, start
+
+    def frame_reply(self, reply):
+        return struct.pack(self._format, len(reply) - self.adjustment) + reply
+
+
+def _get_terminator_framing(in_terminator, out_terminator):
+    """
+    Returns :class:`TimeoutFraming` if in_terminator is empty, otherwise
+    :class:`TerminatorFraming` with the supplied terminators.
+    """
+    if not in_terminator:
+        return TimeoutFraming(out_terminator)
+
+    return TerminatorFraming(in_terminator, out_terminator)
+
+
+class Endpoint(object):
+    """
+    An address that a stream server listens on, either a TCP host and port or the path
+    of a Unix domain socket. Connections that are accepted via the endpoint can use a
+    different framing than the one of the interface, for example other terminators.
+
+    :param host: IPv4 or IPv6 address or host name to bind to.
+    :param port: Port to listen on.
+    :param path: Path of a Unix domain socket, if specified host and port are ignored.
+    :param framing: :class:`Framing` for connections to this endpoint, None to use the
+                    framing of the interface.
+    :param reuse_port: Set ``SO_REUSEPORT``, so that other processes can listen on the
+                       same port.
+    """
+
+    def __init__(self, host='0.0.0.0', port=9999, path=None, framing=None, reuse_port=False):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.framing = framing
+        self.reuse_port = reuse_port
+
+    @property
+    def address(self):
+        """The socket address, a (host, port)-tuple or the path of a Unix domain socket."""
+        return (self.host, self.port) if self.path is None else self.path
+
+    def __repr__(self):
+        return _format_address(self.address)
+
+
+class StreamHandlerBase(object):
+    """
+    Request processing that is shared by :class:`StreamHandler` and :class:`StreamProtocol`.
+    Sub-classes must provide the ``_target`` (the interface), ``_stream_server``,
+    ``_framing`` and ``_buffer`` (a ``bytearray``) attributes.
+    """
+
+    # Time at which the emulated serial line has finished transmitting the last reply
+    _line_free = 0.0
+
+    def _handle_requests(self, requests):
+        """
+        Processes all supplied requests in one acquisition of the device lock and returns
+        their replies in the same order. For each request the command that can process it
+        is looked up before the lock is acquired. If all of those commands are read-only,
+        the lock is only acquired for reading, and commands with a valid cached reply
+        (see :class:`Var`) are answered without acquiring the lock at all. Errors are passed
+        on to the interface's handle_error-method, they do not affect the processing of the
+        other requests.
+
+        The interface is bound to another device while the device lock is held (see
+        :meth:`~lewis.core.simulation.Simulation.switch_setup`). If that happened between
+        looking up the commands and acquiring the lock, the commands are looked up again.
+
+        :param requests: List of requests without terminators.
+        :return: List of replies, entries may be None.
+        """
+        while True:
+            command_index = self._target.command_index
+
+            commands = [command_index.find(request) for request in requests]
+            read_only = all(cmd is not None and cmd.read_only for cmd, _ in commands)
+
+            replies = [None] * len(requests)
+            pending = list(range(len(requests)))
+
+            if read_only:
+                pending = self._get_cached_replies(requests, commands, replies)
+
+            if not pending:
+                return replies
+
+            device_lock = self._stream_server.device_lock
+
+            if read_only:
+                device_lock = read_lock(device_lock)
+
+            modifies_device = any(cmd is not None and not cmd.read_only for cmd, _ in commands)
+
+            with device_lock:
+                if self._target.command_index is not command_index:
+                    self.log.debug('Interface has been bound to another device, looking up '
+                                   'commands again.')
+                    continue
+
+                self._process_commands(requests, commands, pending, replies)
+
+                # Cached replies must not be used anymore once the lock is released
+                if modifies_device:
+                    self._mark_device_changed()
+
+            if modifies_device:
+                self._stream_server.request_cycle()
+
+            return replies
+
+    def _process_commands(self, requests, commands, pending, replies):
+        """
+        Processes the pending requests with the commands that have been looked up for them
+        and stores the replies. The device lock must be held.
+        """
+        if len(requests) > 1:
+            self.log.info('Processing batch of %d requests', len(requests))
+
+        generation = self._get_device_generation()
+
+        for index in pending:
+            cmd, arguments = commands[index]
+            replies[index] = self._process_command(
+                requests[index], cmd, arguments, len(requests) == 1, generation)
+
+    def _get_device_generation(self):
+        return getattr(self._target.device, '_change_generation', None)
+
+    def _mark_device_changed(self):
+        mark_changed = getattr(self._target.device, '_mark_changed', None)
+
+        if mark_changed is not None:
+            mark_changed()
+
+    def _get_cached_replies(self, requests, commands, replies):
+        """
+        Fills in the replies of cached commands that are still valid for the current change
+        generation of the device and returns the indices of the remaining requests.
+        """
+        generation = self._get_device_generation()
+
+        if generation is None:
+            return list(range(len(requests)))
+
+        pending = []
+
+        for index, (cmd, arguments) in enumerate(commands):
+            found, reply = cmd.get_cached_reply(generation, arguments)
+
+            if found:
+                self.log.debug('Using cached reply for request %s', requests[index])
+                replies[index] = reply
+            else:
+                pending.append(index)
+
+        return pending
+
+    def _process_command(self, request, cmd, arguments, log_request=True, generation=None):
+        try:
+            if cmd is None:
+                raise RuntimeError('None of the device\'s commands matched.')
+
+            (self.log.info if log_request else self.log.debug)(
+                'Processing request %s using command %s', request, cmd.matcher.pattern)
+
+            return cmd.process_arguments(arguments, generation)
+
+        except Exception as error:
+            return self._handle_error(request, error)
+
+    def _receive(self, data):
+        """
+        Appends received data to the buffer and removes all complete frames from it.
+
+        :param data: The received data.
+        :return: List of complete requests.
+        """
+        self._buffer += data
+
+        requests, consumed = self._framing.split(self._buffer)
+
+        if consumed:
+            del self._buffer[:consumed]
+
+        if requests:
+            self.log.debug('Got requests %s', requests)
+
+        return requests
+
+    def _handle_incomplete_request(self):
+        """
+        Handles the data that remains in the buffer when the read timeout expires. Depending
+        on the framing, this is either a complete request or an error.
+
+        :return: List of replies, entries may be None.
+        """
+        request = bytes(self._buffer)
+        del self._buffer[:]
+
+        self.log.debug('Got request %s', request)
+
+        if self._framing.read_timeout_completes_frame:
+            return self._handle_requests([request])
+
+        return [self._handle_read_timeout(request)]
+
+    def _format_replies(self, replies):
+        """
+        Concatenates all replies that are not None, each framed as required by the
+        interface's framing, so that they can be sent to the client at once.
+
+        :param replies: List of replies, entries may be None.
+        :return: The data to send, empty if there are no replies.
+        """
+        return b''.join(self._framing.frame_reply(_to_bytes(reply))
+                        for reply in replies if reply is not None)
+
+    def _reply_is_delayed(self):
+        return bool(self._target.reply_delay or self._target.baud_rate)
+
+    def _get_send_time(self, data, now):
+        """
+        Returns the time at which a reply would have been transmitted completely by a serial
+        line with the interface's reply_delay and baud_rate, assuming 10 bits per byte
+        (8 data bits, start and stop bit). Replies to one client are transmitted one after
+        the other, so a reply can not start before the previous one has finished.
+
+        :param data: The reply including terminator.
+        :param now: The current time, in the time base of the server's timers.
+        :return: Time at which the reply should be sent to the client.
+        """
+        send_time = max(now + self._target.reply_delay / 1000.0, self._line_free)
+
+        if self._target.baud_rate:
+            send_time += len(data) * 10.0 / self._target.baud_rate
+
+        self._line_free = send_time
+
+        return send_time
+
+    def _handle_read_timeout(self, request):
+        """
+        Returns the reply for a request that was not terminated within the read timeout.
+
+        :param request: The incomplete request.
+        :return: Reply produced by the interface's handle_error-method.
+        """
+        with self._stream_server.device_lock:
+            error = RuntimeError("ReadTimeout while waiting for command terminator.")
+            return self._handle_error(request, error)
+
+    def _handle_error(self, request, error):
+        self.log.debug('Error while processing request', exc_info=error)
+        return self._target.handle_error(request, error)
 
 
 @has_log
-class StreamHandler(asynchat.async_chat):
-    def __init__(self, sock, target, stream_server):
-        asynchat.async_chat.__init__(self, sock=sock)
-        self.set_terminator(b(target.in_terminator))
+class StreamHandler(async_chat, StreamHandlerBase):
+    def __init__(self, sock, target, stream_server, framing=None):
+        async_chat.__init__(self, sock=sock, map=stream_server.socket_map)
         self._readtimeout = target.readtimeout
-        self._readtimer = 0
+        self._read_deadline = 0.0
+        self._read_timer_scheduled = False
         self._target = target
-        self._buffer = []
+        self._framing = framing or target.get_framing()
+        self._buffer = bytearray()
 
         self._stream_server = stream_server
 
         self._set_logging_context(target)
-        self.log.info('Client connected from %s:%s', *sock.getpeername())
+        self.log.info('Client connected from %s', _format_address(sock.getpeername()))
 
-    def process(self, msec):
-        if not self._buffer:
+    def _restart_read_timer(self):
+        """
+        Moves the deadline for the current request to ``readtimeout`` from now. The server
+        only has one timer per connection, if it fires before the deadline because more
+        data has arrived since it was scheduled, it is rescheduled.
+        """
+        if self._readtimeout == 0:
             return
 
-        if self._readtimer >= self._readtimeout and self._readtimeout != 0:
-            if not self.get_terminator():
-                # If no terminator is set, this timeout is the terminator
-                self.found_terminator()
-            else:
-                self._readtimer = 0
-                request = self._get_request()
-                with self._stream_server.device_lock:
-                    error = RuntimeError("ReadTimeout while waiting for command terminator.")
-                    reply = self._handle_error(request, error)
-                self._send_reply(reply)
+        self._read_deadline = monotonic() + self._readtimeout / 1000.0
 
-        if self._buffer:
-            self._readtimer += msec
+        if not self._read_timer_scheduled:
+            self._read_timer_scheduled = True
+            self._stream_server.call_at(self._read_deadline, self._check_read_timeout)
 
-    def collect_incoming_data(self, data):
-        self._buffer.append(data)
-        self._readtimer = 0
+    def _check_read_timeout(self):
+        self._read_timer_scheduled = False
 
-    def _get_request(self):
-        request = b''.join(self._buffer)
-        self._buffer = []
-        self.log.debug('Got request %s', request)
-        return request
+        if not self._buffer or not self.connected:
+            return
 
-    def _send_reply(self, reply):
-        if reply is not None:
-            self.log.debug('Sending reply %s', reply)
-            self.push(b(reply + self._target.out_terminator))
+        if self._read_deadline > monotonic():
+            self._read_timer_scheduled = True
+            self._stream_server.call_at(self._read_deadline, self._check_read_timeout)
+        else:
+            self._send_replies(self._handle_incomplete_request())
 
-    def _handle_error(self, request, error):
-        self.log.debug('Error while processing request', exc_info=error)
-        return self._target.handle_error(request, error)
+    def _send_replies(self, replies):
+        data = self._format_replies(replies)
 
-    def found_terminator(self):
-        self._readtimer = 0
+        if data:
+            if self._reply_is_delayed():
+                self._stream_server.call_at(
+                    self._get_send_time(data, monotonic()), self._send, data)
+            else:
+                self._send(data)
 
-        request = self._get_request()
+    def _send(self, data):
+        if self.connected:
+            self.log.debug('Sending reply %s', data)
+            self.push(data)
 
-        with self._stream_server.device_lock:
-            try:
-                cmd = next((cmd for cmd in self._target.bound_commands
-                            if cmd.can_process(request)), None)
+    def handle_read(self):
+        # Incoming data is split into requests by the interface's framing instead of the
+        # terminator handling of async_chat, which is only used for sending.
+        try:
+            data = self.recv(self.ac_in_buffer_size)
+        except socket.error:
+            self.handle_error()
+            return
 
-                if cmd is None:
-                    raise RuntimeError('None of the device\'s commands matched.')
+        if not data:
+            return
 
-                self.log.info(
-                    'Processing request %s using command %s', request, cmd.matcher.pattern)
+        self._stream_server.mark_active(self)
 
-                reply = cmd.process_request(request)
+        requests = self._receive(data)
 
-            except Exception as error:
-                reply = self._handle_error(request, error)
+        if requests:
+            self._send_replies(self._handle_requests(requests))
 
-        self._send_reply(reply)
+        if self._buffer:
+            self._restart_read_timer()
 
     def handle_close(self):
-        self.log.info('Closing connection to client %s:%s', *self.socket.getpeername())
+        self.log.info(
+            'Closing connection to client %s', _format_address(self.socket.getpeername()))
         self._stream_server.remove_handler(self)
-        asynchat.async_chat.handle_close(self)
+        async_chat.handle_close(self)
+
+
+class _StreamListener(dispatcher):
+    """
+    Accepts connections to one :class:`Endpoint` of a :class:`StreamServer`.
+    """
+
+    def __init__(self, stream_server, endpoint, backlog):
+        dispatcher.__init__(self, map=stream_server.socket_map)
+        self.set_socket(_create_server_socket(endpoint, backlog))
+
+        # The socket is listening already, this puts the dispatcher into accepting state
+        self.listen(backlog)
+
+        self.endpoint = endpoint
+        self._stream_server = stream_server
+
+    def handle_accept(self):
+        pair = self.accept()
+        if pair is not None:
+            self._stream_server.accept_connection(pair[0], pair[1], self.endpoint)
 
 
 @has_log
-class StreamServer(asyncore.dispatcher):
-    def __init__(self, host, port, target, device_lock):
-        asyncore.dispatcher.__init__(self)
+class StreamServer(object):
+    """
+    asyncore-based server for :class:`StreamInterface`. The server listens on one or more
+    endpoints, all connections are handled in the same loop by :meth:`handle`.
+
+    :param host: Address to bind to.
+    :param port: Port to listen on.
+    :param target: The :class:`StreamInterface` that processes requests.
+    :param device_lock: Lock that is acquired while the device is accessed.
+    :param request_cycle: Function that is called after a request that modified the device.
+    :param path: If specified, the server listens on a Unix domain socket with this path
+                 instead of host and port.
+    :param backlog: Maximum number of pending connections that have not been accepted yet.
+    :param max_clients: Maximum number of connected clients, 0 for no limit.
+    :param idle_timeout: Connections without requests for this many seconds are closed,
+                         0 to keep connections open indefinitely.
+    :param reuse_port: Set ``SO_REUSEPORT`` on the socket for host and port.
+    :param endpoints: Further :class:`Endpoint` objects to listen on.
+    """
+
+    def __init__(self, host, port, target, device_lock, request_cycle=None, path=None,
+                 backlog=socket.SOMAXCONN, max_clients=0, idle_timeout=0, reuse_port=False,
+                 endpoints=()):
+        # Each server has its own socket map so that several servers in one process
+        # do not process each other's connections.
+        self.socket_map = {}
+
         self.target = target
         self.device_lock = device_lock
-        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.set_reuse_addr()
-        self.bind((host, port))
-        self.listen(5)
+        self.request_cycle = request_cycle or (lambda: None)
+        self.endpoints = [Endpoint(host, port, path, reuse_port=reuse_port)] + list(endpoints)
 
         self._set_logging_context(target)
-        self.log.info('Listening on %s:%s', host, port)
 
-        self._accepted_connections = []
+        self._listeners = []
 
-    def handle_accept(self):
-        pair = self.accept()
-        if pair is not None:
-            sock, addr = pair
-            handler = StreamHandler(sock, self.target, self)
+        try:
+            for endpoint in self.endpoints:
+                self._listeners.append(_StreamListener(self, endpoint, backlog))
+                self.log.info('Listening on %s', endpoint)
+        except socket.error:
+            self._close_listeners()
+            raise
+
+        self._accepted_connections = ConnectionRegistry(max_clients, idle_timeout)
+
+        # Heap of (time, sequence number, callback, args) for read timeouts and delayed replies.
+        self._timers = []
+        self._timer_sequence = itertools.count()
+
+    def accept_connection(self, sock, addr, endpoint):
+        if self._accepted_connections.is_full:
+            self.log.warning('Refusing connection from %s, the maximum number of clients '
+                             'is connected.', _format_address(addr))
+            sock.close()
+            return
 
-            self._accepted_connections.append(handler)
+        handler = StreamHandler(sock, self.target, self, endpoint.framing)
+
+        self._accepted_connections.add(handler)
+
+    def mark_active(self, handler):
+        self._accepted_connections.touch(handler)
 
     def remove_handler(self, handler):
         self._accepted_connections.remove(handler)
 
+    def _close_listeners(self):
+        for listener in self._listeners:
+            listener.close()
+
+            if listener.endpoint.path is not None:
+                _remove_socket_file(listener.endpoint.path)
+
+        self._listeners = []
+
     def close(self):
-        # As this is an old style class, the base class method must
-        # be called directly. This is important to still perform all
-        # the teardown-work that asyncore.dispatcher does.
         self.log.info('Shutting down server, closing all remaining client connections.')
-        asyncore.dispatcher.close(self)
+        self._close_listeners()
 
-        # But in addition, close all open sockets and clear the connection list.
+        # In addition, close all open sockets and clear the connection list.
         for handler in self._accepted_connections:
             handler.close()
+            self._accepted_connections.remove(handler)
 
-        self._accepted_connections = []
+        self._timers = []
 
-    def process(self, msec):
-        for handler in self._accepted_connections:
-            handler.process(msec)
+    def call_at(self, when, callback, *args):
+        """
+        Calls ``callback`` with the supplied arguments once :meth:`handle` is called at or
+        after ``when``. Callbacks that are due at the same time are called in the order in
+        which they were scheduled.
+
+        :param when: Time at which to call the callback, see :func:`~lewis.core.utils.monotonic`.
+        :param callback: The function to call.
+        :param args: Arguments for the callback.
+        """
+        heapq.heappush(self._timers, (when, next(self._timer_sequence), callback, args))
+
+    def get_timeout(self, timeout):
+        """
+        Returns how long the sockets in ``socket_map`` may be polled before
+        :meth:`process_pending` has to be called, which is at most ``timeout`` seconds.
+
+        :param timeout: Maximum time to wait for socket events in seconds.
+        :return: Time to wait for socket events in seconds.
+        """
+        if self._timers:
+            return max(0.0, min(timeout, self._timers[0][0] - monotonic()))
+
+        return timeout
+
+    def process_pending(self):
+        """
+        Runs the timers (read timeouts and delayed replies) that are due and closes idle
+        connections. This must be called after the sockets in ``socket_map`` have been polled.
+        Connections without pending timers do not cause any work here.
+        """
+        now = monotonic()
+
+        while self._timers and self._timers[0][0] <= now:
+            _, _, callback, args = heapq.heappop(self._timers)
+            callback(*args)
+
+        for handler in self._accepted_connections.idle_connections():
+            self.log.info('Connection to client has been idle for more than %s s.',
+                          self._accepted_connections.idle_timeout)
+            handler.handle_close()
+
+    def handle(self, cycle_delay):
+        """
+        Waits up to ``cycle_delay`` seconds for socket events and processes them. If a timer
+        (read timeout or delayed reply) is due earlier, the method returns in time to run it.
+
+        :param cycle_delay: Maximum time to wait for socket events in seconds.
+        """
+        asyncore.loop(self.get_timeout(cycle_delay), count=1, map=self.socket_map)
+        self.process_pending()
+
+
+@has_log
+class StreamProtocol(Protocol, StreamHandlerBase):
+    """
+    asyncio-based counterpart of :class:`StreamHandler`, one instance handles one client
+    connection of :class:`AsyncioStreamServer`. Requests are processed as soon as the
+    event loop reports incoming data. The read timeout is implemented with a timer of
+    the event loop.
+
+    :param target: The :class:`StreamInterface` that processes requests.
+    :param stream_server: The :class:`AsyncioStreamServer` that accepted the connection.
+    :param framing: :class:`Framing` of the connection, None to use the interface's framing.
+    """
+
+    def __init__(self, target, stream_server, framing=None):
+        super(StreamProtocol, self).__init__()
+
+        self._target = target
+        self._stream_server = stream_server
+        self._transport = None
+        self._framing = framing or target.get_framing()
+        self._buffer = bytearray()
+        self._read_timer = None
+
+        self._set_logging_context(target)
+
+    def connection_made(self, transport):
+        self._transport = transport
+        peer = _format_address(transport.get_extra_info('peername'))
+
+        if not self._stream_server.add_connection(self):
+            self.log.warning(
+                'Refusing connection from %s, the maximum number of clients is connected.', peer)
+            transport.close()
+            return
+
+        self.log.info('Client connected from %s', peer)
+
+    def connection_lost(self, exc):
+        self._cancel_read_timer()
+        self._transport = None
+        self._stream_server.remove_connection(self)
+
+        self.log.info('Connection to client closed.')
+
+    def data_received(self, data):
+        self._stream_server.mark_active(self)
+
+        requests = self._receive(data)
+
+        if requests:
+            self._send_replies(self._handle_requests(requests))
+
+        self._start_read_timer()
+
+    def close(self):
+        if self._transport is not None:
+            self._transport.close()
+
+    def _send_replies(self, replies):
+        data = self._format_replies(replies)
+
+        if data:
+            if self._reply_is_delayed():
+                loop = self._stream_server.loop
+                loop.call_at(self._get_send_time(data, loop.time()), self._send, data)
+            else:
+                self._send(data)
+
+    def _send(self, data):
+        # Delayed replies may be due after the connection has been closed
+        if self._transport is not None:
+            self.log.debug('Sending reply %s', data)
+            self._transport.write(data)
+
+    def _start_read_timer(self):
+        self._cancel_read_timer()
+
+        if self._buffer and self._target.readtimeout != 0:
+            self._read_timer = self._stream_server.loop.call_later(
+                self._target.readtimeout / 1000.0, self._read_timeout)
+
+    def _cancel_read_timer(self):
+        if self._read_timer is not None:
+            self._read_timer.cancel()
+            self._read_timer = None
+
+    def _read_timeout(self):
+        self._read_timer = None
+        self._send_replies(self._handle_incomplete_request())
+
+
+@has_log
+class AsyncioStreamServer(object):
+    """
+    This server is the asyncio-based alternative to :class:`StreamServer`. It has its own
+    event loop, which is run by :meth:`handle`, so that the server fits into the adapter
+    model of Lewis, where each adapter is driven by repeated calls to its handle-method.
+    The server listens on one or more endpoints, all of which are served by that loop.
+
+    :param host: Address to bind to.
+    :param port: Port to listen on.
+    :param target: The :class:`StreamInterface` that processes requests.
+    :param device_lock: Lock that is acquired while the device is accessed.
+    :param request_cycle: Function that is called after a request that modified the device.
+    :param path: If specified, the server listens on a Unix domain socket with this path
+                 instead of host and port.
+    :param backlog: Maximum number of pending connections that have not been accepted yet.
+    :param max_clients: Maximum number of connected clients, 0 for no limit.
+    :param idle_timeout: Connections without requests for this many seconds are closed,
+                         0 to keep connections open indefinitely.
+    :param reuse_port: Set ``SO_REUSEPORT`` on the socket for host and port.
+    :param endpoints: Further :class:`Endpoint` objects to listen on.
+    :param loop: Event loop to use instead of creating one. The loop is not closed with the
+                 server and it is run by its owner, who calls :meth:`process_pending`
+                 afterwards instead of :meth:`handle`.
+    """
+
+    def __init__(self, host, port, target, device_lock, request_cycle=None, path=None,
+                 backlog=socket.SOMAXCONN, max_clients=0, idle_timeout=0, reuse_port=False,
+                 endpoints=(), loop=None):
+        self.target = target
+        self.device_lock = device_lock
+        self.request_cycle = request_cycle or (lambda: None)
+        self.endpoints = [Endpoint(host, port, path, reuse_port=reuse_port)] + list(endpoints)
+
+        self._connections = ConnectionRegistry(max_clients, idle_timeout)
+
+        self._set_logging_context(target)
+
+        self._owns_loop = loop is None
+        self.loop = asyncio.new_event_loop() if loop is None else loop
+        self._servers = []
+
+        try:
+            for endpoint in self.endpoints:
+                self._servers.append(self._create_server(endpoint, backlog))
+                self.log.info('Listening on %s', endpoint)
+        except socket.error:
+            self._close_servers()
+            self._close_loop()
+            raise
+
+    def _create_server(self, endpoint, backlog):
+        sock = _create_server_socket(endpoint, backlog)
+        protocol_factory = functools.partial(StreamProtocol, self.target, self, endpoint.framing)
+
+        if endpoint.path is None:
+            server = self.loop.create_server(protocol_factory, sock=sock, backlog=backlog)
+        else:
+            server = self.loop.create_unix_server(protocol_factory, sock=sock, backlog=backlog)
+
+        return self.loop.run_until_complete(server)
+
+    def _close_servers(self):
+        for server in self._servers:
+            server.close()
+
+        for server in self._servers:
+            self.loop.run_until_complete(server.wait_closed())
+
+        for endpoint in self.endpoints:
+            if endpoint.path is not None:
+                _remove_socket_file(endpoint.path)
+
+        self._servers = []
+
+    def add_connection(self, connection):
+        """
+        Registers a new client connection.
+
+        :param connection: The :class:`StreamProtocol` of the connection.
+        :return: False if the maximum number of clients is already connected.
+        """
+        return self._connections.add(connection)
+
+    def remove_connection(self, connection):
+        self._connections.remove(connection)
+
+    def mark_active(self, connection):
+        self._connections.touch(connection)
+
+    def close(self):
+        self.log.info('Shutting down server, closing all remaining client connections.')
+
+        for server in self._servers:
+            server.close()
+
+        for connection in self._connections:
+            connection.close()
+
+        self._close_servers()
+        self._close_loop()
+
+    def _close_loop(self):
+        if self._owns_loop:
+            self.loop.close()
+
+    def handle(self, cycle_delay):
+        """
+        Runs the event loop for approximately ``cycle_delay`` seconds. Requests are processed
+        as soon as they arrive during that time.
+
+        :param cycle_delay: Time to run the event loop for in seconds.
+        """
+        self.loop.call_later(cycle_delay, self.loop.stop)
+        self.loop.run_forever()
+
+        self.process_pending()
+
+    def get_timeout(self, timeout):
+        """
+        Read timeouts and delayed replies are timers of the event loop, so the loop may always
+        be run for the full ``timeout``, see :meth:`StreamServer.get_timeout`.
+
+        :param timeout: Maximum time to run the loop in seconds.
+        :return: Time to run the loop in seconds.
+        """
+        return timeout
+
+    def process_pending(self):
+        """
+        Closes idle connections, this must be called after the event loop has been run.
+        """
+        for connection in self._connections.idle_connections():
+            self.log.info('Connection to client has been idle for more than %s s.',
+                          self._connections.idle_timeout)
+            self._connections.remove(connection)
+            connection.close()
+
+
+class _PtyTransport(object):
+    """
+    Minimal asyncio transport for the master side of a pseudo-terminal, it provides the
+    methods of a transport that are used by :class:`StreamProtocol`. Data that can not be
+    written immediately is buffered and written once the pseudo-terminal is writable again.
+    """
+
+    def __init__(self, loop, fd, device_name):
+        self._loop = loop
+        self._fd = fd
+        self._device_name = device_name
+        self._write_buffer = b''
+
+    def get_extra_info(self, name, default=None):
+        return self._device_name if name == 'peername' else default
+
+    def write(self, data):
+        if not self._write_buffer:
+            try:
+                data = data[os.write(self._fd, data):]
+            except BlockingIOError:
+                pass
+
+            if data:
+                self._loop.add_writer(self._fd, self._write_pending)
+
+        self._write_buffer += data
+
+    def _write_pending(self):
+        try:
+            self._write_buffer = self._write_buffer[os.write(self._fd, self._write_buffer):]
+        except BlockingIOError:
+            return
+
+        if not self._write_buffer:
+            self._loop.remove_writer(self._fd)
+
+    def close(self):
+        self._loop.remove_writer(self._fd)
+        self._write_buffer = b''
+
+
+@has_log
+class PtyStreamServer(AsyncioStreamServer):
+    """
+    This server makes the :class:`StreamInterface` available via a pseudo-terminal instead
+    of a network socket, so that clients can use it like a serial port. Unlike a network
+    server, there is always exactly one connection, which exists as long as the server.
+
+    The slave side of the pseudo-terminal is put into raw mode and kept open by the server,
+    so that clients can open and close it without the connection being lost. As the device
+    name of the pseudo-terminal is assigned by the operating system, a symbolic link with
+    a fixed name can be created for it.
+
+    :param target: The :class:`StreamInterface` that processes requests.
+    :param device_lock: Lock that is acquired while the device is accessed.
+    :param request_cycle: Function that is called after a request that modified the device.
+    :param link: Optional path of a symbolic link to the pseudo-terminal's device.
+    :param loop: Event loop to use instead of creating one, see :class:`AsyncioStreamServer`.
+    """
+
+    def __init__(self, target, device_lock, request_cycle=None, link=None, loop=None):
+        self.target = target
+        self.device_lock = device_lock
+        self.request_cycle = request_cycle or (lambda: None)
+        self.link = link
+
+        self._connections = ConnectionRegistry()
+
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+        os.set_blocking(self._master, False)
+
+        self.device_name = os.ttyname(self._slave)
+
+        if link is not None:
+            if os.path.islink(link):
+                os.remove(link)
+
+            os.symlink(self.device_name, link)
+
+        self._owns_loop = loop is None
+        self.loop = asyncio.new_event_loop() if loop is None else loop
+
+        self._transport = _PtyTransport(self.loop, self._master, self.device_name)
+        self._protocol = StreamProtocol(target, self)
+        self._protocol.connection_made(self._transport)
+
+        self.loop.add_reader(self._master, self._read)
+
+        self._set_logging_context(target)
+        self.log.info('Listening on pseudo-terminal %s%s', self.device_name,
+                      '' if link is None else ' (linked from {})'.format(link))
+
+    def _read(self):
+        try:
+            data = os.read(self._master, 4096)
+        except BlockingIOError:
+            return
+
+        if data:
+            self._protocol.data_received(data)
+
+    def close(self):
+        self.log.info('Shutting down server, closing pseudo-terminal.')
+
+        self.loop.remove_reader(self._master)
+        self._transport.close()
+        self._protocol.connection_lost(None)
+        self._close_loop()
+
+        os.close(self._master)
+        os.close(self._slave)
+
+        if self.link is not None and os.path.islink(self.link):
+            os.remove(self.link)
+
+
+def _has_top_level_alternation(pattern):
+    """
+    Returns True if the regular expression contains a ``|`` that is not part of a group or
+    a character class, in which case the pattern has no common literal prefix.
+    """
+    depth = 0
+    in_class = False
+    i = 0
+
+    while i < len(pattern):
+        char = pattern[i]
+
+        if char == '\\':
+            i += 1
+        elif in_class:
+            in_class = char != ']'
+        elif char == '[':
+            in_class = True
+
+            # A closing bracket directly after the opening one (or its negation) is a literal
+            i += 1 if pattern[i + 1:i + 2] == '^' else 0
+            i += 1 if pattern[i + 1:i + 2] == ']' else 0
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == '|' and depth == 0:
+            return True
+
+        i += 1
+
+    return False
+
+
+def _get_literal_prefix(compiled_pattern):
+    """
+    Returns the literal bytes that every string matching the compiled regular expression
+    starts with. The analysis is conservative, it stops at the first character that is
+    not a plain literal, so the result may be shorter than the actual prefix.
+
+    :param compiled_pattern: Compiled regular expression (from bytes).
+    :return: Literal prefix as bytes, possibly empty.
+    """
+    if compiled_pattern.flags & (re.IGNORECASE | re.VERBOSE):
+        return b''
+
+    pattern = compiled_pattern.pattern.decode('latin-1')
+
+    if _has_top_level_alternation(pattern):
+        return b''
+
+    prefix = []
+    i = 1 if pattern.startswith('^') else 0
+
+    while i < len(pattern):
+        if pattern[i] == '\\' and i + 1 < len(pattern) and not pattern[i + 1].isalnum():
+            literal, length = pattern[i + 1], 2
+        elif pattern[i] not in '.^$*+?{}[]\\|()':
+            literal, length = pattern[i], 1
+        else:
+            break
+
+        quantifier = pattern[i + length:i + length + 1]
+
+        # A quantifier that allows zero repetitions makes the literal optional
+        if quantifier and quantifier in '*?{':
+            break
+
+        prefix.append(literal)
+
+        if quantifier == '+':
+            break
+
+        i += length
+
+    return b(''.join(prefix))
+
+
+#: Process-wide cache of compiled patterns, shared by all :class:`regex` and :class:`scanf`
+#: matchers. Interfaces with the same patterns, for example the interfaces of a large
+#: fleet of devices, therefore only compile each pattern once. The hit and miss counts
+#: can be obtained with ``matcher_cache.statistics()``.
+matcher_cache = LRUCache(maxsize=1024)
+
+
+def _compile_regex(pattern):
+    compiled_pattern = re.compile(_to_bytes(pattern))
+
+    return compiled_pattern, _get_literal_prefix(compiled_pattern)
+
+
+def _compile_scanf(pattern, exact_match):
+    generated_regex, argument_mappings = scanf_compile(pattern)
+    regex_pattern = generated_regex.pattern
+
+    if exact_match:
+        regex_pattern = '^{}$'.format(regex_pattern)
+
+    return regex_pattern, tuple(argument_mappings)
 
 
 class PatternMatcher(object):
@@ -190,6 +1302,15 @@ class PatternMatcher(object):
         """Mapping functions that can be applied to the arguments returned by :meth:`match`."""
         raise NotImplementedError('The argument_mappings property must be implemented.')
 
+    @property
+    def prefix(self):
+        """
+        Literal prefix (as bytes) that all matching requests start with. It is used by
+        :class:`CommandIndex` to skip matchers that can not match a request. The default
+        implementation returns an empty prefix, so that :meth:`match` is always tried.
+        """
+        return b''
+
     def match(self, request):
         """
         Tries to match the request against the internally stored pattern. Returns any matched
@@ -204,13 +1325,14 @@ class PatternMatcher(object):
 class regex(PatternMatcher):
     """
     Implementation of :class:`PatternMatcher` that compiles the specified pattern into a regular
-    expression.
+    expression. Compiled patterns are shared between matchers via :data:`matcher_cache`.
     """
 
     def __init__(self, pattern):
         super(regex, self).__init__(pattern)
 
-        self.compiled_pattern = re.compile(b(pattern))
+        self.compiled_pattern, self._prefix = matcher_cache.get(
+            ('regex', pattern), lambda: _compile_regex(pattern))
 
     @property
     def arg_count(self):
@@ -220,6 +1342,10 @@ class regex(PatternMatcher):
     def argument_mappings(self):
         return None
 
+    @property
+    def prefix(self):
+        return self._prefix
+
     def match(self, request):
         match = self.compiled_pattern.match(request)
 
@@ -255,11 +1381,8 @@ class scanf(regex):
     def __init__(self, pattern, exact_match=True):
         self._scanf_pattern = pattern
 
-        generated_regex, self._argument_mappings = scanf_compile(pattern)
-        regex_pattern = generated_regex.pattern
-
-        if exact_match:
-            regex_pattern = '^{}$'.format(regex_pattern)
+        regex_pattern, self._argument_mappings = matcher_cache.get(
+            ('scanf', pattern, exact_match), lambda: _compile_scanf(pattern, exact_match))
 
         super(scanf, self).__init__(regex_pattern)
 
@@ -272,10 +1395,21 @@ class scanf(regex):
         return self._argument_mappings
 
 
+def _format_return_value(value):
+    """
+    Default return_mapping of :class:`Cmd` and :class:`Var`. Values are converted to
+    strings, except for None and binary data, which are returned unchanged.
+    """
+    if value is None or isinstance(value, (bytes, bytearray)):
+        return value
+
+    return str(value)
+
+
 class Func(object):
     """
     Objects of this type connect a callable object to a pattern matcher (:class:`PatternMatcher`),
-    which currently comprises :class:`regex` and :class:`scanf`. Strings are also
+    which currently comprises :class:`regex` and :class:`scanf`. Strings (and bytes) are also
     accepted, they are treated like a regular expression internally. This preserves default
     behavior from older versions of Lewis.
 
@@ -301,29 +1435,42 @@ class Func(object):
 
     The return_mapping argument is similar, it should map the return value of the function
     to a string. The default map function only does that when the supplied value
-    is not None. It can also be set to a numeric value or a string constant so that the
-    command always returns the same value. If it is ``None``, the return value is not
-    modified at all.
+    is not None and not binary data (bytes), which is sent to the client as it is. It can
+    also be set to a numeric value or a string constant so that the command always returns
+    the same value. If it is ``None``, the return value is not modified at all.
 
     Finally, documentation can be provided by passing the doc-argument. If it is omitted,
     the docstring of the bound function is used and if that is not present, left empty.
 
+    If the function does not modify device or interface, read_only can be set to True. When
+    the simulation uses a :class:`~lewis.core.utils.ReadWriteLock`, such functions only
+    acquire the device lock for shared access. Read-only functions can additionally be
+    cached, in that case the mapped return value is stored together with the change
+    generation of the device (see :meth:`~lewis.core.devices.DeviceBase._mark_changed`)
+    and re-used until the device changes.
+
     :param func: Function to be called when pattern matches or member of device/interface.
     :param pattern: :class:`regex`, :class:`scanf` object or string.
     :param argument_mappings: Iterable with mapping functions from string to some type.
     :param return_mapping: Mapping function for return value of method.
     :param doc: Description of the command. If not supplied, the docstring is used.
+    :param read_only: True if the function does not modify device or interface.
+    :param cached: True if the reply should be cached, only possible for read-only functions.
 
     .. _re: https://docs.python.org/2/library/re.html#regular-expression-syntax
     """
 
-    def __init__(self, func, pattern, argument_mappings=None, return_mapping=None, doc=None):
+    def __init__(self, func, pattern, argument_mappings=None, return_mapping=None, doc=None,
+                 read_only=False, cached=False):
         if not callable(func):
             raise RuntimeError('Can not construct a Func-object from a non callable object.')
 
+        if cached and not read_only:
+            raise RuntimeError('Only read-only functions can be cached.')
+
         self.func = func
 
-        if isinstance(pattern, string_types):
+        if isinstance(pattern, string_types + (bytes,)):
             pattern = regex(pattern)
 
         self.matcher = pattern
@@ -351,6 +1498,11 @@ class Func(object):
         self.argument_mappings = argument_mappings
         self.return_mapping = return_mapping
         self.doc = doc or (inspect.getdoc(self.func) if callable(self.func) else None)
+        self.read_only = read_only
+        self.cached = cached
+
+        # Tuple of (generation, arguments, reply), replaced as a whole
+        self._cached_reply = None
 
     def can_process(self, request):
         return self.matcher.match(request) is not None
@@ -361,9 +1513,44 @@ class Func(object):
         if match is None:
             raise RuntimeError('Request can not be processed.')
 
-        args = self.map_arguments(match)
+        return self.process_arguments(match)
+
+    def process_arguments(self, arguments, generation=None):
+        """
+        Calls the function with arguments that have already been obtained from matching a
+        request, so that the request does not need to be matched again.
+
+        If the function is cached and a generation is supplied, the mapped return value is
+        stored for :meth:`get_cached_reply`. The generation must have been obtained while
+        holding the device lock.
 
-        return self.map_return_value(self.func(*args))
+        :param arguments: Arguments returned by the matcher's match-method.
+        :param generation: Change generation of the device or None.
+        :return: Mapped return value of the function.
+        """
+        reply = self.map_return_value(self.func(*self.map_arguments(arguments)))
+
+        if self.cached and generation is not None:
+            self._cached_reply = (generation, tuple(arguments), reply)
+
+        return reply
+
+    def get_cached_reply(self, generation, arguments):
+        """
+        Returns a tuple of a flag that indicates whether a cached reply for the supplied
+        change generation and arguments exists, and the reply itself.
+
+        :param generation: Current change generation of the device.
+        :param arguments: Arguments returned by the matcher's match-method.
+        :return: Tuple (found, reply).
+        """
+        cached_reply = self._cached_reply
+
+        if cached_reply is not None and cached_reply[0] == generation \
+                and cached_reply[1] == tuple(arguments):
+            return True, cached_reply[2]
+
+        return False, None
 
     def map_arguments(self, arguments):
         """
@@ -396,6 +1583,55 @@ class Func(object):
         return return_value
 
 
+class CommandIndex(object):
+    """
+    This index is used by the stream adapter to find the command that processes a request.
+    Commands are grouped by the first byte of the literal prefix of their patterns
+    (see :attr:`PatternMatcher.prefix`), so that only those commands are tried whose prefix
+    matches the request. Commands without a prefix are tried for all requests. The order in
+    which the commands were defined is preserved, the first matching command is used.
+
+    Each candidate pattern is matched only once and the matched arguments are returned, so that
+    they can be passed to :meth:`Func.process_arguments`.
+
+    :param commands: List of :class:`Func`-objects.
+    """
+
+    def __init__(self, commands):
+        unindexed = []
+        buckets = {}
+
+        for position, cmd in enumerate(commands):
+            prefix = cmd.matcher.prefix
+            entry = (position, prefix, cmd)
+
+            if prefix:
+                buckets.setdefault(prefix[:1], []).append(entry)
+            else:
+                unindexed.append(entry)
+
+        self._unindexed = [entry[1:] for entry in unindexed]
+        self._buckets = {
+            key: [entry[1:] for entry in sorted(entries + unindexed, key=lambda e: e[0])]
+            for key, entries in buckets.items()}
+
+    def find(self, request):
+        """
+        Returns the first command that matches the request, along with the matched arguments.
+
+        :param request: Request to find a command for.
+        :return: Tuple of command and arguments or (None, None) if no command matches.
+        """
+        for prefix, cmd in self._buckets.get(request[:1], self._unindexed):
+            if request.startswith(prefix):
+                arguments = cmd.matcher.match(request)
+
+                if arguments is not None:
+                    return cmd, arguments
+
+        return None, None
+
+
 class CommandBase(object):
     """
     This is the common base class of :class:`Cmd` and :class:`Var`. The concept of commands for
@@ -485,13 +1721,16 @@ class Cmd(CommandBase):
     :param argument_mappings: Iterable with mapping functions from string to some type.
     :param return_mapping: Mapping function for return value of method.
     :param doc: Description of the command. If not supplied, the docstring is used.
+    :param read_only: True if the function does not modify device or interface.
     """
 
     def __init__(self, func, pattern, argument_mappings=None,
-                 return_mapping=lambda x: None if x is None else str(x), doc=None):
+                 return_mapping=_format_return_value, doc=None, read_only=False):
         super(Cmd, self).__init__(func, pattern, argument_mappings, return_mapping,
                                   doc)
 
+        self.read_only = read_only
+
     def bind(self, target):
         method = self.func if callable(self.func) else getattr(target, self.func, None)
 
@@ -499,7 +1738,7 @@ class Cmd(CommandBase):
             return None
 
         return [Func(method, self.pattern, self.argument_mappings, self.return_mapping,
-                     self.doc)]
+                     self.doc, self.read_only)]
 
 
 class Var(CommandBase):
@@ -534,6 +1773,15 @@ class Var(CommandBase):
     In the above example, the foo attribute can be read and written, it's automatically converted
     to an integer, while bar is a property that can only be read via the stream protocol.
 
+    Reading a value is considered to be a read-only operation (see :class:`Func`), so property
+    getters exposed with Var should not modify device or interface.
+
+    For values that are polled at a high rate, the reply of the getter can be cached by
+    passing ``cached=True``. The formatted reply is then re-used without acquiring the device
+    lock until the device changes, which is the case after each simulation cycle, after
+    requests that modify the device via any adapter and after writes via the control server.
+    The getter must only depend on device and interface state, not for example on the time.
+
     .. seealso::
 
         For exposing methods and free functions, there's the :class:`Cmd`-class.
@@ -547,17 +1795,19 @@ class Var(CommandBase):
                            applied to getter and setter.
     :param doc: Description of the command. If not supplied, the docstring is used. For plain data
                 attributes the only way to get docs is to supply this argument.
+    :param cached: Cache the reply of the getter until the device changes.
     """
 
     def __init__(self, target_member, read_pattern=None, write_pattern=None,
-                 argument_mappings=None, return_mapping=lambda x: None if x is None else str(x),
-                 doc=None):
+                 argument_mappings=None, return_mapping=_format_return_value, doc=None,
+                 cached=False):
         super(Var, self).__init__(target_member, None, argument_mappings, return_mapping, doc)
 
         self.target = None
 
         self.read_pattern = read_pattern
         self.write_pattern = write_pattern
+        self.cached = cached
 
     def bind(self, target):
         if self.func not in dir(target):
@@ -573,7 +1823,8 @@ class Var(CommandBase):
                 getter.__doc__ = 'Getter: ' + inspect.getdoc(getattr(type(target), self.func))
 
             funcs.append(
-                Func(getter, self.read_pattern, return_mapping=self.return_mapping, doc=self.doc))
+                Func(getter, self.read_pattern, return_mapping=self.return_mapping, doc=self.doc,
+                     read_only=True, cached=self.cached))
 
         if self.write_pattern is not None:
             def setter(new_value):
@@ -599,6 +1850,27 @@ class StreamAdapter(Adapter):
      - bind_address: IP of network adapter to bind on (defaults to 0.0.0.0, or all adapters)
      - port: Port to listen on (defaults to 9999)
      - telnet_mode: When True, overrides in- and out-terminator for CRNL (defaults to False)
+     - backend: Either ``asyncio`` or ``asyncore``, the networking implementation to use
+       (defaults to ``asyncio`` if it is available, which is the case for Python 3.4 and later)
+     - transport: ``tcp`` (default), ``unix`` to listen on a Unix domain socket, or ``pty``
+       to provide the interface via a pseudo-terminal that behaves like a serial port
+       (requires the ``asyncio`` backend)
+     - path: Path of the Unix domain socket (required for ``unix``) or of a symbolic link
+       to the pseudo-terminal's device (optional for ``pty``)
+     - backlog: Maximum number of connections that are waiting to be accepted (defaults to
+       the system's maximum, ``socket.SOMAXCONN``)
+     - max_clients: Maximum number of connected clients, further connections are closed
+       immediately (defaults to 0, no limit)
+     - idle_timeout: Connections without requests for this many seconds are closed
+       (defaults to 0, connections are never closed)
+     - reuse_port: When True, ``SO_REUSEPORT`` is set on the listening socket, so that other
+       processes can listen on the same port (defaults to False)
+     - endpoints: List of further endpoints to listen on, all of which are served by the same
+       adapter (defaults to an empty list). Each endpoint is a dictionary with the keys
+       ``bind_address`` (IPv4 or IPv6, defaults to the adapter's bind_address), ``port``,
+       ``path`` (Unix domain socket, instead of bind_address and port), ``reuse_port``,
+       ``telnet_mode``, ``in_terminator`` and ``out_terminator``. The last three override the
+       terminators of the interface for connections to that endpoint.
 
     :param options: Dictionary with options.
     """
@@ -606,13 +1878,94 @@ class StreamAdapter(Adapter):
     default_options = {
         'telnet_mode': False,
         'bind_address': '0.0.0.0',
-        'port': 9999
+        'port': 9999,
+        'backend': 'asyncio' if asyncio is not None else 'asyncore',
+        'transport': 'tcp',
+        'path': None,
+        'backlog': socket.SOMAXCONN,
+        'max_clients': 0,
+        'idle_timeout': 0,
+        'reuse_port': False,
+        'endpoints': (),
     }
 
+    _endpoint_options = ('bind_address', 'port', 'path', 'reuse_port', 'telnet_mode',
+                         'in_terminator', 'out_terminator')
+
+    # Only backends that are available in the running Python version can be used
+    _servers = {name: server_type for name, server_type, module in (
+        ('asyncio', AsyncioStreamServer, asyncio),
+        ('asyncore', StreamServer, asyncore)) if module is not None}
+
     def __init__(self, options=None):
         super(StreamAdapter, self).__init__(options)
         self._server = None
 
+        if self._options.backend not in self._servers:
+            raise LewisException(
+                'Invalid backend \'{}\' for stream adapter, available backends are: {}'.format(
+                    self._options.backend, ', '.join(sorted(self._servers.keys()))))
+
+        self._check_transport()
+
+    def _check_transport(self):
+        transport = self._options.transport
+
+        if transport not in ('tcp', 'unix', 'pty'):
+            raise LewisException(
+                'Invalid transport \'{}\' for stream adapter, available transports are: '
+                'pty, tcp, unix'.format(transport))
+
+        if transport == 'unix' and (not hasattr(socket, 'AF_UNIX') or not self._options.path):
+            raise LewisException(
+                'The unix transport requires a path and a system that supports Unix '
+                'domain sockets.')
+
+        if transport == 'pty' and (pty is None or asyncio is None):
+            raise LewisException(
+                'The pty transport requires a POSIX system and the asyncio backend.')
+
+        if transport == 'pty' and self._options.endpoints:
+            raise LewisException('The pty transport does not support further endpoints.')
+
+        for endpoint in self._options.endpoints:
+            self._check_endpoint(endpoint)
+
+        if not hasattr(socket, 'SO_REUSEPORT') and (self._options.reuse_port or any(
+                endpoint.get('reuse_port') for endpoint in self._options.endpoints)):
+            raise LewisException('The reuse_port option is not supported on this system.')
+
+    def _check_endpoint(self, endpoint):
+        if not isinstance(endpoint, dict):
+            raise LewisException(
+                'Invalid endpoint {!r}, endpoints must be dictionaries.'.format(endpoint))
+
+        invalid_keys = set(endpoint.keys()) - set(self._endpoint_options)
+        if invalid_keys:
+            raise LewisException(
+                'Invalid keys for endpoint: {}. Valid keys are: {}'.format(
+                    ', '.join(sorted(invalid_keys)), ', '.join(self._endpoint_options)))
+
+        if endpoint.get('path') is None and endpoint.get('port') is None:
+            raise LewisException('Each endpoint requires either a port or a path.')
+
+        if endpoint.get('path') is not None and not hasattr(socket, 'AF_UNIX'):
+            raise LewisException('Unix domain sockets are not supported on this system.')
+
+    def _create_endpoint(self, endpoint):
+        framing = None
+
+        if endpoint.get('telnet_mode'):
+            framing = TerminatorFraming('\r\n', '\r\n')
+        elif 'in_terminator' in endpoint or 'out_terminator' in endpoint:
+            framing = _get_terminator_framing(
+                endpoint.get('in_terminator', self.interface.in_terminator),
+                endpoint.get('out_terminator', self.interface.out_terminator))
+
+        return Endpoint(endpoint.get('bind_address', self._options.bind_address),
+                        endpoint.get('port'), endpoint.get('path'), framing,
+                        endpoint.get('reuse_port', self._options.reuse_port))
+
     @property
     def documentation(self):
         commands = ['{}:\n{}'.format(
@@ -620,19 +1973,43 @@ class StreamAdapter(Adapter):
             format_doc_text(cmd.doc or inspect.getdoc(cmd.func) or ''))
             for cmd in sorted(self.interface.bound_commands, key=lambda x: x.matcher.pattern)]
 
-        options = format_doc_text(
-            'Listening on: {}\nPort: {}\nRequest terminator: {}\nReply terminator: {}'.format(
-                self._options.bind_address, self._options.port,
-                repr(self.interface.in_terminator), repr(self.interface.out_terminator)))
+        if self.interface.framing is None:
+            framing = 'Request terminator: {}\nReply terminator: {}'.format(
+                repr(self.interface.in_terminator), repr(self.interface.out_terminator))
+        else:
+            framing = 'Framing: {!r}'.format(self.interface.framing)
+
+        options = format_doc_text('{}\n{}'.format(self._listening_on, framing))
 
         return '\n\n'.join(
             [inspect.getdoc(self.interface) or '',
              'Parameters\n==========', options, 'Commands\n========'] + commands)
 
+    @property
+    def _listening_on(self):
+        if self._options.transport == 'pty':
+            return 'Pseudo-terminal: {}'.format(
+                self._server.device_name if self._server is not None
+                else self._options.path or 'assigned when the server starts')
+
+        if self._options.transport == 'unix':
+            listening_on = 'Unix domain socket: {}'.format(self._options.path)
+        else:
+            listening_on = 'Listening on: {}\nPort: {}'.format(
+                self._options.bind_address, self._options.port)
+
+        further_endpoints = [self._create_endpoint(endpoint)
+                             for endpoint in self._options.endpoints]
+
+        return '\n'.join([listening_on] + [
+            'Further endpoint: {}{}'.format(
+                endpoint, '' if endpoint.framing is None else ' ({!r})'.format(endpoint.framing))
+            for endpoint in further_endpoints])
+
     def start_server(self):
         """
-        Starts the TCP stream server, binding to the configured host and port.
-        Host and port are configured via the command line arguments.
+        Starts the stream server, binding to the configured host and port, Unix domain socket
+        or pseudo-terminal. These are configured via the command line arguments.
 
         .. note:: The server does not process requests unless
                   :meth:`handle` is called in regular intervals.
@@ -643,8 +2020,28 @@ class StreamAdapter(Adapter):
                 self.interface.in_terminator = '\r\n'
                 self.interface.out_terminator = '\r\n'
 
-            self._server = StreamServer(self._options.bind_address, self._options.port,
-                                        self.interface, self.device_lock)
+            if self._options.transport == 'pty':
+                self._server = PtyStreamServer(self.interface, self.device_lock,
+                                               self.request_cycle, link=self._options.path,
+                                               **self._get_loop_argument(PtyStreamServer))
+            else:
+                server_type = self._servers[self._options.backend]
+
+                self._server = server_type(
+                    self._options.bind_address, self._options.port, self.interface,
+                    self.device_lock, self.request_cycle,
+                    path=self._options.path if self._options.transport == 'unix' else None,
+                    backlog=self._options.backlog, max_clients=self._options.max_clients,
+                    idle_timeout=self._options.idle_timeout, reuse_port=self._options.reuse_port,
+                    endpoints=[self._create_endpoint(endpoint)
+                               for endpoint in self._options.endpoints],
+                    **self._get_loop_argument(server_type))
+
+    def _get_loop_argument(self, server_type):
+        if issubclass(server_type, AsyncioStreamServer) and self.event_loop is not None:
+            return {'loop': self.event_loop}
+
+        return {}
 
     def stop_server(self):
         if self._server is not None:
@@ -655,14 +2052,21 @@ class StreamAdapter(Adapter):
     def is_running(self):
         return self._server is not None
 
+    @property
+    def socket_server(self):
+        if isinstance(self._server, StreamServer) or (
+                isinstance(self._server, AsyncioStreamServer) and not self._server._owns_loop):
+            return self._server
+
+        return None
+
     def handle(self, cycle_delay=0.1):
         """
         Spend approximately ``cycle_delay`` seconds to process requests to the server.
 
         :param cycle_delay: S
         """
-        asyncore.loop(cycle_delay, count=1)
-        self._server.process(int(cycle_delay * 1000))
+        self._server.handle(cycle_delay)
 
 
 class StreamInterface(InterfaceBase):
@@ -683,6 +2087,14 @@ class StreamInterface(InterfaceBase):
      - readtimeout: How many msec to wait for additional data between packets, once transmission
        of an incoming command has begun. Inverse of ReadTimeout in protocol files.
        Defaults to 100 (ms). Set to 0 to disable timeout completely.
+     - reply_delay: How many msec the device takes before it starts to transmit a reply.
+       Defaults to 0.
+     - baud_rate: If set, replies are delayed by the time it takes to transmit them over a
+       serial line with this baud rate, assuming 10 bits per byte. Each reply is sent to
+       the client as a whole once its transmission would be complete. Defaults to None.
+     - framing: A :class:`Framing` object for protocols that do not use terminators, for
+       example :class:`FixedLengthFraming` or :class:`LengthFieldFraming`. If it is None
+       (the default), the framing is determined by in_terminator and out_terminator.
      - commands: A list of :class:`~CommandBase`-objects that define mappings between protocol
        and device/interface methods/attributes.
 
@@ -721,27 +2133,55 @@ class StreamInterface(InterfaceBase):
 
     readtimeout = 100
 
+    reply_delay = 0
+    baud_rate = None
+
+    framing = None
+
     commands = None
 
     def __init__(self):
         super(StreamInterface, self).__init__()
         self.bound_commands = None
+        self.command_index = None
 
     @property
     def adapter(self):
         return StreamAdapter
 
+    def get_framing(self):
+        """
+        Returns the :class:`Framing` of the interface. If the framing-attribute is not set,
+        it is determined by the terminators: if in_terminator is empty, requests are
+        terminated by the read timeout (:class:`TimeoutFraming`), otherwise by the
+        terminator (:class:`TerminatorFraming`).
+
+        :return: The framing used for requests and replies.
+        """
+        if self.framing is not None:
+            return self.framing
+
+        return _get_terminator_framing(self.in_terminator, self.out_terminator)
+
     def _bind_device(self):
         """
         This method implements ``_bind_device`` from :class:`~lewis.core.devices.InterfaceBase`.
         It binds Cmd and Var definitions to implementations in Interface and Device.
         """
+        self._apply_binding(self._create_binding(self.device))
+
+    def _create_binding(self, device):
+        """
+        Returns the list of bound commands for the supplied device and a
+        :class:`CommandIndex` for them, see
+        :meth:`~lewis.core.devices.InterfaceBase._create_binding`.
+        """
         patterns = set()
 
-        self.bound_commands = []
+        bound_commands = []
 
         for cmd in self.commands:
-            bound = cmd.bind(self) or cmd.bind(self.device) or None
+            bound = cmd.bind(self) or cmd.bind(device) or None
 
             if bound is None:
                 raise RuntimeError(
@@ -757,7 +2197,12 @@ class StreamInterface(InterfaceBase):
 
                 patterns.add(pattern)
 
-                self.bound_commands.append(bound_cmd)
+                bound_commands.append(bound_cmd)
+
+        return bound_commands, CommandIndex(bound_commands)
+
+    def _apply_binding(self, binding):
+        self.bound_commands, self.command_index = binding
 
     def handle_error(self, request, error):
         """
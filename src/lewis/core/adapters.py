@@ -28,7 +28,7 @@ from collections import namedtuple
 
 from lewis.core.exceptions import LewisException
 from lewis.core.logging import has_log
-from lewis.core.utils import dict_strict_update
+from lewis.core.utils import dict_strict_update, monotonic, RollingStatistics, read_lock
 
 
 class NoLock(object):
@@ -47,6 +47,107 @@ class NoLock(object):
         pass
 
 
+class LockRequests(object):
+    """
+    Keeps track of the number of threads that are waiting to acquire a lock via
+    :meth:`acquire`. Another thread that repeatedly acquires the same lock can use
+    :meth:`wait` to let these threads go first, which is necessary because ``threading.Lock``
+    does not guarantee that waiting threads are served in any particular order.
+    """
+
+    def __init__(self):
+        self._pending = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, lock):
+        """
+        Acquires the supplied lock and counts this thread as waiting until that has happened.
+
+        :param lock: The lock to acquire.
+        """
+        with self._condition:
+            self._pending += 1
+
+        try:
+            lock.acquire()
+        finally:
+            with self._condition:
+                self._pending -= 1
+                self._condition.notify_all()
+
+    def wait(self, timeout):
+        """
+        Blocks until no thread is waiting in :meth:`acquire` anymore or the timeout expires.
+
+        :param timeout: Maximum time to wait in seconds.
+        :return: True if no thread is waiting for the lock anymore.
+        """
+        deadline = monotonic() + timeout
+
+        with self._condition:
+            while self._pending:
+                remaining = deadline - monotonic()
+
+                if remaining <= 0.0:
+                    return False
+
+                self._condition.wait(remaining)
+
+        return True
+
+
+class TimedLock(object):
+    """
+    A context manager that acquires and releases the supplied lock and records how long
+    it took to acquire the lock and for how long it was held. The times are added to the
+    supplied :class:`~lewis.core.utils.RollingStatistics`-objects. Each instance must only
+    be used from one thread at a time.
+
+    If the lock has a ``read``-member for shared access, like
+    :class:`~lewis.core.utils.ReadWriteLock`, the TimedLock has a ``read``-member as well,
+    which records its times in the same statistics.
+
+    :param lock: The lock to acquire.
+    :param wait_statistics: Statistics for the time spent waiting for the lock.
+    :param hold_statistics: Statistics for the time the lock was held.
+    :param requests: Optional :class:`LockRequests` that counts the threads waiting for the lock.
+    """
+
+    def __init__(self, lock, wait_statistics, hold_statistics, requests=None):
+        self._lock = lock
+        self._wait_statistics = wait_statistics
+        self._hold_statistics = hold_statistics
+        self._requests = requests
+        self._acquired = None
+
+        shared_lock = read_lock(lock)
+
+        if shared_lock is not lock:
+            self.read = TimedLock(shared_lock, wait_statistics, hold_statistics, requests)
+
+    def acquire(self):
+        start = monotonic()
+
+        if self._requests is not None:
+            self._requests.acquire(self._lock)
+        else:
+            self._lock.acquire()
+
+        self._acquired = monotonic()
+
+        self._wait_statistics.add(self._acquired - start)
+
+    def release(self):
+        self._hold_statistics.add(monotonic() - self._acquired)
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
 @has_log
 class Adapter(object):
     """
@@ -83,15 +184,32 @@ class Adapter(object):
     the device (or interface). This means that before starting the server component of an Adapter,
     a proper Lock-object needs to be assigned to ``lock``.
 
+    When a request modifies the device, an adapter should mark the device as changed (see
+    :meth:`~lewis.core.devices.DeviceBase._mark_changed`) before it releases the lock, so
+    that no other thread can use cached replies in between. Afterwards it should call
+    :meth:`request_cycle`, so that the simulation can react to the change without waiting for
+    the next regular cycle, if it is configured to do so.
+
+    Some protocol libraries only support one server per process. Adapters that use such a
+    library set ``one_per_process`` to True, so that
+    :class:`~lewis.core.fleet.SimulationHost` refuses to run more than one of them.
+
+    Before an adapter is started, an asyncio event loop may be assigned to ``event_loop``.
+    Adapters that are based on asyncio then run their server on that loop instead of creating
+    their own, the owner of the loop runs it (see :attr:`socket_server`).
+
     :param options: Configuration options for the adapter.
     """
     default_options = {}
+    one_per_process = False
 
     def __init__(self, options=None):
         super(Adapter, self).__init__()
         self._interface = None
 
         self.device_lock = NoLock()
+        self.cycle_request = None
+        self.event_loop = None
 
         options = options or {}
         combined_options = dict(self.default_options)
@@ -180,6 +298,30 @@ class Adapter(object):
             'Adapters must implement the is_running property to indicate whether '
             'a server is currently running and listening for requests.')
 
+    def request_cycle(self):
+        """
+        Signals to the simulation that a simulation cycle should be processed as soon as
+        possible, for example because a request has modified the device. This sets the
+        ``threading.Event`` in ``cycle_request``, which is assigned by
+        :class:`AdapterCollection` when the adapter is started. If there is no such event,
+        no cycle is requested.
+        """
+        if self.cycle_request is not None:
+            self.cycle_request.set()
+
+    @property
+    def socket_server(self):
+        """
+        Adapters that process requests with an asyncore-based server, or with an asyncio-based
+        server on the loop in ``event_loop``, return that server here, for all other adapters
+        this is None. Such a server provides either its ``socket_map`` (asyncore) or its
+        ``loop`` (asyncio) and the methods ``get_timeout`` and ``process_pending``, so that the
+        sockets of many adapters can be polled together
+        (see :class:`~lewis.core.fleet.SimulationHost`) instead of calling :meth:`handle` for
+        each adapter.
+        """
+        return None
+
     def handle(self, cycle_delay=0.1):
         """
         This function is called on each cycle of a simulation. It should process requests that are
@@ -211,7 +353,17 @@ class AdapterCollection(object):
     names at all will start/stop all adapters. These semantics also apply for :meth:`is_connected`
     and `documentation`.
 
-    This class also makes sure that all adapters use the same Lock for device interaction.
+    This class also makes sure that all adapters use the same lock for device interaction. By
+    default it's a ``threading.Lock``, but it can be replaced via the ``device_lock`` property,
+    for example by a :class:`~lewis.core.utils.ReadWriteLock` so that read-only requests
+    do not have to wait for each other. The
+    time each adapter spends waiting for and holding that lock, as well as the duration of
+    its handle-calls, are recorded and can be obtained via :meth:`statistics`.
+
+    By default, each adapter is running in its own thread once it has been connected. When many
+    devices are simulated in the same process, this can be switched off via the ``threaded``
+    property, the adapters are then only started on :meth:`connect` and requests are processed
+    in the calling thread each time :meth:`handle` is called.
 
     :param args: List of adapters to add to the container
     """
@@ -221,7 +373,11 @@ class AdapterCollection(object):
 
         self._threads = {}
         self._running = {}
+        self._statistics = {}
         self._lock = threading.Lock()
+        self._lock_requests = LockRequests()
+        self._cycle_request = threading.Event()
+        self._threaded = True
 
         for adapter in args:
             self.add_adapter(adapter)
@@ -232,14 +388,59 @@ class AdapterCollection(object):
         This lock is passed to each adapter when it's started. It's supposed to be used to ensure
         that the device is only accessed from one thread at a time, for example during network IO.
         :class:`~lewis.core.simulation.Simulation` uses this lock to block the device during the
-        simulation cycle calculations.
+        simulation cycle calculations. The lock can only be replaced while no adapters are
+        connected.
         """
         return self._lock
 
-    def set_device(self, new_device):
-        """Bind the new device to all interfaces managed by the adapters in the collection."""
-        for adapter in self._adapters.values():
-            adapter.interface.device = new_device
+    @device_lock.setter
+    def device_lock(self, new_lock):
+        if self._running:
+            raise RuntimeError('Can not replace device lock while adapters are connected.')
+
+        self._lock = new_lock
+
+    @property
+    def cycle_request(self):
+        """
+        This ``threading.Event`` is passed to each adapter when it's started. Adapters set it
+        via :meth:`Adapter.request_cycle` after modifying the device, so that
+        :class:`~lewis.core.simulation.Simulation` can process a cycle right away.
+        """
+        return self._cycle_request
+
+    @property
+    def threaded(self):
+        """
+        If True (default), each adapter runs in a separate thread after it has been connected.
+        Otherwise :meth:`handle` must be called regularly to process requests. This property
+        can only be changed while none of the adapters are connected.
+        """
+        return self._threaded
+
+    @threaded.setter
+    def threaded(self, threaded):
+        if self._running:
+            raise RuntimeError('Can not change threading mode while adapters are connected.')
+
+        self._threaded = bool(threaded)
+
+    def set_device(self, new_device, bindings=None):
+        """
+        Bind the new device to all interfaces managed by the adapters in the collection.
+        Bindings that were created in advance for the device can be supplied as a dictionary
+        of protocol: binding pairs (see :class:`~lewis.core.devices.DevicePool`).
+
+        :param new_device: The device to bind to the interfaces.
+        :param bindings: Optional dictionary with a binding for each protocol.
+        """
+        bindings = bindings or {}
+
+        for protocol, adapter in self._adapters.items():
+            if protocol in bindings:
+                adapter.interface.set_device(new_device, bindings[protocol])
+            else:
+                adapter.interface.device = new_device
 
     def add_adapter(self, adapter):
         """
@@ -253,6 +454,10 @@ class AdapterCollection(object):
                 'Adapter for protocol \'{}\' is already registered.'.format(adapter.protocol))
 
         self._adapters[adapter.protocol] = adapter
+        self._statistics[adapter.protocol] = {
+            'handle': RollingStatistics(),
+            'lock_wait': RollingStatistics(),
+            'lock_hold': RollingStatistics()}
 
     def remove_adapter(self, protocol):
         """
@@ -266,6 +471,7 @@ class AdapterCollection(object):
                 'Can not remove adapter for protocol \'{}\', none registered.'.format(protocol))
 
         del self._adapters[protocol]
+        del self._statistics[protocol]
 
     @property
     def protocols(self):
@@ -275,7 +481,8 @@ class AdapterCollection(object):
     def connect(self, *args):
         """
         This method starts an adapter for each specified protocol in a separate thread, if the
-        adapter is not already running.
+        adapter is not already running. If ``threaded`` is False, the adapters are only started,
+        but no threads are created.
 
         :param args: List of protocols for which to start adapters or empty for all.
         """
@@ -283,9 +490,18 @@ class AdapterCollection(object):
             self._start_server(adapter)
 
     def _start_server(self, adapter):
-        if adapter.protocol not in self._threads:
+        if adapter.protocol not in self._running:
             self.log.info('Connecting device interface for protocol \'%s\'', adapter.protocol)
 
+            if not self._threaded:
+                adapter.device_lock = self._create_adapter_lock(adapter)
+                adapter.cycle_request = self._cycle_request
+                adapter.start_server()
+
+                self._running[adapter.protocol] = threading.Event()
+                self._running[adapter.protocol].set()
+                return
+
             adapter_thread = threading.Thread(target=self._adapter_loop,
                                               args=(adapter, 0.01))
             adapter_thread.daemon = True
@@ -300,15 +516,42 @@ class AdapterCollection(object):
             if not self._running[adapter.protocol].is_set():
                 raise LewisException("Adapter for '%s' failed to start!" % adapter.protocol)
 
+    def _create_adapter_lock(self, adapter):
+        """
+        Returns a :class:`TimedLock` for the supplied adapter, which wraps the device lock.
+        This ensures that the adapter is using the correct lock.
+        """
+        statistics = self._statistics[adapter.protocol]
+
+        return TimedLock(self._lock, statistics['lock_wait'], statistics['lock_hold'],
+                         self._lock_requests)
+
+    def wait_for_lock_requests(self, timeout=1.0):
+        """
+        Blocks until none of the adapters is waiting for the device lock anymore, so that a
+        thread which acquires the lock again right after releasing it does not keep the
+        adapters from processing their requests.
+
+        :param timeout: Maximum time to wait in seconds.
+        :return: True if no adapter is waiting for the device lock anymore.
+        """
+        return self._lock_requests.wait(timeout)
+
+    def _handle_adapter(self, adapter, cycle_delay):
+        start = monotonic()
+        adapter.handle(cycle_delay)
+        self._statistics[adapter.protocol]['handle'].add(monotonic() - start)
+
     def _adapter_loop(self, adapter, dt):
-        adapter.device_lock = self._lock  # This ensures that the adapter is using the correct lock
+        adapter.device_lock = self._create_adapter_lock(adapter)
+        adapter.cycle_request = self._cycle_request
         adapter.start_server()
 
         self._running[adapter.protocol].set()
 
         self.log.debug('Starting adapter loop for protocol %s.', adapter.protocol)
         while self._running[adapter.protocol].is_set():
-            adapter.handle(dt)
+            self._handle_adapter(adapter, dt)
 
         adapter.stop_server()
 
@@ -323,15 +566,48 @@ class AdapterCollection(object):
             self._stop_server(adapter)
 
     def _stop_server(self, adapter):
-        if adapter.protocol in self._threads:
+        if adapter.protocol in self._running:
             self.log.info('Disconnecting device interface for protocol \'%s\'', adapter.protocol)
 
             self._running[adapter.protocol].clear()
-            self._threads[adapter.protocol].join()
 
-            del self._threads[adapter.protocol]
+            if adapter.protocol in self._threads:
+                self._threads[adapter.protocol].join()
+                del self._threads[adapter.protocol]
+            else:
+                adapter.stop_server()
+
             del self._running[adapter.protocol]
 
+    @property
+    def socket_servers(self):
+        """
+        List of the socket servers (see :attr:`Adapter.socket_server`) of the connected
+        adapters.
+        """
+        servers = [self._adapters[protocol].socket_server for protocol in self._running]
+
+        return [server for server in servers if server is not None]
+
+    def handle(self, cycle_delay=0.1, skip_socket_servers=False):
+        """
+        Calls the handle-method of each connected adapter, so that pending requests are
+        processed in the calling thread. This is only possible if ``threaded`` is False,
+        otherwise a RuntimeError is raised.
+
+        :param cycle_delay: Approximate time each adapter may spend processing requests.
+        :param skip_socket_servers: Skip adapters with a socket server, the caller then polls
+                                    the servers in :attr:`socket_servers` itself.
+        """
+        if self._threaded:
+            raise RuntimeError('Adapters are running in their own threads, can not handle.')
+
+        for protocol in list(self._running.keys()):
+            adapter = self._adapters[protocol]
+
+            if not (skip_socket_servers and adapter.socket_server is not None):
+                self._handle_adapter(adapter, cycle_delay)
+
     def is_connected(self, *args):
         """
         If only one protocol is supplied, a single bool is returned with the connection status.
@@ -360,6 +636,24 @@ class AdapterCollection(object):
         return {adapter.protocol: adapter._options._asdict()
                 for adapter in self._get_adapters(args)}
 
+    def statistics(self, *args):
+        """
+        Returns a dictionary with timing statistics for the specified adapters. The keys of
+        the dictionary are the adapter protocols, for each adapter statistics are available for
+        the time spent waiting for the device lock (``lock_wait``), the time the lock was held
+        while processing requests (``lock_hold``) and the duration of the calls to the adapter's
+        handle-method, which includes time spent waiting for requests (``handle``). Each
+        entry contains the values described in
+        :meth:`~lewis.core.utils.RollingStatistics.summary`, times are in seconds.
+
+        :param args: List of protocols for which to get statistics, empty for all adapters.
+        :return: Dict of protocol: statistics pairs.
+        """
+        return {adapter.protocol: {
+            name: statistics.summary()
+            for name, statistics in self._statistics[adapter.protocol].items()}
+            for adapter in self._get_adapters(args)}
+
     def documentation(self, *args):
         """
         Returns the concatenated documentation for the adapters specified by the supplied
@@ -65,6 +65,41 @@ class ProtocolException(Exception):
     """
 
 
+def _get_result(response, request_id):
+    """
+    Checks the JSON-RPC response to the request with the supplied id and returns its result.
+    Server side exceptions are raised using the same type as on the server if they are part of
+    the exceptions-module. Otherwise, a RemoteException is raised.
+
+    :param response: JSON-RPC response as returned by :meth:`ControlClient.json_rpc`.
+    :param request_id: Id of the request as returned by :meth:`ControlClient.json_rpc`.
+    :return: Result of the remote call if successful.
+    """
+    if 'id' not in response:
+        raise ProtocolException('JSON-RPC response does not contain ID field.')
+
+    if response['id'] != request_id:
+        raise ProtocolException(
+            'ID of JSON-RPC request ({}) did not match response ({}).'.format(
+                request_id, response['id']))
+
+    if 'result' in response:
+        return response['result']
+
+    if 'error' in response:
+        if 'data' in response['error']:
+            exception_type = response['error']['data']['type']
+            exception_message = response['error']['data']['message']
+
+            if not hasattr(exceptions, exception_type):
+                raise RemoteException(exception_type, exception_message)
+            else:
+                exception = getattr(exceptions, exception_type)
+                raise exception(exception_message)
+        else:
+            raise ProtocolException(response['error']['message'])
+
+
 class ControlClient(object):
     """
     This class provides an interface to a ControlServer instance on
@@ -126,6 +161,19 @@ class ControlClient(object):
                 'The ZMQ connection to {} timed out after {:.2f}s.'.format(
                     self._connection_string, self.timeout / 1000))
 
+    def request(self, method, *args):
+        """
+        Calls the supplied method on the remote with the supplied arguments and returns
+        the result. In contrast to :meth:`json_rpc`, the response is checked and server
+        side exceptions are raised on the client, as for the methods of objects returned
+        by :meth:`get_object`.
+
+        :param method: Method to call on remote.
+        :param args: Arguments to method call.
+        :return: Result of the remote call if successful.
+        """
+        return _get_result(*self.json_rpc(method, *args))
+
     def get_object(self, object_name=''):
         api, request_id = self.json_rpc(object_name + ':api')
 
@@ -202,31 +250,7 @@ class ObjectProxy(object):
         :param args: Positional arguments to the method call.
         :return: Result of the remote call if successful.
         """
-        response, request_id = self._connection.json_rpc(self._prefix + method, *args)
-
-        if 'id' not in response:
-            raise ProtocolException('JSON-RPC response does not contain ID field.')
-
-        if response['id'] != request_id:
-            raise ProtocolException(
-                'ID of JSON-RPC request ({}) did not match response ({}).'.format(
-                    request_id, response['id']))
-
-        if 'result' in response:
-            return response['result']
-
-        if 'error' in response:
-            if 'data' in response['error']:
-                exception_type = response['error']['data']['type']
-                exception_message = response['error']['data']['message']
-
-                if not hasattr(exceptions, exception_type):
-                    raise RemoteException(exception_type, exception_message)
-                else:
-                    exception = getattr(exceptions, exception_type)
-                    raise exception(exception_message)
-            else:
-                raise ProtocolException(response['error']['message'])
+        return _get_result(*self._connection.json_rpc(self._prefix + method, *args))
 
     def _add_member_proxies(self, members):
         for member in [str(m) for m in members]:
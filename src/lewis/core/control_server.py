@@ -38,6 +38,7 @@ from jsonrpc import JSONRPCResponseManager
 
 from .exceptions import LewisException
 from .logging import has_log
+from .utils import read_lock
 
 
 class ExposedObject(object):
@@ -70,22 +71,31 @@ class ExposedObject(object):
     for example when multiple threads are accessing it on the server side. For this purpose,
     the ``lock``-parameter can be used. If it is not ``None``, the exposed methods are wrapped
     in a function that acquires the lock before accessing ``obj``, and releases it afterwards.
+    Property getters only require read access, so for a :class:`~lewis.core.utils.ReadWriteLock`
+    they only acquire the lock for shared access.
+
+    If ``on_modify`` is not ``None``, it is called without arguments after each call of an
+    exposed method or property setter, while the lock is still held. Property getters and
+    ``:api`` are considered read-only and do not trigger it.
 
     :param obj: The object to expose.
     :param members: This list of methods will be exposed. (defaults to all public members)
     :param exclude: Members in this list will not be exposed.
     :param exclude_inherited: Should inherited members be excluded? (defaults to False)
     :param lock: ``threading.Lock`` that is used when accessing ``obj``.
+    :param on_modify: Function that is called after ``obj`` has been accessed for writing.
     """
 
-    def __init__(self, obj, members=None, exclude=None, exclude_inherited=False, lock=None):
+    def __init__(self, obj, members=None, exclude=None, exclude_inherited=False, lock=None,
+                 on_modify=None):
         super(ExposedObject, self).__init__()
 
         self._object = obj
         self._function_map = {}
         self._lock = lock
+        self._on_modify = on_modify
 
-        self._add_function(':api', self.get_api)
+        self._add_function(':api', self.get_api, read_only=True)
 
         exposed_members = members if members else self._public_members()
         exclude = list(exclude or [])
@@ -140,24 +150,41 @@ class ExposedObject(object):
         return item in self._function_map
 
     def _add_property(self, name):
-        self._add_function('{}:get'.format(name), lambda: getattr(self._object, name))
+        self._add_function('{}:get'.format(name), lambda: getattr(self._object, name),
+                           read_only=True)
         self._add_function('{}:set'.format(name), lambda value: setattr(self._object, name, value))
 
-    def _add_function(self, name, function):
+    def _add_function(self, name, function, read_only=False):
         if not callable(function):
             raise TypeError('Only callable objects can be exposed.')
 
+        if self._on_modify is not None and not read_only:
+            function = self._create_modify_wrapper(function)
+
         if self._lock is not None:
-            def create_locking_wrapper(f):
-                def locking_wrapper_function(*args, **kwargs):
-                    with self._lock:
-                        return f(*args, **kwargs)
+            function = self._create_locking_wrapper(
+                function, read_lock(self._lock) if read_only else self._lock)
 
-                return locking_wrapper_function
+        self._function_map[name] = function
 
-            function = create_locking_wrapper(function)
+    def _create_modify_wrapper(self, function):
+        on_modify = self._on_modify
 
-        self._function_map[name] = function
+        def modify_wrapper_function(*args, **kwargs):
+            try:
+                return function(*args, **kwargs)
+            finally:
+                on_modify()
+
+        return modify_wrapper_function
+
+    @staticmethod
+    def _create_locking_wrapper(function, lock):
+        def locking_wrapper_function(*args, **kwargs):
+            with lock:
+                return function(*args, **kwargs)
+
+        return locking_wrapper_function
 
     def _remove_function(self, name):
         del self._function_map[name]
@@ -21,14 +21,17 @@
 This module contains :class:`DeviceBase` as a base class for other device classes and
 infrastructure that can import devices from a module (:class:`DeviceRegistry`). The latter also
 produces factory-like objects that create device instances and interfaces based on setups
-(:class:`DeviceBuilder`).
+(:class:`DeviceBuilder`). To switch between setups quickly, :class:`DevicePool` keeps devices
+for a number of setups ready.
 """
 
 import importlib
+import threading
 
 from lewis import __version__
 from lewis.core.exceptions import LewisException
 from lewis.core.logging import has_log
+from lewis.core.processor import CanProcess
 from lewis.core.utils import get_submodules, get_members, is_compatible_with_framework
 
 
@@ -38,8 +41,107 @@ class DeviceBase(object):
     This class is a common base for :class:`~lewis.devices.Device` and
     :class:`~lewis.devices.StateMachineDevice`. It is mainly used in the device
     discovery process.
+
+    It also defines which parts of a device are stored in a snapshot
+    (see :meth:`~lewis.core.simulation.Simulation.snapshot`) and keeps track of changes
+    to the device via :attr:`_change_generation`.
     """
 
+    # Incremented on each change, replies cached for an older generation are outdated
+    _change_generation = 0
+
+    # Generation of the last change that was not restricted to certain members
+    _all_changed_generation = 0
+
+    # Members used for change tracking, they are not part of snapshots
+    _change_tracking_members = (
+        '_change_generation', '_all_changed_generation', '_changed_members')
+
+    def _mark_changed(self, *members):
+        """
+        Signals that the device has changed. This is called by the framework after requests
+        that modify the device, so that replies cached by adapters
+        (see :class:`~lewis.adapters.stream.Var`) are no longer used. Devices that are
+        modified outside of the simulation cycle, for example from another thread, should
+        call this method afterwards.
+
+        If names of members are supplied, only those members are considered to be changed,
+        otherwise any member may have changed. Devices should mark the members they change
+        while processing a cycle explicitly, if their interface relies on change tracking
+        (see for example :class:`~lewis.adapters.epics.EpicsInterface`).
+
+        :param members: Names of the changed members.
+        """
+        generation = self._change_generation + 1
+
+        # The members are recorded before the generation is published, so that anyone who
+        # has seen the new generation also finds the changed members.
+        if members:
+            changed_members = vars(self).setdefault('_changed_members', {})
+
+            for member in members:
+                changed_members[member] = generation
+        else:
+            self._all_changed_generation = generation
+
+        self._change_generation = generation
+
+    def _mark_processed(self):
+        """
+        This is called by the simulation after each cycle. It invalidates cached replies like
+        :meth:`_mark_changed`, but does not mark any members as changed.
+        """
+        self._change_generation += 1
+
+    def _get_changed_members(self, generation):
+        """
+        Returns the names of the members that have been marked as changed after the supplied
+        generation (see :attr:`_change_generation`). If all members may have changed since
+        then, None is returned instead.
+
+        :param generation: Change generation at the time of the last check.
+        :return: Set of member names or None.
+        """
+        if self._all_changed_generation > generation:
+            return None
+
+        return {member for member, member_generation in vars(self).get(
+            '_changed_members', {}).items() if member_generation > generation}
+
+    def _get_snapshot(self):
+        """
+        Returns the data of the device that is stored in a snapshot. The returned object must
+        be picklable. By default, these are all instance attributes except processors, such
+        as the state machine of a :class:`~lewis.devices.StateMachineDevice`, and the
+        list of processors itself.
+
+        :return: Dictionary with data members of the device.
+        """
+        return {name: value for name, value in vars(self).items()
+                if self._is_snapshot_member(name, value)}
+
+    def _restore_snapshot(self, snapshot):
+        """
+        Restores data that was obtained from :meth:`_get_snapshot`. Instance attributes that
+        did not exist when the snapshot was taken are removed, so that class attributes of the
+        same name become visible again.
+
+        :param snapshot: Data obtained from :meth:`_get_snapshot`.
+        """
+        for name, value in list(vars(self).items()):
+            if name not in snapshot and self._is_snapshot_member(name, value):
+                delattr(self, name)
+
+        for name, value in snapshot.items():
+            setattr(self, name, value)
+
+        self._mark_changed()
+
+    @staticmethod
+    def _is_snapshot_member(name, value):
+        return (name != '_processors' and name not in DeviceBase._change_tracking_members
+                and not isinstance(value, CanProcess))
+
 
 @has_log
 class InterfaceBase(object):
@@ -50,6 +152,10 @@ class InterfaceBase(object):
 
     There is a 1:1 correspondence between device and interface, where the interface holds a
     reference to the device. It can be changed through the ``device``-property.
+
+    Interfaces that do expensive work when a device is bound can split :meth:`_bind_device`
+    into :meth:`_create_binding` and :meth:`_apply_binding`. Bindings for a device can then
+    be created in advance (see :class:`DevicePool`) and passed to :meth:`set_device`.
     """
 
     protocol = None
@@ -77,8 +183,23 @@ class InterfaceBase(object):
 
     @device.setter
     def device(self, new_device):
+        self.set_device(new_device)
+
+    def set_device(self, new_device, binding=None):
+        """
+        Binds a new device to the interface. If a binding is supplied that was obtained from
+        :meth:`_create_binding` for the same device, it is used instead of calling
+        :meth:`_bind_device`.
+
+        :param new_device: The device to bind to the interface.
+        :param binding: Binding created in advance for ``new_device`` or None.
+        """
         self._device = new_device
-        self._bind_device()
+
+        if binding is None:
+            self._bind_device()
+        else:
+            self._apply_binding(binding)
 
     def _bind_device(self):
         """
@@ -89,6 +210,27 @@ class InterfaceBase(object):
         """
         pass
 
+    def _create_binding(self, device):
+        """
+        Performs the binding steps for the supplied device without modifying the interface and
+        returns the result, which can be passed to :meth:`set_device` later on. This method
+        may be called from another thread while the interface is in use.
+
+        The default implementation returns None, so that :meth:`_bind_device` is used.
+
+        :param device: The device for which to create the binding.
+        :return: Object that can be passed to :meth:`_apply_binding` or None.
+        """
+        return None
+
+    def _apply_binding(self, binding):
+        """
+        Applies a binding that was created by :meth:`_create_binding`.
+
+        :param binding: Object that was returned by :meth:`_create_binding`.
+        """
+        pass
+
 
 def is_device(obj):
     """
@@ -375,6 +517,113 @@ class DeviceBuilder(object):
                     protocol, self.name, '\n    '.join(self.interfaces.keys())))
 
 
+@has_log
+class DevicePool(object):
+    """
+    This class keeps devices for a number of setups ready, so that switching to one of these
+    setups does not require constructing and binding a new device. The devices are created
+    in a background thread, along with bindings for the supplied interfaces (see
+    :meth:`InterfaceBase._create_binding`). Each device can only be taken once, after that
+    a replacement is created in the background.
+
+    .. sourcecode:: Python
+
+        pool = DevicePool(builder, ['default', 'broken'], interfaces)
+        pool.fill()
+
+        device, bindings = pool.take('broken')
+
+    If creating the device for a setup fails, the error is logged and the setup is removed
+    from the pool.
+
+    :param device_builder: :class:`DeviceBuilder` that is used to create the devices.
+    :param setups: Names of the setups for which devices are kept ready.
+    :param interfaces: Interfaces for which bindings are created.
+    """
+
+    def __init__(self, device_builder, setups, interfaces=()):
+        self._device_builder = device_builder
+        self._setups = list(setups)
+        self._interfaces = list(interfaces)
+
+        self._devices = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def setups(self):
+        """Names of the setups for which devices are kept ready."""
+        return list(self._setups)
+
+    @property
+    def ready(self):
+        """Names of the setups for which a device can currently be taken from the pool."""
+        with self._lock:
+            return list(self._devices.keys())
+
+    def fill(self, background=True):
+        """
+        Creates devices for all setups that currently have no device in the pool.
+
+        :param background: If True, the devices are created in a daemon thread.
+        """
+        if not background:
+            self._fill()
+            return
+
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._fill)
+                self._thread.daemon = True
+                self._thread.start()
+
+    def take(self, setup):
+        """
+        Removes the device for the specified setup from the pool and returns it, along with a
+        dictionary of protocol: binding pairs. If there is no device for the setup, None is
+        returned. Otherwise, creating a replacement is started in the background.
+
+        :param setup: Name of the setup.
+        :return: Tuple of device and bindings or None.
+        """
+        with self._lock:
+            entry = self._devices.pop(setup, None)
+
+        if entry is not None:
+            self.fill()
+
+        return entry
+
+    def _fill(self):
+        while True:
+            with self._lock:
+                missing = [setup for setup in self._setups if setup not in self._devices]
+
+                if not missing:
+                    self._thread = None
+                    return
+
+            setup = missing[0]
+
+            try:
+                device = self._device_builder.create_device(setup)
+                bindings = {interface.protocol: interface._create_binding(device)
+                            for interface in self._interfaces}
+            except Exception as e:
+                self.log.error('Failed to create device for setup \'%s\', removing it from the '
+                               'pool: %s', setup, e)
+
+                with self._lock:
+                    self._setups.remove(setup)
+
+                continue
+
+            with self._lock:
+                self._devices[setup] = (device, bindings)
+
+            self.log.debug('Device for setup \'%s\' is ready.', setup)
+
+
 @has_log
 class DeviceRegistry(object):
     """
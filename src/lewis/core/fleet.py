@@ -0,0 +1,675 @@
+# -*- coding: utf-8 -*-
+# *********************************************************************
+# lewis - a library for creating hardware device simulators
+# Copyright (C) 2016-2017 European Spallation Source ERIC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# *********************************************************************
+
+"""
+This module makes it possible to run a whole "fleet" of simulated devices in one process.
+:func:`create_fleet` creates a number of :class:`~lewis.core.simulation.Simulation`-objects
+from a fleet description, :class:`SimulationHost` runs them cooperatively in a single thread.
+
+To make use of more than one CPU core, :class:`SimulationSupervisor` distributes the devices
+of a fleet across several worker processes, each of which runs a :class:`SimulationHost`.
+"""
+
+import multiprocessing
+import sys
+from functools import partial
+from time import sleep
+
+# asyncore has been removed in Python 3.12, asyncio is not available in Python 2.
+try:
+    import asyncore
+except ImportError:
+    asyncore = None
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+from lewis.core.control_client import ControlClient
+from lewis.core.control_server import ControlServer, ExposedObjectCollection
+from lewis.core.exceptions import LewisException
+from lewis.core.logging import has_log
+from lewis.core.simulation import SimulationFactory
+from lewis.core.utils import monotonic
+
+# Keys of a device description that are assigned to the simulation properties of the same name
+_simulation_parameters = ('cycle_delay', 'speed', 'wake_on_write', 'idle_cycles',
+                          'idle_cycle_delay')
+
+
+def get_device_descriptions(fleet_description):
+    """
+    Validates the supplied fleet description (see :func:`create_fleet`) and returns the
+    dictionary of device descriptions it contains. If the description is invalid,
+    a :class:`~lewis.core.exceptions.LewisException` is raised.
+
+    :param fleet_description: Dictionary with fleet description.
+    :return: Dictionary of name: device description pairs.
+    """
+    valid_keys = {'device', 'setup', 'protocols'} | set(_simulation_parameters)
+
+    devices = (fleet_description or {}).get('devices')
+
+    if not devices:
+        raise LewisException('The fleet description does not contain any devices.')
+
+    device_descriptions = {}
+
+    for name, description in devices.items():
+        name = str(name)
+
+        if ':' in name:
+            raise LewisException(
+                'Invalid device name \'{}\' in fleet description, names must '
+                'not contain \':\'.'.format(name))
+
+        description = description or {}
+
+        invalid_keys = set(description.keys()) - valid_keys
+        if invalid_keys:
+            raise LewisException(
+                'Invalid keys for device \'{}\' in fleet description: {}. Valid keys '
+                'are: {}'.format(name, ', '.join(invalid_keys), ', '.join(sorted(valid_keys))))
+
+        if 'device' not in description:
+            raise LewisException(
+                'No device specified for \'{}\' in fleet description.'.format(name))
+
+        device_descriptions[name] = description
+
+    return device_descriptions
+
+
+def create_fleet(fleet_description, simulation_factory):
+    """
+    Creates simulations according to a fleet description, which is a dictionary that is
+    usually loaded from a YAML file of the following form:
+
+    .. sourcecode:: yaml
+
+        devices:
+          chopper:
+            device: chopper
+            protocols:
+              epics: {prefix: 'CHOP:'}
+          linkam_1:
+            device: linkam_t95
+            setup: default
+            cycle_delay: 0.05
+            wake_on_write: true
+            idle_cycles: 50
+            protocols:
+              stream: {port: 9998}
+          linkam_2:
+            device: linkam_t95
+            protocols:
+              stream: {port: 9999}
+
+    Each entry in ``devices`` creates one simulation, only the ``device`` key is mandatory.
+    ``protocols`` is a dictionary of protocol names and adapter options, just like the ones
+    passed to ``lewis`` via the ``-p`` argument. If it is omitted, the default protocol of the
+    device is used, an empty dictionary creates a simulation without any interface. The values
+    of ``cycle_delay``, ``speed``, ``wake_on_write``, ``idle_cycles`` and ``idle_cycle_delay``
+    are assigned to the corresponding simulation properties.
+
+    pcaspy only supports one ChannelAccess server per process, so only one device with an
+    EPICS interface can be run by each :class:`SimulationHost`. To simulate several EPICS
+    devices, :class:`SimulationSupervisor` must be used with at least one worker per device.
+
+    If the description is invalid, a :class:`~lewis.core.exceptions.LewisException` is raised.
+
+    :param fleet_description: Dictionary with fleet description.
+    :param simulation_factory: :class:`~lewis.core.simulation.SimulationFactory` that is used
+                               to create the simulations.
+    :return: Dictionary of name: simulation pairs.
+    """
+    simulations = {}
+
+    for name, description in get_device_descriptions(fleet_description).items():
+        protocols = description.get('protocols', {None: {}})
+
+        simulation = simulation_factory.create(
+            description['device'], description.get('setup'), protocols or {})
+
+        for parameter in _simulation_parameters:
+            if parameter in description:
+                setattr(simulation, parameter, description[parameter])
+
+        simulations[name] = simulation
+
+    return simulations
+
+
+class _CombinedSocketMap(object):
+    """
+    This read-only mapping combines the socket maps of several asyncore-based servers, so
+    that ``asyncore.loop`` polls all of their sockets at once. Lookups always go to the
+    servers' own maps, sockets that are closed while events are processed are skipped.
+
+    :param socket_maps: List of socket maps.
+    """
+
+    def __init__(self, socket_maps):
+        self._socket_maps = socket_maps
+
+    def __len__(self):
+        return sum(len(socket_map) for socket_map in self._socket_maps)
+
+    def items(self):
+        return [item for socket_map in self._socket_maps for item in socket_map.items()]
+
+    def get(self, fd, default=None):
+        for socket_map in self._socket_maps:
+            if fd in socket_map:
+                return socket_map[fd]
+
+        return default
+
+
+@has_log
+class SimulationHost(object):
+    """
+    This class runs many simulations in a single thread. Instead of using threads for each
+    adapter and the control server of each simulation, a single loop polls the adapters of all
+    simulations and processes the devices whenever their next cycle is due. Each simulation
+    keeps its own adapters and device lock.
+
+    The sockets of all adapters that are based on asyncore (see
+    :attr:`~lewis.core.adapters.Adapter.socket_server`), such as the stream and Modbus
+    adapters, are polled together with one select-call, which is also how the host waits
+    for the next tick. Adapters that are based on asyncio, such as the stream adapter with
+    its default backend, all run their servers on one event loop of the host, which is run
+    instead of the select-call. If both kinds of adapters are used, the asyncore sockets are
+    polled without waiting before the loop is run. All other adapters are handled one by one.
+
+    Cycles are scheduled on a grid with a period of the simulation's cycle_delay. Fixed rate
+    and virtual time mode of the individual simulations are not used by the host. If a device
+    raises an exception during processing, the error is logged and only that simulation is
+    stopped. Simulations with wake_on_write enabled are processed early when one of their
+    adapters requests a cycle, without shifting the grid. Idle simulations are processed every
+    idle_cycle_delay seconds until one of their adapters requests a cycle.
+
+    The simulations can be exposed via one control server. The objects of each simulation are
+    available with the simulation's name as prefix, for example ``chopper_1.device`` or
+    ``chopper_1.simulation``.
+
+    Adapters of which only one can run per process (see
+    :attr:`~lewis.core.adapters.Adapter.one_per_process`), such as the EPICS adapter, may only
+    be used by one of the simulations, otherwise a
+    :class:`~lewis.core.exceptions.LewisException` is raised.
+
+    :param simulations: Dictionary of name: :class:`~lewis.core.simulation.Simulation` pairs.
+    :param control_server: 'host:port'-string to construct control server or None.
+    :param tick: Maximum time in seconds between two polls of the adapters.
+    """
+
+    def __init__(self, simulations, control_server=None, tick=0.01):
+        self._simulations = dict(simulations)
+        self._tick = tick
+
+        self._check_adapters()
+
+        self._started = False
+        self._stop_commanded = False
+
+        self._control_server = self._create_control_server(control_server)
+
+    def _check_adapters(self):
+        users = {}
+
+        for name, simulation in sorted(self._simulations.items()):
+            for adapter in simulation._adapters._get_adapters([]):
+                if adapter.one_per_process:
+                    users.setdefault(type(adapter).__name__, []).append(name)
+
+        for adapter_type, names in users.items():
+            if len(names) > 1:
+                raise LewisException(
+                    'Only one {} can run per process, but it is used by these simulations: '
+                    '{}. Please distribute them across several worker processes.'.format(
+                        adapter_type, ', '.join(names)))
+
+    def _create_control_server(self, control_server):
+        if control_server is None:
+            return None
+
+        object_map = {}
+
+        for name, simulation in self._simulations.items():
+            for object_name, exposed_object in simulation._create_exposed_objects().items():
+                object_map['{}.{}'.format(name, object_name)] = exposed_object
+
+        return ControlServer(object_map, control_server)
+
+    @property
+    def simulations(self):
+        """
+        Dictionary with the hosted simulations, the keys are the simulation names.
+        """
+        return dict(self._simulations)
+
+    @property
+    def is_started(self):
+        """
+        This property is true if the host has been started.
+        """
+        return self._started
+
+    def start(self):
+        """
+        Starts all simulations and processes them until :meth:`stop` is called or all
+        simulations have been stopped individually, for example via the control server.
+        """
+        self.log.info('Starting %s simulations', len(self._simulations))
+
+        self._started = True
+        self._stop_commanded = False
+
+        if self._control_server is not None:
+            self._control_server.start_server()
+
+        active = {}
+        event_loop = asyncio.new_event_loop() if asyncio is not None else None
+
+        try:
+            for name, simulation in self._simulations.items():
+                simulation._adapters.threaded = False
+
+                for adapter in simulation._adapters._get_adapters([]):
+                    adapter.event_loop = event_loop
+
+                simulation._begin_run()
+
+                active[name] = simulation
+
+            self._run(active)
+        finally:
+            for simulation in active.values():
+                simulation.stop()
+                simulation._end_run()
+
+            if event_loop is not None:
+                event_loop.close()
+
+            self._started = False
+
+        self.log.info('All simulations have ended.')
+
+    def _run(self, active):
+        now = monotonic()
+
+        last_cycle = {name: now for name in active}
+        next_cycle = dict(last_cycle)
+
+        while active and not self._stop_commanded:
+            tick_start = monotonic()
+
+            if self._control_server is not None:
+                self._control_server.process()
+
+            for name, simulation in list(active.items()):
+                if simulation._stop_commanded:
+                    simulation._end_run()
+
+                    del active[name]
+                    del last_cycle[name]
+                    del next_cycle[name]
+                    continue
+
+                simulation._adapters.handle(0.0, skip_socket_servers=True)
+
+                now = monotonic()
+
+                due = now >= next_cycle[name]
+
+                if due or self._cycle_requested(simulation, now - last_cycle[name]):
+                    self._process_simulation(name, simulation, now - last_cycle[name])
+                    last_cycle[name] = now
+
+                    next_cycle[name] = self._get_next_cycle(simulation, next_cycle[name], now, due)
+
+            wake_up = min([tick_start + self._tick] + list(next_cycle.values()))
+            self._poll_sockets(active.values(), max(0.0, wake_up - monotonic()))
+
+    @staticmethod
+    def _poll_sockets(simulations, timeout):
+        """
+        Waits up to ``timeout`` seconds for events on the sockets of the socket servers of
+        all supplied simulations and processes them. Servers are either based on asyncore,
+        then their sockets are polled together, or they share one asyncio event loop.
+        """
+        servers = [server for simulation in simulations
+                   for server in simulation._adapters.socket_servers]
+
+        for server in servers:
+            timeout = server.get_timeout(timeout)
+
+        socket_map = _CombinedSocketMap([server.socket_map for server in servers
+                                         if getattr(server, 'socket_map', None) is not None])
+        event_loop = next((server.loop for server in servers
+                           if getattr(server, 'socket_map', None) is None), None)
+
+        if event_loop is not None:
+            if socket_map:
+                asyncore.loop(0.0, count=1, map=socket_map)
+
+            event_loop.call_later(timeout, event_loop.stop)
+            event_loop.run_forever()
+        elif socket_map:
+            asyncore.loop(timeout, count=1, map=socket_map)
+        else:
+            sleep(timeout)
+
+        for server in servers:
+            server.process_pending()
+
+    def _process_simulation(self, name, simulation, delta):
+        try:
+            simulation._process_device(delta)
+        except Exception as e:
+            self.log.error('Error while processing simulation \'%s\', stopping it: %s', name, e)
+            simulation.stop()
+
+        simulation._statistics['cycle'].add(delta)
+
+    @staticmethod
+    def _cycle_requested(simulation, elapsed):
+        return ((simulation.wake_on_write or simulation.is_idle)
+                and elapsed >= simulation.min_wake_interval
+                and simulation._adapters.cycle_request.is_set())
+
+    @staticmethod
+    def _get_next_cycle(simulation, next_cycle, now, due):
+        delay = simulation.idle_cycle_delay if simulation.is_idle else simulation.cycle_delay
+
+        if due:
+            return max(next_cycle + delay, now)
+
+        # Early cycles keep the grid, unless the simulation was idle before
+        return min(next_cycle, now + delay)
+
+    def stop(self):
+        """
+        Stops all simulations and ends the loop started by :meth:`start`.
+        """
+        if self._started:
+            self.log.warning('Stopping all simulations')
+
+            self._stop_commanded = True
+
+
+def _run_worker(fleet_description, devices_package, strict_versions, control_server, tick,
+                add_paths=()):
+    """
+    Entry point of the worker processes started by :class:`SimulationSupervisor`. Worker
+    processes that are spawned instead of forked do not inherit modifications of ``sys.path``,
+    so the paths in ``add_paths`` are appended to it before the devices are imported.
+    """
+    for path in add_paths:
+        if path not in sys.path:
+            sys.path.append(path)
+
+    simulations = create_fleet(
+        fleet_description, SimulationFactory(devices_package, strict_versions))
+
+    try:
+        SimulationHost(simulations, control_server, tick).start()
+    except KeyboardInterrupt:
+        pass
+
+
+class RoutingObjectCollection(ExposedObjectCollection):
+    """
+    This collection exposes the objects of simulations that are running in other processes.
+    Calls to methods that are prefixed with a simulation name, for example
+    ``chopper_1.device.speed:get``, are forwarded to the control server of the
+    :class:`SimulationHost` that runs the simulation.
+
+    :param routes: Dictionary of simulation name: ``(host, port)`` pairs.
+    :param timeout: Timeout in milliseconds for forwarded calls.
+    """
+
+    def __init__(self, routes, timeout=3000):
+        super(RoutingObjectCollection, self).__init__({})
+
+        self._routes = dict(routes)
+        self._timeout = timeout
+        self._clients = {}
+
+    def __getitem__(self, item):
+        if item in self._function_map:
+            return self._function_map[item]
+
+        matching_names = [name for name in self._routes if item.startswith(name + '.')]
+
+        if not matching_names:
+            raise KeyError(item)
+
+        return partial(self._forward, self._routes[max(matching_names, key=len)], item)
+
+    def __contains__(self, item):
+        try:
+            self[item]
+        except KeyError:
+            return False
+
+        return True
+
+    def _forward(self, address, method, *args):
+        if address not in self._clients:
+            self._clients[address] = ControlClient(*address, timeout=self._timeout)
+
+        return self._clients[address].request(method, *args)
+
+    def get_objects(self):
+        """Returns the names of the exposed objects."""
+        return ['{}.{}'.format(name, object_name)
+                for name in self._routes for object_name in ('device', 'simulation', 'interface')]
+
+
+@has_log
+class SimulationSupervisor(object):
+    """
+    This class distributes the devices of a fleet description (see :func:`create_fleet`)
+    across a number of worker processes. Each worker runs a :class:`SimulationHost` for its
+    share of the devices, so that large fleets are not limited to a single CPU core.
+
+    Devices that have an EPICS interface in the fleet description are assigned to different
+    workers, because each process can only run one of them (see :func:`create_fleet`). If
+    there are more such devices than workers, a :class:`~lewis.core.exceptions.LewisException`
+    is raised.
+
+    The supervisor monitors the workers and restarts those that have terminated, at most once
+    per ``restart_delay`` seconds. All simulations can be accessed via one control server, which
+    forwards calls to the control server of the worker that runs the simulation. The workers'
+    control servers listen on localhost, on consecutive ports starting at ``worker_port``.
+
+    :param fleet_description: Dictionary with fleet description.
+    :param devices_package: Name of the package where devices are found.
+    :param workers: Number of worker processes.
+    :param control_server: 'host:port'-string to construct control server or None.
+    :param worker_port: Port of the control server of the first worker.
+    :param strict_versions: Version handling of devices, see
+                            :class:`~lewis.core.simulation.SimulationFactory`.
+    :param tick: Maximum time in seconds between two polls of the adapters in the workers.
+    :param restart_delay: Minimum time in seconds between two starts of the same worker.
+    :param add_paths: Paths that are appended to ``sys.path`` in the workers, for example
+                      to find a devices package that is not installed.
+    """
+
+    def __init__(self, fleet_description, devices_package, workers=2, control_server=None,
+                 worker_port=10100, strict_versions=None, tick=0.01, restart_delay=1.0,
+                 add_paths=None):
+        if workers < 1:
+            raise LewisException('At least one worker process is required.')
+
+        devices = get_device_descriptions(fleet_description)
+        names = self._get_ordered_names(devices, workers)
+
+        self._shards = [
+            {'devices': {name: devices[name] for name in names[index::workers]}}
+            for index in range(min(workers, len(names)))]
+
+        self._devices_package = devices_package
+        self._strict_versions = strict_versions
+        self._tick = tick
+        self._restart_delay = restart_delay
+        self._add_paths = list(add_paths or [])
+
+        self._worker_addresses = [
+            ('127.0.0.1', worker_port + index) for index in range(len(self._shards))]
+
+        self._processes = [None] * len(self._shards)
+        self._start_times = [None] * len(self._shards)
+        self._restarts = 0
+
+        self._started = False
+        self._stop_commanded = False
+
+        self._control_server = self._create_control_server(control_server)
+
+    @staticmethod
+    def _get_ordered_names(devices, workers):
+        """
+        Returns the device names in the order in which they are distributed across the
+        workers. Devices with an EPICS interface come first, so that each of them ends up
+        in a different worker.
+        """
+        epics_names = sorted(name for name, description in devices.items()
+                             if 'epics' in (description.get('protocols') or {}))
+
+        if len(epics_names) > workers:
+            raise LewisException(
+                'The fleet contains {} devices with an EPICS interface, but only one of them '
+                'can run per worker process. Please use at least {} workers.'.format(
+                    len(epics_names), len(epics_names)))
+
+        return epics_names + sorted(set(devices.keys()) - set(epics_names))
+
+    def _create_control_server(self, control_server):
+        if control_server is None:
+            return None
+
+        routes = {}
+
+        for shard, address in zip(self._shards, self._worker_addresses):
+            for name in shard['devices']:
+                routes[name] = address
+
+        return ControlServer(RoutingObjectCollection(routes), control_server)
+
+    @property
+    def workers(self):
+        """
+        Number of worker processes. This can be smaller than the requested number of workers
+        if the fleet contains fewer devices.
+        """
+        return len(self._shards)
+
+    @property
+    def restarts(self):
+        """
+        Number of times a worker process had to be restarted.
+        """
+        return self._restarts
+
+    @property
+    def is_started(self):
+        """
+        This property is true if the supervisor has been started.
+        """
+        return self._started
+
+    def start(self):
+        """
+        Starts the worker processes and supervises them until :meth:`stop` is called.
+        """
+        self.log.info('Starting %s workers', self.workers)
+
+        self._started = True
+        self._stop_commanded = False
+
+        if self._control_server is not None:
+            self._control_server.start_server()
+
+        try:
+            for index in range(self.workers):
+                self._start_worker(index)
+
+            while not self._stop_commanded:
+                if self._control_server is not None:
+                    self._control_server.process(blocking=True)
+                else:
+                    sleep(0.1)
+
+                self._check_workers()
+        finally:
+            self._stop_workers()
+            self._started = False
+
+        self.log.info('All workers have ended.')
+
+    def _start_worker(self, index):
+        host, port = self._worker_addresses[index]
+
+        process = multiprocessing.Process(
+            target=_run_worker,
+            args=(self._shards[index], self._devices_package, self._strict_versions,
+                  '{}:{}'.format(host, port), self._tick, self._add_paths))
+        process.daemon = True
+        process.start()
+
+        self._processes[index] = process
+        self._start_times[index] = monotonic()
+
+        self.log.debug('Started worker %s for devices: %s',
+                       index, ', '.join(sorted(self._shards[index]['devices'])))
+
+    def _check_workers(self):
+        for index, process in enumerate(self._processes):
+            if process.is_alive():
+                continue
+
+            if monotonic() - self._start_times[index] < self._restart_delay:
+                continue
+
+            self.log.warning('Worker %s terminated with exit code %s, restarting it.',
+                             index, process.exitcode)
+
+            self._restarts += 1
+            self._start_worker(index)
+
+    def _stop_workers(self):
+        for process in self._processes:
+            if process is not None and process.is_alive():
+                process.terminate()
+
+        for process in self._processes:
+            if process is not None:
+                process.join(timeout=1.0)
+
+    def stop(self):
+        """
+        Stops all worker processes and ends the loop started by :meth:`start`.
+        """
+        if self._started:
+            self.log.warning('Stopping all workers')
+
+            self._stop_commanded = True
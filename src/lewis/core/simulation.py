@@ -23,14 +23,17 @@ an :mod:`Adapter <lewis.adapters>`).
 """
 
 from datetime import datetime
+from itertools import count
 from time import sleep
 from threading import Thread
 
+from six.moves import cPickle as pickle
+
 from lewis.core.adapters import AdapterCollection
 from lewis.core.control_server import ControlServer, ExposedObject
-from lewis.core.devices import DeviceRegistry
+from lewis.core.devices import DeviceRegistry, DevicePool
 from lewis.core.logging import has_log
-from lewis.core.utils import seconds_since
+from lewis.core.utils import seconds_since, monotonic, RollingStatistics, ReadWriteLock
 
 
 @has_log
@@ -55,6 +58,34 @@ class Simulation(object):
     effectively stops all time dependent calculations in the
     simulated device.
 
+    If cycles should happen at a well defined rate, the simulation can be switched to
+    fixed rate mode via the fixed_rate-property. In that mode, a monotonic clock is used
+    to schedule the cycles on a grid with a period of cycle_delay, so that the time spent
+    in the device's process-method is subtracted from the waiting time. If a cycle can not
+    be started in time, it is counted in the overruns-property and the overrun_policy
+    determines whether missed cycles are dropped or processed as quickly as possible.
+
+    For running long scenarios in less time, the simulation can be switched to virtual time
+    via the virtual_time-property. Instead of measuring the time between cycles, the simulated
+    time then advances in fixed steps of cycle_delay without sleeping between cycles. Before
+    each step, the simulation waits until adapters that are waiting for the device lock have
+    acquired it, so that requests are still processed between two steps. In combination with the
+    duration-argument of the start-method this makes it possible to run, for example, a
+    simulated hour in a fraction of that time.
+
+    By default, changes made to the device through one of the adapters are only processed in the
+    next regular cycle. To reduce that latency, the wake_on_write-property can be set. Adapters
+    then request a cycle after each write and the simulation starts the next cycle right away,
+    but not before min_wake_interval seconds have passed since the last one ended.
+
+    Devices that spend most of their time in a resting state do not need to be processed at the
+    full rate. If the idle_cycles-property is larger than 0, the simulation becomes idle after
+    that many consecutive cycles in which the state of the device's state machine did not change
+    and no adapter request modified the device. While idle, cycles are processed every
+    idle_cycle_delay seconds. The full rate is restored as soon as an adapter modifies the device
+    or the state machine changes state. Changes made via the control server are picked up in the
+    next idle cycle.
+
     Another possibility to pause the simulation is the pause-method. After
     calling it, all processing in the device is suspended, while the communication
     adapters continue to work. This can be used to simulate that a device is "hanging".
@@ -64,7 +95,9 @@ class Simulation(object):
     The total uptime (in actually elapsed time) can be obtained through the
     uptime-property, whereas the runtime-property contains the simulated time.
     The cycles-property indicates the total number of simulation cycles, which
-    does not increase when the simulation is paused.
+    does not increase when the simulation is paused. Timing statistics of the cycles and the
+    adapters are available via the stats-property, which helps to find out where time is spent
+    when a simulation does not perform as expected.
 
     Finally, the simulation can be stopped entirely with the stop-method.
 
@@ -79,23 +112,63 @@ class Simulation(object):
     :param device_builder: :class:`~lewis.core.devices.DeviceBuilder` instance to enable setup-
                            switching at runtime.
     :param control_server: 'host:port'-string to construct control server or None.
+    :param read_write_lock: Use a :class:`~lewis.core.utils.ReadWriteLock` as device lock, so
+                            that read-only requests from adapters and control server can
+                            access the device at the same time.
     """
 
-    def __init__(self, device, adapters=(), device_builder=None, control_server=None):
+    def __init__(self, device, adapters=(), device_builder=None, control_server=None,
+                 read_write_lock=False, pooled_setups=None):
         super(Simulation, self).__init__()
 
         self._device_builder = device_builder
 
+        self._device_pool = None
+
+        if pooled_setups:
+            if device_builder is None:
+                raise ValueError('A device builder is required to pool setups.')
+
+            self._device_pool = DevicePool(
+                device_builder, pooled_setups, [adapter.interface for adapter in adapters])
+            self._device_pool.fill()
+
         self._device = device
         self._adapters = AdapterCollection(*adapters)
 
+        if read_write_lock:
+            self._adapters.device_lock = ReadWriteLock()
+
         self._speed = 1.0  # Multiplier for delta t
         self._cycle_delay = 0.1  # Target time between cycles
 
+        self._fixed_rate = False  # Schedule cycles on a fixed grid using a monotonic clock
+        self._overrun_policy = 'drop'  # What to do with cycles that could not start in time
+        self._overruns = 0  # Number of cycles that started late in fixed rate mode
+        self._next_cycle = None  # Monotonic time at which the next cycle is due
+
+        self._virtual_time = False  # Advance time in fixed steps instead of measuring it
+
+        self._wake_on_write = False  # Start a cycle early when an adapter requests it
+        self._min_wake_interval = 0.01  # Minimum time between a cycle and an early cycle
+
+        self._idle_cycles = 0  # Number of quiet cycles after which to slow down, 0 disables
+        self._idle_cycle_delay = 1.0  # Time between cycles while idle
+        self._quiet_cycles = 0  # Number of consecutive cycles without activity
+        self._last_device_state = None  # State of the device's state machine in last cycle
+
+        self._snapshots = {}  # Pickled device snapshots by id
+        self._snapshot_ids = count(1)
+
         self._start_time = None  # Real time when the simulation started
         self._cycles = 0  # Number of cycles processed
         self._runtime = 0.0  # Total simulation time processed
 
+        self._statistics = {
+            'cycle': RollingStatistics(),  # Time between the start of two cycles
+            'process': RollingStatistics(),  # Time spent in the device's process-method
+            'lock_wait': RollingStatistics()}  # Time spent waiting for the device lock
+
         self._running = False
         self._started = False
         self._stop_commanded = False
@@ -117,11 +190,19 @@ class Simulation(object):
         if control_server is None:
             return None
 
-        return ControlServer({
+        return ControlServer(self._create_exposed_objects(), control_server)
+
+    def _create_exposed_objects(self):
+        """
+        Returns a dictionary with the objects that are exposed via a control server,
+        device, simulation and interface.
+        """
+        return {
             'device': ExposedObject(
                 self._device,
                 exclude_inherited=True,
-                lock=self._adapters.device_lock
+                lock=self._adapters.device_lock,
+                on_modify=self._device._mark_changed
             ),
             'simulation': ExposedObject(
                 self,
@@ -130,10 +211,10 @@ class Simulation(object):
             ),
             'interface': ExposedObject(
                 self._adapters,
-                exclude=('device_lock', 'add_adapter', 'remove_adapter', 'handle', 'log'),
+                exclude=('device_lock', 'add_adapter', 'remove_adapter', 'handle', 'threaded',
+                         'cycle_request', 'wait_for_lock_requests', 'log'),
                 exclude_inherited=True
-            )},
-            control_server)
+            )}
 
     @property
     def setups(self):
@@ -148,23 +229,61 @@ class Simulation(object):
         This method switches the setup, which means that it replaces the currently
         simulated device with a new device, as defined by the setup.
 
+        If a device for the setup is available in the pool (see pooled_setups), it is used
+        instead of creating and binding a new device. The device is bound to the interfaces
+        while the device lock is held, so that adapters never use commands of the previous
+        device for the new one.
+
         If any error occurs during setup switching it is logged and re-raised.
 
         :param new_setup: Name of the new setup to load.
         """
         try:
-            self._device = self._device_builder.create_device(new_setup)
-            self._adapters.set_device(self._device)
-            self.log.info('Switched setup to \'%s\'', new_setup)
+            pooled = self._device_pool.take(new_setup) if self._device_pool else None
+
+            if pooled is not None:
+                new_device, bindings = pooled
+            else:
+                new_device, bindings = self._device_builder.create_device(new_setup), None
+
+            with self._adapters.device_lock:
+                self._device = new_device
+                self._adapters.set_device(self._device, bindings)
+
+            self.log.info('Switched setup to \'%s\'%s', new_setup,
+                          ' (from pool)' if pooled is not None else '')
         except Exception as e:
             self.log.error(
                 'Caught an error while trying to switch setups. Setup not switched, '
                 'simulation continues: %s', e)
             raise
 
-    def start(self):
+    def start(self, duration=None):
         """
-        Starts the simulation.
+        Starts the simulation. If a duration is supplied, the simulation stops
+        by itself as soon as the simulated time (runtime) reaches that value.
+
+        :param duration: Simulated time in seconds after which to stop or None.
+        """
+        self._begin_run()
+
+        delta = 0.0
+
+        while not self._stop_commanded:
+            delta = self._process_cycle(delta)
+
+            if duration is not None and self._runtime >= duration:
+                self.log.info('Simulated time reached requested duration of %s s', duration)
+                self.stop()
+
+        self._end_run()
+
+    def _begin_run(self):
+        """
+        Sets the state of the simulation to started, starts the control server and the adapters
+        and initializes the timers. This is used by :meth:`start`, but also by
+        :class:`~lewis.core.fleet.SimulationHost`, which drives the cycles of many simulations
+        in a single loop.
         """
         self.log.info('Starting simulation')
 
@@ -177,12 +296,13 @@ class Simulation(object):
         self._adapters.connect()
 
         self._start_time = datetime.now()
+        self._next_cycle = None
+        self._quiet_cycles = 0
 
-        delta = 0.0
-
-        while not self._stop_commanded:
-            delta = self._process_cycle(delta)
-
+    def _end_run(self):
+        """
+        Resets the state of the simulation after the last cycle has been processed.
+        """
         self._running = False
         self._started = False
 
@@ -210,11 +330,25 @@ class Simulation(object):
         """
         Processes one cycle, which consists of one simulation cycle and processing
         of control server commands. The method measures how long all this takes
-        and returns the elapsed time in seconds.
+        and returns the elapsed time in seconds. In fixed rate mode, the time is measured
+        using a monotonic clock. In virtual time mode, the elapsed time is not measured at all,
+        instead cycle_delay is returned.
 
         :param delta: Elapsed time in last cycle, passed to simulation.
         :return: Elapsed time in this cycle.
         """
+        if self._virtual_time:
+            self._process_simulation_cycle(delta)
+
+            return self._cycle_delay
+
+        if self._fixed_rate:
+            start = monotonic()
+
+            self._process_simulation_cycle(delta)
+
+            return monotonic() - start
+
         start = datetime.now()
 
         self._process_simulation_cycle(delta)
@@ -235,17 +369,151 @@ class Simulation(object):
         """
         self.log.debug('Cycle, dt=%s', delta)
 
-        sleep(self._cycle_delay)
+        start = monotonic()
+
+        self._wait_for_next_cycle()
+        self._process_device(delta)
 
+        self._statistics['cycle'].add(monotonic() - start)
+
+    def _process_device(self, delta):
+        """
+        Calls the device's process-method with the supplied delta, multiplied by the simulation
+        speed, unless the simulation is paused. The device lock is held during processing.
+
+        :param delta: Time delta passed to simulation.
+        """
         if self._running:
             delta_simulation = delta * self._speed
 
+            # Requests that arrive from now on are processed in this cycle
+            requested = self._adapters.cycle_request.is_set()
+            self._adapters.cycle_request.clear()
+
+            wait_start = monotonic()
+
             with self._adapters.device_lock:
+                process_start = monotonic()
                 self._device.process(delta_simulation)
+                self._device._mark_processed()
+                process_end = monotonic()
+
+            self._statistics['lock_wait'].add(process_start - wait_start)
+            self._statistics['process'].add(process_end - process_start)
 
             self._cycles += 1
             self._runtime += delta_simulation
 
+            self._update_activity(requested)
+
+    def _update_activity(self, requested):
+        """
+        Counts the consecutive cycles in which neither the state of the device's state machine
+        changed nor an adapter request modified the device, which determines whether the
+        simulation is idle.
+
+        :param requested: True if an adapter requested a cycle since the previous one.
+        """
+        was_idle = self.is_idle
+
+        state_machine = getattr(self._device, '_csm', None)
+        state = getattr(state_machine, 'state', None)
+
+        if requested or state != self._last_device_state:
+            self._quiet_cycles = 0
+        else:
+            self._quiet_cycles += 1
+
+        self._last_device_state = state
+
+        if was_idle != self.is_idle:
+            self.log.debug('Simulation is %s', 'idle' if self.is_idle else 'active again')
+
+    def _wait_for_next_cycle(self):
+        """
+        Blocks until the next cycle is due. Usually this means sleeping for cycle_delay, but in
+        fixed rate mode only the time that is left until the next period starts is spent
+        waiting. If that point in time has already passed, the cycle is counted as an overrun
+        and the schedule is adjusted according to the overrun policy.
+
+        In virtual time mode, the method does not wait for the next cycle. It only waits until
+        adapters that are waiting for the device lock have acquired it, because the lock would
+        otherwise be acquired again immediately and the adapters could be kept from processing
+        requests indefinitely.
+
+        If wake_on_write is active, waiting ends early when an adapter requests a cycle. While
+        the simulation is idle, idle_cycle_delay is spent waiting instead of cycle_delay, but
+        an adapter request always ends waiting early. The fixed rate schedule starts over
+        afterwards.
+        """
+        if self._virtual_time and self._running:
+            self._adapters.wait_for_lock_requests()
+            return
+
+        if self.is_idle:
+            self._sleep(self._idle_cycle_delay, True)
+            self._next_cycle = None
+            return
+
+        if not self._fixed_rate:
+            self._sleep(self._cycle_delay, self._wake_on_write)
+            return
+
+        self._wait_for_fixed_rate_cycle()
+
+    def _wait_for_fixed_rate_cycle(self):
+        """
+        Waits until the next period of the fixed rate schedule starts and advances the schedule,
+        taking into account the overrun policy.
+        """
+        now = monotonic()
+
+        if self._next_cycle is None:
+            self._next_cycle = now + self._cycle_delay
+
+        remaining = self._next_cycle - now
+
+        if remaining > 0.0:
+            if self._sleep(remaining, self._wake_on_write):
+                # The cycle was requested by an adapter, the schedule is not affected
+                return
+        elif remaining < 0.0 and self._cycle_delay > 0.0:
+            self._overruns += 1
+
+            if self._overrun_policy == 'drop':
+                missed_cycles = int(-remaining / self._cycle_delay)
+                self._next_cycle += missed_cycles * self._cycle_delay
+
+                self.log.debug('Cycle overrun by %s s, dropped %s cycles.',
+                               -remaining, missed_cycles)
+
+        self._next_cycle += self._cycle_delay
+
+    def _sleep(self, duration, wake_on_request):
+        """
+        Sleeps for the specified duration. If wake_on_request is True, sleeping ends as soon as
+        an adapter requests a cycle, but not before min_wake_interval has passed.
+
+        :param duration: Time to sleep in seconds.
+        :param wake_on_request: End sleeping early if an adapter requests a cycle.
+        :return: True if sleeping ended early because a cycle was requested.
+        """
+        if not wake_on_request or duration <= self._min_wake_interval:
+            sleep(duration)
+            return False
+
+        sleep(self._min_wake_interval)
+
+        return self._adapters.cycle_request.wait(duration - self._min_wake_interval)
+
+    @property
+    def pooled_setups(self):
+        """
+        Setups for which devices are created in advance, so that switching to them via
+        :meth:`switch_setup` is fast. This is specified when the simulation is constructed.
+        """
+        return self._device_pool.setups if self._device_pool else []
+
     @property
     def cycle_delay(self):
         """
@@ -260,9 +528,140 @@ class Simulation(object):
             raise ValueError('Cycle delay can not be negative.')
 
         self._cycle_delay = delay
+        self._next_cycle = None
 
         self.log.info('Changed cycle delay to %s', self._cycle_delay)
 
+    @property
+    def fixed_rate(self):
+        """
+        If True, cycles are scheduled on a fixed grid with a period of cycle_delay seconds,
+        based on a monotonic clock. The time spent processing a cycle is then subtracted from
+        the time spent waiting for the next cycle, instead of being added to it.
+        """
+        return self._fixed_rate
+
+    @fixed_rate.setter
+    def fixed_rate(self, fixed_rate):
+        self._fixed_rate = bool(fixed_rate)
+        self._next_cycle = None
+
+        self.log.info('Changed fixed rate mode to %s', self._fixed_rate)
+
+    @property
+    def virtual_time(self):
+        """
+        If True, the simulation does not run in real time. Instead, each cycle advances the
+        simulated time by cycle_delay (multiplied by speed) and the next cycle is started
+        without waiting, so that the simulation runs as fast as possible.
+        """
+        return self._virtual_time
+
+    @virtual_time.setter
+    def virtual_time(self, virtual_time):
+        self._virtual_time = bool(virtual_time)
+
+        self.log.info('Changed virtual time mode to %s', self._virtual_time)
+
+    @property
+    def wake_on_write(self):
+        """
+        If True, a cycle is started as soon as an adapter signals that a request has modified
+        the device, instead of waiting for the next regular cycle. Cycles started like this are
+        separated from the previous cycle by at least min_wake_interval.
+        """
+        return self._wake_on_write
+
+    @wake_on_write.setter
+    def wake_on_write(self, wake_on_write):
+        self._wake_on_write = bool(wake_on_write)
+
+        self.log.info('Changed wake on write to %s', self._wake_on_write)
+
+    @property
+    def min_wake_interval(self):
+        """
+        Minimum time in seconds between the end of a cycle and the start of a cycle that was
+        requested by an adapter when wake_on_write is active. This can not be negative.
+        """
+        return self._min_wake_interval
+
+    @min_wake_interval.setter
+    def min_wake_interval(self, interval):
+        if interval < 0.0:
+            raise ValueError('Minimum wake interval can not be negative.')
+
+        self._min_wake_interval = interval
+
+        self.log.info('Changed minimum wake interval to %s', self._min_wake_interval)
+
+    @property
+    def idle_cycles(self):
+        """
+        Number of consecutive cycles without state changes or modifying adapter requests after
+        which the simulation becomes idle and slows down to idle_cycle_delay. The default value
+        of 0 disables this behavior. This can not be negative.
+        """
+        return self._idle_cycles
+
+    @idle_cycles.setter
+    def idle_cycles(self, cycles):
+        if cycles < 0:
+            raise ValueError('Number of idle cycles can not be negative.')
+
+        self._idle_cycles = int(cycles)
+
+        self.log.info('Changed idle cycles to %s', self._idle_cycles)
+
+    @property
+    def idle_cycle_delay(self):
+        """
+        Time between simulation cycles while the simulation is idle, this can not be negative.
+        """
+        return self._idle_cycle_delay
+
+    @idle_cycle_delay.setter
+    def idle_cycle_delay(self, delay):
+        if delay < 0.0:
+            raise ValueError('Idle cycle delay can not be negative.')
+
+        self._idle_cycle_delay = delay
+
+        self.log.info('Changed idle cycle delay to %s', self._idle_cycle_delay)
+
+    @property
+    def is_idle(self):
+        """
+        True if the simulation currently runs at the reduced rate given by idle_cycle_delay.
+        """
+        return 0 < self._idle_cycles <= self._quiet_cycles
+
+    @property
+    def overrun_policy(self):
+        """
+        Determines how cycles are scheduled in fixed rate mode when a cycle starts too late.
+        With ``'drop'`` (default), the missed cycles are skipped and the simulation continues
+        on the next period boundary. With ``'catch_up'``, the missed cycles are processed
+        back to back without waiting until the schedule is met again.
+        """
+        return self._overrun_policy
+
+    @overrun_policy.setter
+    def overrun_policy(self, policy):
+        if policy not in ('drop', 'catch_up'):
+            raise ValueError('Overrun policy must be either \'drop\' or \'catch_up\'.')
+
+        self._overrun_policy = policy
+
+        self.log.info('Changed overrun policy to %s', self._overrun_policy)
+
+    @property
+    def overruns(self):
+        """
+        Number of cycles that could not be started in time in fixed rate mode.
+        """
+        return self._overruns
+
     @property
     def cycles(self):
         """
@@ -306,6 +705,23 @@ class Simulation(object):
         """
         return self._runtime
 
+    @property
+    def stats(self):
+        """
+        Timing statistics of the simulation. The dictionary contains statistics for the
+        duration of the simulation cycles (``cycle``), the time spent in the device's
+        process-method (``process``) and the time spent waiting for the device lock before
+        processing (``lock_wait``). Statistics for each adapter are contained in ``adapters``,
+        see :meth:`~lewis.core.adapters.AdapterCollection.statistics`.
+
+        Each entry contains the number of samples and mean, median (``p50``), 95th and 99th
+        percentile and maximum of the most recent samples, all times are in seconds.
+        """
+        stats = {name: statistics.summary() for name, statistics in self._statistics.items()}
+        stats['adapters'] = self._adapters.statistics()
+
+        return stats
+
     def set_device_parameters(self, parameters):
         """
         Set multiple parameters of the simulated device "simultaneously". The passed
@@ -315,6 +731,10 @@ class Simulation(object):
         is raised. The same happens if any of the parameters are methods, which
         can not be updated with this mechanisms.
 
+        The updated parameters are marked as changed (see
+        :meth:`~lewis.core.devices.DeviceBase._mark_changed`) before the device lock is
+        released, so that adapters do not use cached replies or skip updates.
+
         :param parameters: Dict of device attribute/values to update the device.
         """
         invalid_parameters = set(parameters.keys()) - set(
@@ -328,8 +748,79 @@ class Simulation(object):
             for name, value in parameters.items():
                 setattr(self._device, name, value)
 
+            self._device._mark_changed(*parameters)
+
         self.log.debug('Updated device parameters: %s', parameters)
 
+    def snapshot(self):
+        """
+        Stores a snapshot of the device's data members and, for a
+        :class:`~lewis.devices.StateMachineDevice`, the state of its state machine. The
+        snapshot is kept in memory in serialized form and can be restored via :meth:`restore`
+        using the returned id. Processors such as the state machine itself are not part of the
+        snapshot, nor is internal data of state handler objects.
+
+        If the device contains data that can not be serialized, a RuntimeError is raised.
+
+        :return: Id of the snapshot.
+        """
+        with self._adapters.device_lock:
+            try:
+                snapshot = pickle.dumps(self._device._get_snapshot(), pickle.HIGHEST_PROTOCOL)
+            except (pickle.PicklingError, TypeError, AttributeError) as e:
+                raise RuntimeError(
+                    'Failed to create a snapshot of the device, it contains data that '
+                    'can not be serialized: {}'.format(e))
+
+        snapshot_id = next(self._snapshot_ids)
+        self._snapshots[snapshot_id] = (type(self._device), snapshot)
+
+        self.log.debug('Created device snapshot %s (%s bytes)', snapshot_id, len(snapshot))
+
+        return snapshot_id
+
+    def restore(self, snapshot_id):
+        """
+        Restores a snapshot that was created via :meth:`snapshot`. All data members are
+        replaced while the device lock is held. The state machine is put into the stored
+        state without raising any events. A snapshot can be restored any number of times.
+
+        If the id is unknown, or the snapshot was taken from a different type of device
+        (for example before switching the setup), a RuntimeError is raised.
+
+        :param snapshot_id: Id of the snapshot to restore.
+        """
+        if snapshot_id not in self._snapshots:
+            raise RuntimeError('There is no snapshot with id {}.'.format(snapshot_id))
+
+        device_type, snapshot = self._snapshots[snapshot_id]
+
+        if device_type is not type(self._device):
+            raise RuntimeError(
+                'Snapshot {} was created for a device of type {}, it can not be restored '
+                'to a device of type {}.'.format(
+                    snapshot_id, device_type.__name__, type(self._device).__name__))
+
+        data = pickle.loads(snapshot)
+
+        with self._adapters.device_lock:
+            self._device._restore_snapshot(data)
+
+        self.log.debug('Restored device snapshot %s', snapshot_id)
+
+    def delete_snapshot(self, snapshot_id):
+        """
+        Deletes the snapshot with the specified id, if it exists.
+
+        :param snapshot_id: Id of the snapshot to delete.
+        """
+        self._snapshots.pop(snapshot_id, None)
+
+    @property
+    def snapshots(self):
+        """Ids of the snapshots that can be restored via :meth:`restore`."""
+        return sorted(self._snapshots.keys())
+
     def pause(self):
         """
         Pause the simulation. Can only be called after start has been called.
@@ -434,7 +925,8 @@ class SimulationFactory(object):
         """Returns a list of available protocols for the specified device."""
         return self._reg.device_builder(device, self._rv).protocols
 
-    def create(self, device, setup=None, protocols=None, control_server=None):
+    def create(self, device, setup=None, protocols=None, control_server=None,
+               read_write_lock=False, pooled_setups=None):
         """
         Creates a :class:`Simulation` according to the supplied parameters.
 
@@ -444,6 +936,9 @@ class SimulationFactory(object):
                           corresponding :class:`~lewis.core.adapters.Adapter`. For available
                           protocols, see :meth:`get_protocols`.
         :param control_server: String to construct a control server (host:port).
+        :param read_write_lock: Use a reader/writer lock as device lock, see :class:`Simulation`.
+        :param pooled_setups: Setups for which devices are created in advance, so that switching
+                              to them is fast.
         :return: Simulation object according to input parameters.
         """
 
@@ -466,4 +961,6 @@ class SimulationFactory(object):
             device=device,
             adapters=adapters,
             device_builder=device_builder,
-            control_server=control_server)
+            control_server=control_server,
+            read_write_lock=read_write_lock,
+            pooled_setups=pooled_setups)
@@ -29,12 +29,21 @@ import importlib
 import textwrap
 import inspect
 import functools
+import math
+import threading
+from collections import deque, OrderedDict
 from datetime import datetime
 from semantic_version import Version
 
 from os import path as osp
 from os import listdir
 
+try:
+    from time import monotonic
+except ImportError:  # pragma: no cover
+    # Python 2 does not provide a monotonic clock in the standard library.
+    from time import time as monotonic  # noqa: F401
+
 from .exceptions import LewisException, LimitViolationException
 from lewis import __version__
 
@@ -156,6 +165,355 @@ def seconds_since(start):
     return (datetime.now() - start).total_seconds()
 
 
+class RollingStatistics(object):
+    """
+    This class keeps the most recent samples of a quantity, for example the duration of a
+    certain operation, and computes statistics over them on demand. Adding a sample is cheap,
+    so that it can be used in time-critical code, the statistics are only computed when
+    :meth:`summary` is called:
+
+    .. sourcecode:: Python
+
+        stats = RollingStatistics(size=100)
+
+        for i in range(1000):
+            stats.add(i)
+
+        stats.summary()  # Statistics of the last 100 samples
+
+    :param size: Number of samples to keep.
+    """
+
+    def __init__(self, size=1000):
+        self._samples = deque(maxlen=size)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def add(self, value):
+        """
+        Adds a sample. If there are already ``size`` samples, the oldest one is discarded.
+
+        :param value: The new sample.
+        """
+        with self._lock:
+            self._samples.append(value)
+            self._count += 1
+
+    @property
+    def count(self):
+        """Total number of samples that have been added."""
+        return self._count
+
+    def summary(self):
+        """
+        Returns a dictionary with the total number of samples (``count``) and the mean,
+        the 50th, 95th and 99th percentile (``p50``, ``p95``, ``p99``) and the maximum
+        of the samples that are currently kept. If there are no samples, only ``count``
+        is contained in the dictionary.
+
+        :return: Dictionary with statistics.
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+            count = self._count
+
+        if not samples:
+            return {'count': count}
+
+        def percentile(percent):
+            return samples[max(0, int(math.ceil(percent / 100.0 * len(samples))) - 1)]
+
+        return {
+            'count': count,
+            'mean': sum(samples) / float(len(samples)),
+            'p50': percentile(50),
+            'p95': percentile(95),
+            'p99': percentile(99),
+            'max': samples[-1]}
+
+
+class LRUCache(object):
+    """
+    A thread-safe cache that keeps the ``maxsize`` most recently used values. Values are
+    created on demand by a factory function, the cache counts how often a value was found
+    (hits) and how often it had to be created (misses):
+
+    .. sourcecode:: Python
+
+        cache = LRUCache(maxsize=100)
+
+        compiled = cache.get('^T=(.+)$', lambda: re.compile('^T=(.+)$'))
+
+        cache.statistics()  # {'hits': 0, 'misses': 1, 'size': 1, 'maxsize': 100}
+
+    The factory is called without holding the lock of the cache, so that slow factories do
+    not block other threads. If two threads request the same missing key at the same time,
+    both create a value, the one that is stored first is kept.
+
+    :param maxsize: Maximum number of values to keep.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+
+        self._values = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, factory):
+        """
+        Returns the value stored for ``key``. If there is no such value, it is created by
+        calling ``factory`` and stored, the least recently used value is discarded if the
+        cache is full.
+
+        :param key: Hashable key of the value.
+        :param factory: Function without arguments that creates the value.
+        :return: The cached or newly created value.
+        """
+        with self._lock:
+            if key in self._values:
+                self._hits += 1
+                value = self._values.pop(key)
+                self._values[key] = value
+                return value
+
+            self._misses += 1
+
+        value = factory()
+
+        with self._lock:
+            value = self._values.pop(key, value)
+            self._values[key] = value
+
+            while len(self._values) > self.maxsize:
+                self._values.popitem(last=False)
+
+        return value
+
+    def clear(self):
+        """Removes all values and resets the statistics."""
+        with self._lock:
+            self._values.clear()
+            self._hits = 0
+            self._misses = 0
+
+    def statistics(self):
+        """
+        Returns a dictionary with the number of hits and misses, the current number of
+        values (``size``) and ``maxsize``.
+        """
+        with self._lock:
+            return {'hits': self._hits, 'misses': self._misses,
+                    'size': len(self._values), 'maxsize': self.maxsize}
+
+
+class ConnectionRegistry(object):
+    """
+    This class keeps track of the client connections of a server. It can limit the number of
+    connections and find connections that have been idle for too long. Connections are kept
+    in the order of their last activity, so that adding, removing and marking a connection
+    as active are O(1) operations and finding idle connections only has to look at the
+    connections that are actually idle:
+
+    .. sourcecode:: Python
+
+        connections = ConnectionRegistry(max_connections=10, idle_timeout=60.0)
+
+        if not connections.add(connection):
+            connection.close()  # Too many connections
+
+        connections.touch(connection)  # For example when data is received
+
+        for connection in connections.idle_connections():
+            connection.close()
+
+    Iterating over the registry returns a copy of the connections, so connections can be
+    removed while iterating.
+
+    :param max_connections: Maximum number of connections, 0 for no limit.
+    :param idle_timeout: Time in seconds after which a connection without activity is idle,
+                         0 to never consider connections idle.
+    """
+
+    def __init__(self, max_connections=0, idle_timeout=0):
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+
+        self._connections = OrderedDict()
+
+    def __len__(self):
+        return len(self._connections)
+
+    def __iter__(self):
+        return iter(list(self._connections))
+
+    def __contains__(self, connection):
+        return connection in self._connections
+
+    @property
+    def is_full(self):
+        """True if no more connections can be added."""
+        return 0 < self.max_connections <= len(self._connections)
+
+    def add(self, connection):
+        """
+        Adds a connection, unless the maximum number of connections has been reached.
+
+        :param connection: The new connection.
+        :return: True if the connection was added, False otherwise.
+        """
+        if self.is_full:
+            return False
+
+        self._connections[connection] = monotonic()
+        return True
+
+    def remove(self, connection):
+        """
+        Removes a connection. Connections that are not in the registry are ignored.
+
+        :param connection: The connection to remove.
+        """
+        self._connections.pop(connection, None)
+
+    def touch(self, connection):
+        """
+        Marks a connection as active, so that it is not idle for the next ``idle_timeout``
+        seconds. Connections that are not in the registry are ignored.
+
+        :param connection: The active connection.
+        """
+        if connection in self._connections:
+            del self._connections[connection]
+            self._connections[connection] = monotonic()
+
+    def idle_connections(self):
+        """
+        Returns the connections that have not been active for at least ``idle_timeout``
+        seconds. The connections are not removed from the registry.
+
+        :return: List of idle connections, least recently active first.
+        """
+        if not self.idle_timeout:
+            return []
+
+        deadline = monotonic() - self.idle_timeout
+        idle = []
+
+        for connection, last_activity in self._connections.items():
+            if last_activity > deadline:
+                break
+
+            idle.append(connection)
+
+        return idle
+
+
+class ReadWriteLock(object):
+    """
+    A lock that distinguishes between exclusive access, for example for modifying a device, and
+    shared access for only reading from it. Any number of threads can hold the lock for shared
+    access at the same time, but only one thread can hold it for exclusive access, which also
+    excludes all shared access. Using the lock as a context manager acquires it exclusively,
+    just like a ``threading.Lock``, for shared access the ``read``-member is used:
+
+    .. sourcecode:: Python
+
+        lock = ReadWriteLock()
+
+        with lock:
+            device.temperature = 23.0
+
+        with lock.read:
+            temperature = device.temperature
+
+    Threads that are waiting for exclusive access take precedence over new shared access, so
+    that a constant stream of readers can not block writers indefinitely. The lock is not
+    re-entrant, neither for exclusive nor for shared access.
+
+    Code that should work with both kinds of locks can use :func:`read_lock`.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+        self.read = _SharedLock(self)
+
+    def acquire(self):
+        """Acquires the lock for exclusive access, blocks until that is possible."""
+        with self._condition:
+            self._waiting_writers += 1
+
+            while self._writer or self._readers:
+                self._condition.wait()
+
+            self._waiting_writers -= 1
+            self._writer = True
+
+    def release(self):
+        """Releases the lock after exclusive access."""
+        with self._condition:
+            self._writer = False
+            self._condition.notify_all()
+
+    def acquire_read(self):
+        """Acquires the lock for shared access, blocks until that is possible."""
+        with self._condition:
+            while self._writer or self._waiting_writers:
+                self._condition.wait()
+
+            self._readers += 1
+
+    def release_read(self):
+        """Releases the lock after shared access."""
+        with self._condition:
+            self._readers -= 1
+
+            if not self._readers:
+                self._condition.notify_all()
+
+    def __enter__(self):
+        self.acquire()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+class _SharedLock(object):
+    """
+    Shared access to a :class:`ReadWriteLock`, with the same interface as the lock itself.
+    """
+
+    def __init__(self, lock):
+        self.acquire = lock.acquire_read
+        self.release = lock.release_read
+
+    def __enter__(self):
+        self.acquire()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+def read_lock(lock):
+    """
+    Returns the object that should be used for read-only access to a resource protected by
+    the supplied lock. For a :class:`ReadWriteLock` (or any other object with a
+    ``read``-member that can be used as a context manager), that is the lock for shared
+    access. For all other locks, for example ``threading.Lock``, the lock itself is returned.
+
+    :param lock: Lock that protects a resource.
+    :return: Lock for read-only access.
+    """
+    shared_lock = getattr(lock, 'read', None)
+
+    return shared_lock if hasattr(shared_lock, '__enter__') else lock
+
+
 class FromOptionalDependency(object):
     """
     This is a utility class for importing classes from a module or
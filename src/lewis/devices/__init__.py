@@ -174,6 +174,21 @@ class StateMachineDevice(DeviceBase, CanProcessComposite):
 
         return transitions
 
+    def _get_snapshot(self):
+        """
+        In addition to the data members, the snapshot of a StateMachineDevice contains the
+        current state of the state machine.
+        """
+        return super(StateMachineDevice, self)._get_snapshot(), self._csm.state
+
+    def _restore_snapshot(self, snapshot):
+        data, state = snapshot
+
+        super(StateMachineDevice, self)._restore_snapshot(data)
+
+        # Restoring the state does not raise any state machine events
+        self._csm._state = state
+
     def _override_data(self, overrides):
         """
         This method overrides data members of the class, but does not allow for adding new members.
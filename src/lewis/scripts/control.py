@@ -20,6 +20,7 @@
 
 import argparse
 import ast
+import json
 import sys
 
 from lewis.core.control_client import ControlClient, ProtocolException
@@ -90,6 +91,13 @@ def call_method(remote, object_name, method, arguments):
             setattr(remote[object_name], method, *args)
 
 
+def format_response(response):
+    if isinstance(response, dict):
+        return json.dumps(response, indent=4, sort_keys=True)
+
+    return response
+
+
 parser = argparse.ArgumentParser(
     description='A client to manipulate the simulated device remotely through a separate '
                 'channel. For this tool to be of any use, lewis must be invoked with the '
@@ -151,6 +159,6 @@ def control_simulation(argument_list=None):
                 response = call_method(remote, args.object, args.member, args.arguments)
 
                 if response is not None or args.print_none:
-                    print(response)
+                    print(format_response(response))
     except ProtocolException as e:
         print('\n'.join(('An error occurred:', str(e))))
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+# *********************************************************************
+# lewis - a library for creating hardware device simulators
+# Copyright (C) 2016-2017 European Spallation Source ERIC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# *********************************************************************
+
+import argparse
+import os
+import sys
+import yaml
+
+from lewis import __version__
+from lewis.core.exceptions import LewisException
+from lewis.core.fleet import SimulationHost, SimulationSupervisor, create_fleet
+from lewis.core.logging import logging, default_log_format
+from lewis.core.simulation import SimulationFactory
+from lewis.scripts import get_usage_text
+from lewis.scripts.run import use_strict_versions
+
+parser = argparse.ArgumentParser(
+    description='This script starts many simulated devices in one process, as specified in a '
+                'fleet description file. Complete documentation of Lewis is available in '
+                'the online documentation: '
+                'https://lewis.readthedocs.io/en/v{}/'.format(__version__),
+    add_help=False, prog='lewis-fleet')
+
+positional_args = parser.add_argument_group('Positional arguments')
+
+positional_args.add_argument(
+    'fleet', nargs='?',
+    help='Path to a YAML file that describes the simulated devices. Each entry in its devices '
+         'section specifies device, setup, protocols, cycle_delay and speed of one simulation.')
+
+device_args = parser.add_argument_group(
+    'Device related parameters',
+    'Parameters that influence where devices are found.')
+
+device_args.add_argument(
+    '-k', '--device-package', default='lewis.devices',
+    help='Name of packages where devices are found.')
+device_args.add_argument(
+    '-a', '--add-path', default=None,
+    help='Path where the device package exists. Is added to the path.')
+
+simulation_args = parser.add_argument_group(
+    'Simulation related parameters',
+    'Parameters that influence how the simulations are run.')
+
+simulation_args.add_argument(
+    '-t', '--tick', type=float, default=0.01,
+    help='Maximum time in seconds between two polls of the device interfaces.')
+simulation_args.add_argument(
+    '-w', '--workers', type=int, default=1,
+    help='Number of worker processes the devices are distributed across. With more than one '
+         'worker, crashed workers are restarted automatically.')
+simulation_args.add_argument(
+    '--worker-port', type=int, default=10100,
+    help='Control server port of the first worker process, the other workers use the '
+         'following ports. All worker control servers listen on 127.0.0.1.')
+simulation_args.add_argument(
+    '-r', '--rpc-host', default=None,
+    help='HOST:PORT format string for exposing all devices and simulations via JSON-RPC over '
+         'ZMQ. The objects of each device are prefixed with the device name from the fleet '
+         'description, for example name.device.')
+
+other_args = parser.add_argument_group('Other arguments')
+
+other_args.add_argument(
+    '-o', '--output-level', default='info',
+    choices=['none', 'critical', 'error', 'warning', 'info', 'debug'],
+    help='Level of detail for logging to stderr.')
+
+version_handling = other_args.add_mutually_exclusive_group()
+version_handling.add_argument(
+    '-I', '--ignore-versions', action='store_true',
+    help='Ignore version mismatches between device and framework. A warning will still '
+         'be logged.')
+version_handling.add_argument(
+    '-S', '--strict-versions', action='store_true',
+    help='Do not allow devices which do not specify a framework version they are '
+         'compatible with.')
+other_args.add_argument(
+    '-v', '--version', action='store_true',
+    help='Prints the version and exits.')
+other_args.add_argument(
+    '-h', '--help', action='help',
+    help='Shows this help message and exits.')
+
+__doc__ = 'This script runs many simulated devices in one process. The usage ' \
+          'is as follows:\n\n.. code-block:: none\n\n{}'.format(get_usage_text(parser, indent=4))
+
+
+def load_fleet_description(file_name):
+    try:
+        with open(file_name) as fleet_file:
+            return yaml.safe_load(fleet_file)
+    except (IOError, yaml.YAMLError) as e:
+        raise LewisException(
+            'It was not possible to load the fleet description from {}:\n    {}'.format(
+                file_name, e))
+
+
+def run_fleet(argument_list=None):  # noqa: C901
+    """
+    Main function of lewis-fleet. Arguments passed in are parsed and used to construct the
+    simulations described in the fleet description, which are then run in one process.
+
+    This function only exits when the program has completed or is interrupted.
+
+    :param argument_list: Argument list to pass to the argument parser declared in this module.
+    """
+    try:
+        arguments = parser.parse_args(argument_list or sys.argv[1:])
+
+        if arguments.version:
+            print(__version__)
+            return
+
+        if not arguments.fleet:
+            parser.print_help()
+            return
+
+        if arguments.output_level != 'none':
+            logging.basicConfig(
+                level=getattr(logging, arguments.output_level.upper()), format=default_log_format)
+
+        add_paths = []
+
+        if arguments.add_path is not None:
+            additional_path = os.path.abspath(arguments.add_path)
+            logging.getLogger().debug('Extending path with: %s', additional_path)
+            sys.path.append(additional_path)
+            add_paths.append(additional_path)
+
+        strict_versions = use_strict_versions(arguments.strict_versions, arguments.ignore_versions)
+
+        fleet_description = load_fleet_description(arguments.fleet)
+
+        if arguments.workers > 1:
+            host = SimulationSupervisor(
+                fleet_description, arguments.device_package, arguments.workers,
+                arguments.rpc_host, arguments.worker_port, strict_versions, arguments.tick,
+                add_paths=add_paths)
+        else:
+            simulation_factory = SimulationFactory(arguments.device_package, strict_versions)
+
+            host = SimulationHost(
+                create_fleet(fleet_description, simulation_factory),
+                arguments.rpc_host, arguments.tick)
+
+        try:
+            host.start()
+        except KeyboardInterrupt:
+            print('\nInterrupt received; shutting down. Goodbye, cruel world!')
+            host.log.critical('Simulations aborted by user interaction')
+
+    except LewisException as e:
+        print('\n'.join(('An error occurred:', str(e))))
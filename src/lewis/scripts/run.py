@@ -51,6 +51,10 @@ device_args.add_argument(
     '-s', '--setup', default=None,
     help='Name of the setup to load. If not provided, the default setup is selected. If there'
          'is no default, a list of setups is printed.')
+device_args.add_argument(
+    '--pool-setups', default=None, type=lambda setups: setups.split(','),
+    help='Comma separated list of setups for which devices are prepared in the background, '
+         'so that switching to them via the control server is fast.')
 
 interface_args = device_args.add_mutually_exclusive_group()
 interface_args.add_argument(
@@ -91,6 +95,39 @@ simulation_args.add_argument(
     '-e', '--speed', type=float, default=1.0,
     help='Simulation speed. The actually elapsed time between two cycles is '
          'multiplied with this speed to determine the simulated time.')
+simulation_args.add_argument(
+    '-f', '--fixed-rate', action='store_true',
+    help='Schedule simulation cycles on a fixed grid with a period of cycle-delay, using a '
+         'monotonic clock. The time spent processing a cycle is then not added to the delay.')
+simulation_args.add_argument(
+    '--overrun-policy', default='drop', choices=['drop', 'catch_up'],
+    help='Determines what happens in fixed rate mode if a cycle can not be started in time. '
+         'Missed cycles are either dropped or processed as quickly as possible.')
+simulation_args.add_argument(
+    '--virtual-time', action='store_true',
+    help='Do not run the simulation in real time. Instead, simulated time advances in steps of '
+         'cycle-delay and cycles are processed without waiting in between.')
+simulation_args.add_argument(
+    '--wake-on-write', action='store_true',
+    help='Process a simulation cycle right away when a request modifies the device, instead of '
+         'waiting for the next regular cycle.')
+simulation_args.add_argument(
+    '--min-wake-interval', type=float, default=0.01,
+    help='Minimum time in seconds between two cycles when --wake-on-write is used.')
+simulation_args.add_argument(
+    '--idle-cycles', type=int, default=0,
+    help='Slow down to --idle-cycle-delay after this many consecutive cycles without state '
+         'changes or requests that modify the device. 0 disables this behavior.')
+simulation_args.add_argument(
+    '--idle-cycle-delay', type=float, default=1.0,
+    help='Time between cycles while the simulation is idle.')
+simulation_args.add_argument(
+    '--duration', type=float, default=None,
+    help='Stop the simulation after this many seconds of simulated time have passed.')
+simulation_args.add_argument(
+    '--read-write-lock', action='store_true',
+    help='Use a reader/writer lock for device access, so that read-only requests (for example '
+         'polling of PVs or reading variables) do not have to wait for each other.')
 simulation_args.add_argument(
     '-r', '--rpc-host', default=None,
     help='HOST:PORT format string for exposing the device and the simulation via '
@@ -220,7 +257,8 @@ def run_simulation(argument_list=None):  # noqa: C901
             if not arguments.no_interface else {}
 
         simulation = simulation_factory.create(
-            arguments.device, arguments.setup, protocols, arguments.rpc_host)
+            arguments.device, arguments.setup, protocols, arguments.rpc_host,
+            arguments.read_write_lock, arguments.pool_setups)
 
         if arguments.show_interface:
             print(simulation._adapters.documentation())
@@ -239,10 +277,17 @@ def run_simulation(argument_list=None):  # noqa: C901
 
         simulation.cycle_delay = arguments.cycle_delay
         simulation.speed = arguments.speed
+        simulation.fixed_rate = arguments.fixed_rate
+        simulation.overrun_policy = arguments.overrun_policy
+        simulation.virtual_time = arguments.virtual_time
+        simulation.wake_on_write = arguments.wake_on_write
+        simulation.min_wake_interval = arguments.min_wake_interval
+        simulation.idle_cycles = arguments.idle_cycles
+        simulation.idle_cycle_delay = arguments.idle_cycle_delay
 
         if not arguments.verify:
             try:
-                simulation.start()
+                simulation.start(arguments.duration)
             except KeyboardInterrupt:
                 print('\nInterrupt received; shutting down. Goodbye, cruel world!')
                 simulation.log.critical('Simulation aborted by user interaction')
@@ -80,3 +80,38 @@ class TestStateMachineDevice(unittest.TestCase):
 
         self.assertRaises(AttributeError, MockStateMachineDevice,
                           override_initial_data={'nonexisting_member': 1.0})
+
+    def test_snapshot_contains_data_and_state(self):
+        smd = MockStateMachineDevice()
+        smd.process(0.1)
+
+        smd.member = [1, 2]
+        snapshot = smd._get_snapshot()
+
+        self.assertEqual(snapshot, ({'member': [1, 2]}, 'init'))
+
+        smd._csm._state = 'test'
+        smd.member = [3]
+        smd.existing_member = 3.0
+
+        smd._restore_snapshot(snapshot)
+
+        self.assertEqual(smd._csm.state, 'init')
+        self.assertEqual(smd.member, [1, 2])
+
+        # Instance attributes created after the snapshot are removed again
+        self.assertEqual(smd.existing_member, 1.0)
+        self.assertNotIn('existing_member', vars(smd))
+
+    def test_change_generation_is_not_restored(self):
+        smd = MockStateMachineDevice()
+        smd._mark_changed()
+
+        snapshot = smd._get_snapshot()
+        self.assertNotIn('_change_generation', snapshot[0])
+
+        smd._mark_changed()
+        smd._restore_snapshot(snapshot)
+
+        # Restoring is a change as well, the generation never decreases
+        self.assertEqual(smd._change_generation, 3)
@@ -65,6 +65,30 @@ class TestControlClient(unittest.TestCase):
              call().send_json({'method': 'foo', 'params': (), 'jsonrpc': '2.0', 'id': '2'}),
              call().recv_json()])
 
+    @patch('lewis.core.control_client.ControlClient._get_zmq_req_socket')
+    def test_request_returns_result(self, mock_socket):
+        client = ControlClient(host='127.0.0.1', port='10001')
+
+        with patch.object(client, 'json_rpc') as json_rpc_mock:
+            json_rpc_mock.return_value = ({'id': 2, 'result': 4}, 2)
+
+            self.assertEqual(client.request('a.device.speed:get'), 4)
+            json_rpc_mock.assert_called_once_with('a.device.speed:get')
+
+    @patch('lewis.core.control_client.ControlClient._get_zmq_req_socket')
+    def test_request_raises_server_exceptions(self, mock_socket):
+        client = ControlClient(host='127.0.0.1', port='10001')
+
+        with patch.object(client, 'json_rpc') as json_rpc_mock:
+            json_rpc_mock.return_value = (
+                {'error': {'data': {'type': 'AttributeError', 'message': 'Some message'}},
+                 'id': 2}, 2)
+
+            self.assertRaises(AttributeError, client.request, 'a.device.foo:get')
+
+            json_rpc_mock.return_value = ({'id': 3, 'result': 4}, 2)
+            self.assertRaises(ProtocolException, client.request, 'a.device.speed:get')
+
     @patch('lewis.core.control_client.ControlClient._get_zmq_req_socket')
     def test_get_remote_object_works(self, mock_socket):
         client = ControlClient(host='127.0.0.1', port='10001')
@@ -19,7 +19,7 @@
 
 import unittest
 
-from mock import Mock, patch, call
+from mock import Mock, MagicMock, patch, call
 import zmq
 import socket
 
@@ -155,6 +155,35 @@ class TestRPCObject(unittest.TestCase):
         mock_lock.__enter__.assert_called_once()
         mock_lock.__exit__.assert_called_once()
 
+    def test_shared_lock_is_used_for_getters(self):
+        mock_lock = MagicMock()
+
+        obj = DummyObject()
+        exposed_object = ExposedObject(obj, ['a'], lock=mock_lock)
+
+        self.assertEqual(exposed_object['a:get'](), obj.a)
+        mock_lock.read.__enter__.assert_called_once_with()
+        mock_lock.__enter__.assert_not_called()
+
+        exposed_object['a:set'](3)
+        mock_lock.__enter__.assert_called_once_with()
+
+    def test_on_modify_is_called_after_writes(self):
+        on_modify = Mock()
+
+        obj = DummyObject()
+        exposed_object = ExposedObject(obj, ['a', 'getTest'], on_modify=on_modify)
+
+        exposed_object['a:get']()
+        exposed_object[':api']()
+        on_modify.assert_not_called()
+
+        exposed_object['a:set'](3)
+        on_modify.assert_called_once_with()
+
+        exposed_object['getTest'](1, 2)
+        self.assertEqual(on_modify.call_count, 2)
+
 
 class TestExposedObjectCollection(unittest.TestCase):
     def test_empty_initialization(self):
@@ -1,9 +1,11 @@
 import inspect
+import threading
+import time
 import unittest
 
-from mock import Mock, MagicMock
+from mock import Mock, MagicMock, patch
 
-from lewis.core.adapters import Adapter, AdapterCollection, NoLock
+from lewis.core.adapters import Adapter, AdapterCollection, NoLock, TimedLock, LockRequests
 from lewis.core.exceptions import LewisException
 from utils import assertRaisesNothing
 
@@ -47,6 +49,64 @@ class TestNoLock(unittest.TestCase):
         self.assertRaises(RuntimeError, failing_function)
 
 
+class TestTimedLock(unittest.TestCase):
+    @patch('lewis.core.adapters.monotonic', side_effect=[1.0, 1.5, 3.5])
+    def test_times_are_recorded(self, monotonic_mock):
+        lock = Mock(spec=['acquire', 'release'])
+        wait_statistics = Mock()
+        hold_statistics = Mock()
+
+        with TimedLock(lock, wait_statistics, hold_statistics):
+            lock.acquire.assert_called_once_with()
+            lock.release.assert_not_called()
+
+        lock.release.assert_called_once_with()
+
+        wait_statistics.add.assert_called_once_with(0.5)
+        hold_statistics.add.assert_called_once_with(2.0)
+
+    def test_requests_are_counted(self):
+        lock = Mock(spec=['acquire', 'release'])
+        requests = Mock(spec=['acquire'])
+
+        with TimedLock(lock, Mock(), Mock(), requests):
+            requests.acquire.assert_called_once_with(lock)
+
+        lock.acquire.assert_not_called()
+        lock.release.assert_called_once_with()
+
+
+class TestLockRequests(unittest.TestCase):
+    def test_wait_returns_if_nothing_is_pending(self):
+        requests = LockRequests()
+        lock = threading.Lock()
+
+        requests.acquire(lock)
+
+        self.assertTrue(lock.locked())
+        self.assertTrue(requests.wait(0.0))
+
+    def test_wait_until_lock_is_acquired(self):
+        requests = LockRequests()
+        lock = threading.Lock()
+        lock.acquire()
+
+        waiting_thread = threading.Thread(target=requests.acquire, args=(lock,))
+        waiting_thread.start()
+
+        while not requests._pending:
+            time.sleep(0.001)
+
+        self.assertFalse(requests.wait(0.01))
+
+        lock.release()
+
+        self.assertTrue(requests.wait(1.0))
+        waiting_thread.join()
+
+        self.assertTrue(lock.locked())
+
+
 class TestAdapter(unittest.TestCase):
     def test_documentation(self):
         adapter = DummyAdapter('foo')
@@ -87,6 +147,25 @@ class TestAdapter(unittest.TestCase):
         assertRaisesNothing(self, DummyAdapter, 'protocol', options={'bar': 2, 'foo': 3})
         self.assertRaises(LewisException, DummyAdapter, 'protocol', options={'invalid': False})
 
+    def test_request_cycle(self):
+        adapter = DummyAdapter('protocol')
+
+        # Without a cycle request event, this does nothing
+        assertRaisesNothing(self, adapter.request_cycle)
+
+        adapter.cycle_request = Mock()
+        adapter.request_cycle()
+
+        adapter.cycle_request.set.assert_called_once_with()
+
+    def test_request_cycle_does_not_mark_device_changed(self):
+        adapter = DummyAdapter('protocol')
+        adapter.interface = Mock()
+
+        adapter.request_cycle()
+
+        adapter.interface.device._mark_changed.assert_not_called()
+
 
 class TestAdapterCollection(unittest.TestCase):
     def test_add_adapter(self):
@@ -172,3 +251,74 @@ class TestAdapterCollection(unittest.TestCase):
         collection.set_device('test')
 
         self.assertEqual(adapter.interface.device, 'test')
+
+    def test_connect_disconnect_not_threaded(self):
+        adapter = DummyAdapter('foo')
+        adapter.handle = Mock()
+
+        collection = AdapterCollection(adapter)
+
+        self.assertRaises(RuntimeError, collection.handle, 0.0)
+
+        collection.threaded = False
+        collection.connect()
+
+        self.assertTrue(collection.is_connected('foo'))
+        self.assertIsInstance(adapter.device_lock, TimedLock)
+        self.assertIs(adapter.cycle_request, collection.cycle_request)
+        self.assertRaises(RuntimeError, setattr, collection, 'threaded', True)
+
+        collection.handle(0.0)
+        adapter.handle.assert_called_once_with(0.0)
+
+        collection.disconnect()
+
+        self.assertFalse(collection.is_connected('foo'))
+        assertRaisesNothing(self, setattr, collection, 'threaded', True)
+
+    def test_socket_servers_can_be_skipped(self):
+        class SocketAdapter(DummyAdapter):
+            socket_server = None
+
+        socket_adapter = SocketAdapter('foo')
+        socket_adapter.handle = Mock()
+        socket_adapter.socket_server = Mock()
+
+        other_adapter = DummyAdapter('bar')
+        other_adapter.handle = Mock()
+
+        collection = AdapterCollection(socket_adapter, other_adapter)
+        self.assertEqual(collection.socket_servers, [])
+
+        collection.threaded = False
+        collection.connect()
+
+        self.assertEqual(collection.socket_servers, [socket_adapter.socket_server])
+
+        collection.handle(0.0, skip_socket_servers=True)
+
+        socket_adapter.handle.assert_not_called()
+        other_adapter.handle.assert_called_once_with(0.0)
+
+        collection.disconnect()
+
+    def test_statistics(self):
+        adapter = DummyAdapter('foo')
+
+        collection = AdapterCollection(adapter)
+        collection.threaded = False
+        collection.connect()
+
+        collection.handle(0.0)
+
+        with adapter.device_lock:
+            pass
+
+        statistics = collection.statistics()
+
+        self.assertEqual(set(statistics.keys()), {'foo'})
+        self.assertEqual(statistics['foo']['handle']['count'], 1)
+        self.assertEqual(statistics['foo']['lock_wait']['count'], 1)
+        self.assertEqual(statistics['foo']['lock_hold']['count'], 1)
+
+        collection.disconnect()
@@ -18,7 +18,7 @@
 # *********************************************************************
 
 import unittest
-from mock import patch
+from mock import Mock, patch
 
 from utils import assertRaisesNothing, TestWithPackageStructure
 from types import ModuleType
@@ -26,7 +26,7 @@ from uuid import uuid4
 
 from lewis.adapters.stream import StreamInterface
 from lewis.core.devices import is_device, DeviceRegistry, DeviceBuilder, DeviceBase, \
-    is_interface, InterfaceBase
+    is_interface, InterfaceBase, DevicePool
 from lewis.core.exceptions import LewisException
 from lewis.devices import Device, StateMachineDevice
 
@@ -56,6 +56,43 @@ class TestIsDevice(unittest.TestCase):
         self.assertTrue(is_device(DummyStatemachineDevice))
 
 
+class TestDeviceChangeTracking(unittest.TestCase):
+    def test_changed_members_are_tracked(self):
+        device = Device()
+        self.assertEqual(device._get_changed_members(0), set())
+
+        device._mark_changed('speed', 'position')
+        generation = device._change_generation
+
+        device._mark_processed()
+        device._mark_changed('speed')
+
+        self.assertEqual(device._get_changed_members(0), {'speed', 'position'})
+        self.assertEqual(device._get_changed_members(generation), {'speed'})
+        self.assertEqual(device._get_changed_members(device._change_generation), set())
+
+    def test_unspecific_change_marks_all_members(self):
+        device = Device()
+        device._mark_changed('speed')
+        device._mark_changed()
+
+        self.assertIsNone(device._get_changed_members(1))
+        self.assertEqual(device._get_changed_members(device._change_generation), set())
+
+    def test_processing_does_not_mark_members(self):
+        device = Device()
+        device._mark_processed()
+
+        self.assertEqual(device._change_generation, 1)
+        self.assertEqual(device._get_changed_members(0), set())
+
+    def test_change_tracking_is_not_part_of_snapshot(self):
+        device = Device()
+        device._mark_changed('speed')
+
+        self.assertEqual(device._get_snapshot(), {})
+
+
 class TestDeviceBuilderSimpleModule(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
@@ -289,3 +326,62 @@ class TestIsInterface(unittest.TestCase):
             pass
 
         self.assertTrue(is_interface(DummyInterface))
+
+
+class TestInterfaceBase(unittest.TestCase):
+    def test_set_device_with_binding(self):
+        interface = InterfaceBase()
+        interface._bind_device = Mock()
+        interface._apply_binding = Mock()
+
+        interface.device = 'foo'
+        interface._bind_device.assert_called_once_with()
+
+        interface.set_device('bar', binding='binding')
+        self.assertEqual(interface.device, 'bar')
+        interface._apply_binding.assert_called_once_with('binding')
+        interface._bind_device.assert_called_once_with()
+
+
+class TestDevicePool(unittest.TestCase):
+    def setUp(self):
+        self.builder = Mock()
+        self.builder.create_device.side_effect = lambda setup: Mock(setup=setup)
+
+        self.interface = Mock(protocol='stream')
+        self.interface._create_binding.side_effect = lambda device: device.setup
+
+    def test_take(self):
+        pool = DevicePool(self.builder, ['a', 'b'], [self.interface])
+        pool.fill(background=False)
+
+        self.assertEqual(set(pool.ready), {'a', 'b'})
+
+        with patch.object(pool, 'fill') as fill_mock:
+            device, bindings = pool.take('a')
+            fill_mock.assert_called_once_with()
+
+        self.assertEqual(device.setup, 'a')
+        self.assertEqual(bindings, {'stream': 'a'})
+        self.assertEqual(pool.ready, ['b'])
+        self.assertIsNone(pool.take('a'))
+
+        pool.fill(background=False)
+        self.assertEqual(set(pool.ready), {'a', 'b'})
+
+    def test_failing_setup_is_removed(self):
+        self.builder.create_device.side_effect = LewisException('Invalid setup')
+
+        pool = DevicePool(self.builder, ['a'])
+        pool.fill(background=False)
+
+        self.assertEqual(pool.setups, [])
+        self.assertIsNone(pool.take('a'))
+
+    def test_fill_in_background(self):
+        pool = DevicePool(self.builder, ['a'], [self.interface])
+        pool.fill()
+        pool._thread.join()
+
+        self.assertEqual(pool.ready, ['a'])
+        self.assertIsNone(pool._thread)
@@ -0,0 +1,436 @@
+# -*- coding: utf-8 -*-
+# *********************************************************************
+# lewis - a library for creating hardware device simulators
+# Copyright (C) 2016-2017 European Spallation Source ERIC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# *********************************************************************
+
+import asyncore
+import socket
+import sys
+import threading
+import time
+import unittest
+
+from mock import Mock, call, patch
+
+from utils import assertRaisesNothing
+
+from lewis.adapters.stream import StreamAdapter, StreamInterface, Var, asyncio
+from lewis.core.exceptions import LewisException
+from lewis.core.fleet import (SimulationHost, SimulationSupervisor, RoutingObjectCollection,
+                              create_fleet, _CombinedSocketMap, _run_worker)
+from lewis.core.simulation import Simulation
+from lewis.devices import Device
+
+
+class DummyDevice(Device):
+    speed = 1
+
+
+class DummyStreamInterface(StreamInterface):
+    commands = {
+        Var('speed', read_pattern=r'^S\?$', write_pattern=r'^S=([0-9]+)$',
+            argument_mappings=(int,)),
+    }
+
+
+class TestCreateFleet(unittest.TestCase):
+    def test_simulations_are_created(self):
+        factory = Mock()
+
+        simulations = create_fleet({
+            'devices': {
+                'a': {'device': 'chopper', 'cycle_delay': 0.5, 'speed': 2.0,
+                      'idle_cycles': 5},
+                'b': {'device': 'linkam_t95', 'setup': 'default',
+                      'protocols': {'stream': {'port': 9998}}},
+                'c': {'device': 'chopper', 'protocols': {}},
+            }}, factory)
+
+        self.assertEqual(set(simulations.keys()), {'a', 'b', 'c'})
+        self.assertEqual(simulations['a'].cycle_delay, 0.5)
+        self.assertEqual(simulations['a'].speed, 2.0)
+        self.assertEqual(simulations['a'].idle_cycles, 5)
+
+        factory.create.assert_any_call('chopper', None, {None: {}})
+        factory.create.assert_any_call('linkam_t95', 'default', {'stream': {'port': 9998}})
+        factory.create.assert_any_call('chopper', None, {})
+
+    def test_invalid_descriptions(self):
+        factory = Mock()
+
+        self.assertRaises(LewisException, create_fleet, None, factory)
+        self.assertRaises(LewisException, create_fleet, {'devices': {}}, factory)
+        self.assertRaises(LewisException, create_fleet, {'devices': {'a': {}}}, factory)
+        self.assertRaises(LewisException, create_fleet,
+                          {'devices': {'a': {'device': 'chopper', 'foo': 2}}}, factory)
+        self.assertRaises(LewisException, create_fleet,
+                          {'devices': {'a:b': {'device': 'chopper'}}}, factory)
+
+        factory.create.assert_not_called()
+
+
+class TestSimulationHost(unittest.TestCase):
+    def setUp(self):
+        patcher = patch('lewis.core.fleet.sleep')
+        self.addCleanup(patcher.stop)
+        self.mock_sleep = patcher.start()
+
+    def _create_simulation(self):
+        simulation = Simulation(device=Mock())
+        simulation.cycle_delay = 0.0
+
+        return simulation
+
+    def test_simulations_are_processed_until_stopped(self):
+        simulations = {'a': self._create_simulation(), 'b': self._create_simulation()}
+        host = SimulationHost(simulations)
+
+        def stop_after_three_cycles(dt):
+            if simulations['a'].cycles == 2:
+                host.stop()
+
+        simulations['a']._device.process.side_effect = stop_after_three_cycles
+
+        host.start()
+
+        self.assertEqual(simulations['a'].cycles, 3)
+        self.assertEqual(simulations['b'].cycles, 3)
+
+        for simulation in simulations.values():
+            self.assertFalse(simulation.is_started)
+            self.assertFalse(simulation._adapters.threaded)
+
+        self.assertFalse(host.is_started)
+
+    def test_failing_simulation_is_stopped(self):
+        simulations = {'a': self._create_simulation(), 'b': self._create_simulation()}
+        host = SimulationHost(simulations)
+
+        simulations['a']._device.process.side_effect = RuntimeError('Device failure')
+
+        def stop_after_three_cycles(dt):
+            if simulations['b'].cycles == 2:
+                host.stop()
+
+        simulations['b']._device.process.side_effect = stop_after_three_cycles
+
+        host.start()
+
+        self.assertEqual(simulations['a'].cycles, 0)
+        self.assertEqual(simulations['b'].cycles, 3)
+
+    def test_host_ends_when_all_simulations_are_stopped(self):
+        simulation = self._create_simulation()
+        simulation._device.process.side_effect = lambda dt: simulation.stop()
+
+        host = SimulationHost({'a': simulation})
+        host.start()
+
+        self.assertEqual(simulation.cycles, 1)
+        self.assertFalse(simulation.is_started)
+
+    def test_only_one_simulation_may_use_adapter_that_is_limited_per_process(self):
+        def create_simulation(one_per_process):
+            return Simulation(device=Mock(), adapters=(
+                Mock(protocol='epics', one_per_process=one_per_process),))
+
+        assertRaisesNothing(self, SimulationHost, {
+            'a': create_simulation(True), 'b': create_simulation(False),
+            'c': create_simulation(False)})
+
+        self.assertRaises(LewisException, SimulationHost, {
+            'a': create_simulation(True), 'b': create_simulation(True)})
+
+    @patch('lewis.core.fleet.asyncore')
+    def test_sockets_of_all_simulations_are_polled_together(self, asyncore_mock):
+        servers = [Mock(socket_map={1: 'a'}), Mock(socket_map={2: 'b', 3: 'c'})]
+        servers[0].get_timeout.side_effect = lambda timeout: min(timeout, 0.5)
+        servers[1].get_timeout.side_effect = lambda timeout: min(timeout, 0.2)
+
+        simulations = [Mock(), Mock()]
+        simulations[0]._adapters.socket_servers = [servers[0]]
+        simulations[1]._adapters.socket_servers = [servers[1]]
+
+        SimulationHost._poll_sockets(simulations, 1.0)
+
+        (timeout,), kwargs = asyncore_mock.loop.call_args
+        self.assertEqual(asyncore_mock.loop.call_count, 1)
+        self.assertEqual(timeout, 0.2)
+        self.assertEqual(dict(kwargs['map'].items()), {1: 'a', 2: 'b', 3: 'c'})
+
+        for server in servers:
+            server.process_pending.assert_called_once_with()
+
+        self.mock_sleep.assert_not_called()
+
+    @patch('lewis.core.fleet.asyncore')
+    def test_asyncio_servers_are_run_on_shared_loop(self, asyncore_mock):
+        loop = Mock()
+        servers = [Mock(socket_map=None, loop=loop), Mock(socket_map=None, loop=loop),
+                   Mock(socket_map={1: 'a'})]
+
+        for server in servers:
+            server.get_timeout.side_effect = lambda timeout: timeout
+
+        simulation = Mock()
+        simulation._adapters.socket_servers = servers
+
+        SimulationHost._poll_sockets([simulation], 0.3)
+
+        loop.call_later.assert_called_once_with(0.3, loop.stop)
+        loop.run_forever.assert_called_once_with()
+
+        # The asyncore sockets are only polled, waiting happens in the event loop
+        (timeout,), kwargs = asyncore_mock.loop.call_args
+        self.assertEqual(timeout, 0.0)
+        self.assertEqual(dict(kwargs['map'].items()), {1: 'a'})
+
+        for server in servers:
+            server.process_pending.assert_called_once_with()
+
+        self.mock_sleep.assert_not_called()
+
+    @patch('lewis.core.fleet.asyncore')
+    def test_host_sleeps_without_sockets(self, asyncore_mock):
+        simulation = Mock()
+        simulation._adapters.socket_servers = []
+
+        SimulationHost._poll_sockets([simulation], 0.3)
+
+        asyncore_mock.loop.assert_not_called()
+        self.mock_sleep.assert_called_once_with(0.3)
+
+    @patch('lewis.core.fleet.ControlServer')
+    def test_control_server_namespaces(self, control_server_mock):
+        SimulationHost({'a': self._create_simulation(), 'b': self._create_simulation()},
+                       control_server='127.0.0.1:10000')
+
+        object_map, connection_string = control_server_mock.call_args[0]
+
+        self.assertEqual(connection_string, '127.0.0.1:10000')
+        self.assertEqual(set(object_map.keys()),
+                         {'a.device', 'a.simulation', 'a.interface',
+                          'b.device', 'b.simulation', 'b.interface'})
+
+
+@unittest.skipIf(asyncio is None, 'The asyncio backend is not available.')
+class TestSimulationHostWithAsyncioServers(unittest.TestCase):
+    def _create_simulation(self):
+        adapter = StreamAdapter(
+            options={'backend': 'asyncio', 'bind_address': '127.0.0.1', 'port': 0})
+        adapter.interface = DummyStreamInterface()
+
+        simulation = Simulation(device=DummyDevice(), adapters=(adapter,))
+        adapter.interface.device = simulation._device
+
+        return simulation, adapter
+
+    def test_stream_devices_are_served_from_one_event_loop(self):
+        simulations, adapters = zip(*[self._create_simulation() for _ in range(2)])
+        host = SimulationHost(dict(zip('ab', simulations)))
+
+        host_thread = threading.Thread(target=host.start)
+        host_thread.start()
+
+        try:
+            deadline = time.time() + 5.0
+            while not all(adapter.socket_server for adapter in adapters):
+                self.assertLess(time.time(), deadline)
+                time.sleep(0.01)
+
+            servers = [adapter.socket_server for adapter in adapters]
+            self.assertIs(servers[0].loop, servers[1].loop)
+
+            for index, server in enumerate(servers):
+                address = server._servers[0].sockets[0].getsockname()
+                client = socket.create_connection(address, timeout=5.0)
+
+                try:
+                    client.sendall('S={}\rS?\r'.format(index + 5).encode())
+                    self.assertEqual(client.recv(16), '{}\r'.format(index + 5).encode())
+                finally:
+                    client.close()
+
+            self.assertEqual([simulation._device.speed for simulation in simulations], [5, 6])
+        finally:
+            host.stop()
+            host_thread.join(5.0)
+
+        self.assertFalse(host.is_started)
+        self.assertTrue(servers[0].loop.is_closed())
+
+
+class TestCombinedSocketMap(unittest.TestCase):
+    class Reader(asyncore.dispatcher):
+        def __init__(self, sock, socket_map):
+            asyncore.dispatcher.__init__(self, sock=sock, map=socket_map)
+            self.received = b''
+
+        def writable(self):
+            return False
+
+        def handle_read(self):
+            self.received += self.recv(1024)
+
+    def test_sockets_of_all_maps_are_polled(self):
+        socket_maps = [{}, {}]
+        pairs = [socket.socketpair() for _ in socket_maps]
+        readers = [self.Reader(sock, socket_map)
+                   for (sock, _), socket_map in zip(pairs, socket_maps)]
+
+        try:
+            for index, (_, other) in enumerate(pairs):
+                other.send(str(index).encode())
+
+            combined = _CombinedSocketMap(socket_maps)
+            self.assertEqual(len(combined), 2)
+
+            asyncore.loop(1.0, count=1, map=combined)
+
+            self.assertEqual([reader.received for reader in readers], [b'0', b'1'])
+        finally:
+            for reader, (_, other) in zip(readers, pairs):
+                reader.close()
+                other.close()
+
+        self.assertFalse(_CombinedSocketMap(socket_maps))
+
+    def test_removed_sockets_are_not_found(self):
+        socket_maps = [{1: 'a'}, {2: 'b'}]
+        combined = _CombinedSocketMap(socket_maps)
+
+        del socket_maps[1][2]
+
+        self.assertEqual(combined.get(1), 'a')
+        self.assertIsNone(combined.get(2))
+
+
+class TestRoutingObjectCollection(unittest.TestCase):
+    def test_calls_are_forwarded(self):
+        collection = RoutingObjectCollection(
+            {'a': ('127.0.0.1', 10100), 'a.b': ('127.0.0.1', 10101)})
+
+        with patch.object(collection, '_forward') as forward_mock:
+            collection['a.device.speed:get']()
+            forward_mock.assert_called_once_with(('127.0.0.1', 10100), 'a.device.speed:get')
+
+            forward_mock.reset_mock()
+
+            collection['a.b.simulation.pause']()
+            forward_mock.assert_called_once_with(('127.0.0.1', 10101), 'a.b.simulation.pause')
+
+        self.assertNotIn('c.device.speed:get', collection)
+        self.assertRaises(KeyError, collection.__getitem__, 'c.device.speed:get')
+
+    @patch('lewis.core.fleet.ControlClient')
+    def test_forward_uses_one_client_per_address(self, client_mock):
+        collection = RoutingObjectCollection(
+            {'a': ('127.0.0.1', 10100), 'b': ('127.0.0.1', 10101)}, timeout=100)
+
+        collection['a.device.speed:get']()
+        collection['a.device.speed:set'](3)
+        collection['b.device.speed:get']()
+
+        client_mock.assert_has_calls([call('127.0.0.1', 10100, timeout=100),
+                                      call('127.0.0.1', 10101, timeout=100)], any_order=True)
+        self.assertEqual(client_mock.call_count, 2)
+        client_mock.return_value.request.assert_has_calls(
+            [call('a.device.speed:get'), call('a.device.speed:set', 3),
+             call('b.device.speed:get')])
+
+    def test_get_objects(self):
+        collection = RoutingObjectCollection({'a': ('127.0.0.1', 10100)})
+
+        self.assertEqual(set(collection['get_objects']()),
+                         {'a.device', 'a.simulation', 'a.interface'})
+
+
+class TestSimulationSupervisor(unittest.TestCase):
+    def setUp(self):
+        self.fleet = {'devices': {name: {'device': 'chopper'} for name in 'abcde'}}
+
+    def test_devices_are_distributed(self):
+        supervisor = SimulationSupervisor(self.fleet, 'lewis.devices', workers=2)
+
+        self.assertEqual(supervisor.workers, 2)
+        self.assertEqual(set(supervisor._shards[0]['devices'].keys()), {'a', 'c', 'e'})
+        self.assertEqual(set(supervisor._shards[1]['devices'].keys()), {'b', 'd'})
+
+        self.assertEqual(SimulationSupervisor(self.fleet, 'lewis.devices', workers=8).workers, 5)
+        self.assertRaises(LewisException, SimulationSupervisor, self.fleet, 'lewis.devices', 0)
+
+    def test_epics_devices_are_assigned_to_different_workers(self):
+        for name in 'de':
+            self.fleet['devices'][name]['protocols'] = {'epics': {'prefix': name.upper()}}
+
+        supervisor = SimulationSupervisor(self.fleet, 'lewis.devices', workers=2)
+
+        self.assertEqual(set(supervisor._shards[0]['devices'].keys()), {'d', 'a', 'c'})
+        self.assertEqual(set(supervisor._shards[1]['devices'].keys()), {'e', 'b'})
+
+        self.fleet['devices']['c']['protocols'] = {'epics': {'prefix': 'C'}}
+
+        self.assertRaises(LewisException, SimulationSupervisor, self.fleet, 'lewis.devices', 2)
+
+    @patch('lewis.core.fleet.monotonic', return_value=10.0)
+    @patch('lewis.core.fleet.multiprocessing')
+    def test_terminated_workers_are_restarted(self, multiprocessing_mock, monotonic_mock):
+        supervisor = SimulationSupervisor(self.fleet, 'lewis.devices', workers=2)
+
+        supervisor._start_worker(0)
+        supervisor._start_worker(1)
+
+        process = multiprocessing_mock.Process.return_value
+        process.is_alive.return_value = False
+
+        # Workers are not restarted right after they have been started
+        supervisor._check_workers()
+        self.assertEqual(supervisor.restarts, 0)
+
+        monotonic_mock.return_value = 12.0
+        supervisor._check_workers()
+        self.assertEqual(supervisor.restarts, 2)
+        self.assertEqual(multiprocessing_mock.Process.call_count, 4)
+
+    @patch('lewis.core.fleet.multiprocessing')
+    def test_add_paths_are_passed_to_workers(self, multiprocessing_mock):
+        supervisor = SimulationSupervisor(self.fleet, 'my_devices', workers=2,
+                                          add_paths=['/some/path'])
+
+        supervisor._start_worker(0)
+
+        _, kwargs = multiprocessing_mock.Process.call_args
+        self.assertIs(kwargs['target'], _run_worker)
+        self.assertEqual(kwargs['args'][1], 'my_devices')
+        self.assertEqual(kwargs['args'][-1], ['/some/path'])
+
+    @patch('lewis.core.fleet.SimulationHost')
+    @patch('lewis.core.fleet.create_fleet')
+    @patch('lewis.core.fleet.SimulationFactory')
+    def test_worker_extends_path_before_creating_fleet(self, factory_mock, create_fleet_mock,
+                                                       host_mock):
+        paths_at_creation = []
+        factory_mock.side_effect = lambda *args: paths_at_creation.extend(sys.path)
+
+        with patch.object(sys, 'path', ['/a']):
+            _run_worker(self.fleet, 'my_devices', None, '127.0.0.1:10100', 0.01,
+                        ['/a', '/some/path'])
+
+            self.assertEqual(sys.path, ['/a', '/some/path'])
+
+        self.assertEqual(paths_at_creation, ['/a', '/some/path'])
+        host_mock.return_value.start.assert_called_once_with()
@@ -0,0 +1,483 @@
+# -*- coding: utf-8 -*-
+# *********************************************************************
+# lewis - a library for creating hardware device simulators
+# Copyright (C) 2016-2017 European Spallation Source ERIC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# *********************************************************************
+
+import sys
+import unittest
+import zlib
+from array import array
+from threading import Lock
+from mock import Mock, patch
+
+from lewis.adapters.epics import PV, WaveformPV, EpicsInterface, PropertyExposingDriver, \
+    _get_array_key
+from lewis.core.devices import DevicePool
+from lewis.core.simulation import Simulation
+from lewis.devices import Device
+
+
+class DummyDevice(Device):
+    speed = 1.0
+    high_limit = 10.0
+
+    @property
+    def calc(self):
+        return self.speed * 2
+
+
+class DummyInterface(EpicsInterface):
+    @property
+    def interface_calc(self):
+        return self.device.speed * 3
+
+
+class TrackingInterface(DummyInterface):
+    change_tracking = True
+
+    pvs = {
+        'SPEED': PV('speed'),
+        'CALC': PV('calc', poll_interval=0.0),
+    }
+
+
+class PollingInterface(DummyInterface):
+    pvs = {
+        'SLOW': PV('speed', poll_interval=1.0),
+        'FAST': PV('calc', poll_interval=0.5),
+    }
+
+
+class MetaInterface(DummyInterface):
+    pvs = {
+        'SPEED': PV('counted_speed', poll_interval=0.0, meta_data_property='speed_meta'),
+    }
+
+    evaluations = 0
+
+    @property
+    def counted_speed(self):
+        self.evaluations += 1
+        return self.device.speed
+
+    @property
+    def speed_meta(self):
+        return {'hihi': self.device.high_limit}
+
+
+class WaveformDevice(Device):
+    def __init__(self):
+        super(WaveformDevice, self).__init__()
+
+        self.versioned = bytearray(4)
+        self.version = 0
+        self.unversioned = bytearray(4)
+
+
+class WaveformInterface(EpicsInterface):
+    pvs = {
+        'VERSIONED': WaveformPV('versioned', 4, poll_interval=0.0, version_property='version'),
+        'UNVERSIONED': WaveformPV('unversioned', 4, poll_interval=0.0),
+    }
+
+
+def create_driver(interface):
+    """
+    Returns a PropertyExposingDriver for the interface that does not require pcaspy, the
+    values that are published via setParam are stored in the params-dict of the driver.
+    """
+    with patch('lewis.adapters.epics.Driver.__init__', return_value=None):
+        driver = PropertyExposingDriver(interface, Lock())
+
+    driver.params = {}
+    driver.getParam = Mock(side_effect=lambda pv: driver.params.get(pv))
+    driver.setParam = Mock(side_effect=driver.params.__setitem__)
+    driver.setParamInfo = Mock()
+    driver.updatePVs = Mock()
+    driver._get_param_info = Mock(return_value={})
+
+    return driver
+
+
+class TestBoundPVDependencies(unittest.TestCase):
+    def setUp(self):
+        self.device = DummyDevice()
+        self.interface = DummyInterface()
+
+    def _bind(self, pv):
+        return pv.bind(self.interface, self.device)
+
+    def test_plain_attribute_depends_on_itself(self):
+        self.assertEqual(self._bind(PV('speed')).depends_on, ('speed',))
+
+    def test_properties_are_polled(self):
+        self.assertEqual(self._bind(PV('calc')).depends_on, ())
+        self.assertEqual(self._bind(PV('interface_calc')).depends_on, ())
+
+    def test_explicit_dependencies(self):
+        self.assertEqual(self._bind(PV('calc', depends_on=['speed'])).depends_on, ('speed',))
+        self.assertEqual(self._bind(PV('speed', depends_on=())).depends_on, ())
+
+
+class TestPVBinding(unittest.TestCase):
+    def test_binding_does_not_modify_pv(self):
+        pv = PV('calc', meta_data_property='speed_meta')
+        attributes = dict(vars(pv))
+
+        bound = pv.bind(MetaInterface(), DummyDevice())
+
+        self.assertEqual(vars(pv), attributes)
+        self.assertEqual(bound.value, 2.0)
+
+    def test_read_only_is_determined_per_binding(self):
+        pv = PV('calc')
+
+        self.assertTrue(pv.bind(DummyInterface(), DummyDevice()).read_only)
+        self.assertFalse(pv.read_only)
+
+        self.assertFalse(PV('speed').bind(DummyInterface(), DummyDevice()).read_only)
+        self.assertTrue(PV('speed', read_only=True).bind(DummyDevice()).read_only)
+
+    def test_bound_pvs_can_be_read_while_binding(self):
+        pv = PV('speed')
+        bound = pv.bind(DummyDevice())
+        values_during_binding = []
+
+        class ReadingDevice(DummyDevice):
+            def __getattribute__(self, name):
+                if name == 'speed':
+                    values_during_binding.append(bound.value)
+
+                return super(ReadingDevice, self).__getattribute__(name)
+
+        pv.bind(ReadingDevice())
+
+        self.assertEqual(values_during_binding, [1.0])
+
+    def test_pooled_binding_while_values_are_read(self):
+        interface = MetaInterface()
+        interface.pvs = dict(interface.pvs, CALC=PV('calc'), HIGH=PV('high_limit'))
+        interface.device = DummyDevice()
+
+        builder = Mock()
+        builder.create_device.side_effect = lambda setup: DummyDevice()
+
+        pool = DevicePool(builder, [str(setup) for setup in range(500)], [interface])
+
+        # Switch threads often, so that reads happen while the PVs are being bound
+        if hasattr(sys, 'setswitchinterval'):
+            self.addCleanup(sys.setswitchinterval, sys.getswitchinterval())
+            sys.setswitchinterval(1e-6)
+
+        pool.fill()
+
+        errors = []
+
+        while pool._thread is not None:
+            for pv in interface.bound_pvs.values():
+                try:
+                    pv.value
+                    pv.meta
+                except AttributeError as e:
+                    errors.append(e)
+
+        self.assertEqual(len(pool.ready), 500)
+        self.assertEqual(errors, [])
+
+
+class TestPropertyExposingDriverChangeTracking(unittest.TestCase):
+    def setUp(self):
+        self.device = DummyDevice()
+        self.interface = TrackingInterface()
+        self.interface.device = self.device
+
+        self.driver = create_driver(self.interface)
+        self.driver.process_pv_updates(force=True)
+        self.driver.getParam.reset_mock()
+
+    def test_changes_marked_while_collecting_members_are_not_lost(self):
+        get_changed_members = self.device._get_changed_members
+
+        def mark_during_call(generation):
+            changed_members = get_changed_members(generation)
+
+            self.device.speed = 5.0
+            self.device._mark_changed('speed')
+
+            return changed_members
+
+        with patch.object(self.device, '_get_changed_members', side_effect=mark_during_call):
+            self.driver.process_pv_updates()
+
+        self.driver.process_pv_updates()
+
+        self.assertEqual(self.driver.params['SPEED'], 5.0)
+
+    def test_unmarked_changes_are_not_published(self):
+        self.device.speed = 3.0
+        self.driver.process_pv_updates()
+
+        self.assertEqual(self.driver.params['SPEED'], 1.0)
+
+    def test_marked_changes_are_published(self):
+        self.device.speed = 3.0
+        self.device._mark_changed('speed')
+        self.driver.process_pv_updates()
+
+        self.assertEqual(self.driver.params['SPEED'], 3.0)
+
+    def test_marking_other_members_does_not_update_pv(self):
+        self.device._mark_changed('position')
+        self.driver.process_pv_updates()
+
+        self.assertNotIn('SPEED', [args[0] for args, _ in self.driver.getParam.call_args_list])
+
+    def test_unspecific_change_updates_all_pvs(self):
+        self.device.speed = 3.0
+        self.device._mark_changed()
+        self.driver.process_pv_updates()
+
+        self.assertEqual(self.driver.params['SPEED'], 3.0)
+
+    def test_computed_properties_are_polled(self):
+        self.device.speed = 5.0
+        self.driver.process_pv_updates()
+
+        self.assertEqual(self.driver.params['CALC'], 10.0)
+        self.assertEqual(self.driver.params['SPEED'], 1.0)
+
+    def test_parameters_set_via_simulation_are_published(self):
+        self.interface.pvs = dict(self.interface.pvs, DOUBLE=PV(
+            'calc', poll_interval=100.0, depends_on=['speed']))
+        self.interface.device = self.device
+
+        simulation = Simulation(self.device)
+        simulation._running = True
+
+        self.driver.process_pv_updates(force=True)
+
+        simulation.set_device_parameters({'speed': 4.0})
+        simulation._process_device(0.1)
+
+        self.driver.process_pv_updates()
+
+        self.assertEqual(self.driver.params['SPEED'], 4.0)
+        self.assertEqual(self.driver.params['DOUBLE'], 8.0)
+
+
+class TestPropertyExposingDriverPolling(unittest.TestCase):
+    def setUp(self):
+        self.interface = PollingInterface()
+        self.interface.device = DummyDevice()
+
+        self.driver = create_driver(self.interface)
+        self._process_at(0.0, force=True)
+
+    def _process_at(self, now, force=False):
+        self.driver.getParam.reset_mock()
+
+        with patch('lewis.adapters.epics.monotonic', return_value=now):
+            self.driver.process_pv_updates(force=force)
+
+        return sorted(args[0] for args, _ in self.driver.getParam.call_args_list)
+
+    def test_pvs_are_compared_when_poll_interval_has_elapsed(self):
+        self.assertEqual(self._process_at(0.4), [])
+        self.assertEqual(self._process_at(0.5), ['FAST'])
+        self.assertEqual(self._process_at(0.9), [])
+        self.assertEqual(self._process_at(1.0), ['FAST', 'SLOW'])
+
+    def test_pvs_are_rescheduled_relative_to_previous_deadline(self):
+        self.assertEqual(self._process_at(0.6), ['FAST'])
+        self.assertEqual(self._process_at(1.0), ['FAST', 'SLOW'])
+
+    def test_pvs_that_have_fallen_behind_are_rescheduled_relative_to_now(self):
+        self.assertEqual(self._process_at(10.2), ['FAST', 'SLOW'])
+        self.assertEqual(self._process_at(10.5), [])
+        self.assertEqual(self._process_at(10.7), ['FAST'])
+        self.assertEqual(self._process_at(11.2), ['FAST', 'SLOW'])
+
+    def test_changed_values_are_published(self):
+        self.interface.device.speed = 4.0
+
+        self._process_at(0.5)
+        self.assertEqual(self.driver.params, {'SLOW': 1.0, 'FAST': 8.0})
+
+        self._process_at(1.0)
+        self.assertEqual(self.driver.params, {'SLOW': 4.0, 'FAST': 8.0})
+
+    def test_forced_update_reschedules_all_pvs(self):
+        self._process_at(0.8, force=True)
+
+        self.assertEqual(self._process_at(1.0), [])
+        self.assertEqual(self._process_at(1.3), ['FAST'])
+        self.assertEqual(self._process_at(1.8), ['FAST', 'SLOW'])
+
+    def test_device_exchange_updates_all_pvs(self):
+        new_device = DummyDevice()
+        new_device.speed = 7.0
+        self.interface.device = new_device
+
+        self.assertEqual(self._process_at(0.1), ['FAST', 'SLOW'])
+        self.assertEqual(self.driver.params, {'SLOW': 7.0, 'FAST': 14.0})
+
+        self.assertEqual(self._process_at(0.5), [])
+        self.assertEqual(self._process_at(0.6), ['FAST'])
+
+
+class TestPropertyExposingDriverSnapshots(unittest.TestCase):
+    def setUp(self):
+        self.interface = MetaInterface()
+        self.interface.device = DummyDevice()
+
+        self.driver = create_driver(self.interface)
+
+    def test_each_pv_is_evaluated_once_per_update(self):
+        self.driver.process_pv_updates(force=True)
+        self.assertEqual(self.interface.evaluations, 1)
+
+        self.interface.device.speed = 2.0
+        self.driver.process_pv_updates()
+
+        self.assertEqual(self.interface.evaluations, 2)
+        self.assertEqual(self.driver.params['SPEED'], 2.0)
+
+    def test_meta_is_only_published_on_change(self):
+        self.driver.process_pv_updates(force=True)
+        self.driver.setParamInfo.assert_called_once_with('SPEED', {'hihi': 10.0})
+
+        self.driver.setParamInfo.reset_mock()
+        self.driver.process_pv_updates()
+        self.driver.setParamInfo.assert_not_called()
+
+        self.interface.device.high_limit = 20.0
+        self.driver.process_pv_updates()
+        self.driver.setParamInfo.assert_called_once_with('SPEED', {'hihi': 20.0})
+
+        self.driver._get_param_info.assert_not_called()
+
+    def test_meta_is_compared_to_server_before_first_publication(self):
+        self.driver._get_param_info.return_value = {'hihi': 10.0}
+
+        self.driver.process_pv_updates()
+        self.driver.process_pv_updates()
+
+        self.assertEqual(self.driver._get_param_info.call_count, 1)
+        self.driver.setParamInfo.assert_not_called()
+
+
+class TestPropertyExposingDriverWaveforms(unittest.TestCase):
+    def setUp(self):
+        self.device = WaveformDevice()
+        self.interface = WaveformInterface()
+        self.interface.device = self.device
+
+        self.driver = create_driver(self.interface)
+        self.driver.process_pv_updates(force=True)
+        self.driver.setParam.reset_mock()
+
+    def _published_pvs(self):
+        self.driver.setParam.reset_mock()
+        self.driver.process_pv_updates()
+
+        return sorted(args[0] for args, _ in self.driver.setParam.call_args_list)
+
+    def test_arrays_are_not_compared_to_server(self):
+        self.assertEqual(self._published_pvs(), [])
+        self.driver.getParam.assert_not_called()
+
+    def test_versioned_array_is_published_when_version_changes(self):
+        self.device.versioned[0] = 1
+        self.assertEqual(self._published_pvs(), [])
+
+        self.device.version += 1
+        self.assertEqual(self._published_pvs(), ['VERSIONED'])
+        self.assertEqual(bytearray(self.driver.params['VERSIONED']), bytearray([1, 0, 0, 0]))
+
+        self.assertEqual(self._published_pvs(), [])
+
+    def test_unversioned_array_is_published_when_data_changes(self):
+        self.device.unversioned[2] = 5
+        self.assertEqual(self._published_pvs(), ['UNVERSIONED'])
+        self.assertEqual(bytearray(self.driver.params['UNVERSIONED']), bytearray([0, 0, 5, 0]))
+
+        self.assertEqual(self._published_pvs(), [])
+
+    def test_changed_array_is_published_while_lock_is_held(self):
+        lock_states = []
+        self.driver.setParam.side_effect = \
+            lambda pv, value: lock_states.append(self.driver._device_lock.locked())
+
+        self.device.unversioned[0] = 1
+        self.driver.process_pv_updates()
+
+        self.assertEqual(lock_states, [True])
+        self.driver.setParam.assert_called_once_with('UNVERSIONED', self.device.unversioned)
+
+    def test_written_array_is_not_published_again(self):
+        self.driver.write('UNVERSIONED', bytearray([1, 2, 3, 4]))
+
+        self.assertEqual(self.device.unversioned, bytearray([1, 2, 3, 4]))
+        self.assertEqual(self._published_pvs(), [])
+
+
+class TestGetArrayKey(unittest.TestCase):
+    def test_key_changes_with_data(self):
+        data = array('d', [1.0, 2.0, 3.0])
+        key = _get_array_key(data)
+
+        self.assertEqual(_get_array_key(array('d', [1.0, 2.0, 3.0])), key)
+
+        data[1] = 4.0
+        self.assertNotEqual(_get_array_key(data), key)
+
+    def test_non_contiguous_buffer(self):
+        view = memoryview(bytearray([1, 2, 3, 4]))[::2]
+
+        self.assertEqual(_get_array_key(view), _get_array_key(bytearray([1, 3])))
+
+    def test_python_2_uses_copy_of_data(self):
+        data = array('d', [1.0, 2.0, 3.0])
+        key = _get_array_key(data)
+
+        with patch('lewis.adapters.epics.PY2', True), \
+                patch('lewis.adapters.epics.zlib.crc32', side_effect=zlib.crc32) as crc32:
+            self.assertEqual(_get_array_key(data), key)
+
+        self.assertIsInstance(crc32.call_args[0][0], bytes)
+
+    def test_sequences_without_buffer_are_converted_to_tuple(self):
+        self.assertEqual(_get_array_key([1, 2, 3]), (1, 2, 3))
+
+
+class TestPropertyExposingDriverWrite(unittest.TestCase):
+    def test_device_is_marked_changed_before_lock_is_released(self):
+        interface = TrackingInterface()
+        interface.device = DummyDevice()
+
+        driver = create_driver(interface)
+        lock = driver._device_lock
+
+        events = []
+        interface.device._mark_changed = lambda: events.append(('mark', lock.locked()))
+        driver._request_cycle = lambda: events.append(('cycle', lock.locked()))
+
+        self.assertTrue(driver.write('SPEED', 4.0))
+
+        self.assertEqual(interface.device.speed, 4.0)
+        self.assertEqual(driver.params['SPEED'], 4.0)
+        self.assertEqual(events, [('mark', True), ('cycle', False)])
@@ -17,11 +17,16 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 # *********************************************************************
 
+import time
 import unittest
+from threading import Event, Lock, Thread
 
 from mock import Mock, MagicMock, patch, call, ANY
 
+from lewis.core.adapters import TimedLock
 from lewis.core.simulation import Simulation
+from lewis.core.utils import ReadWriteLock, RollingStatistics
+from lewis.devices import Device
 from utils import assertRaisesNothing
 
 
@@ -134,6 +139,314 @@ class TestSimulation(unittest.TestCase):
         self.assertEqual(env.cycles, 1)
         self.assertEqual(env.runtime, 1.0)
 
+    @patch('lewis.core.simulation.monotonic')
+    def test_fixed_rate_sleeps_for_remaining_period(self, monotonic_mock):
+        env = Simulation(device=Mock())
+        env.cycle_delay = 0.1
+        env.fixed_rate = True
+
+        monotonic_mock.return_value = 0.0
+        env._wait_for_next_cycle()
+        self.mock_sleep.assert_called_once_with(0.1)
+
+        self.mock_sleep.reset_mock()
+
+        # Processing the previous cycle took 0.05 s, only the rest of the period is left
+        monotonic_mock.return_value = 0.15
+        env._wait_for_next_cycle()
+
+        self.assertAlmostEqual(self.mock_sleep.call_args[0][0], 0.05)
+        self.assertEqual(env.overruns, 0)
+
+    @patch('lewis.core.simulation.monotonic')
+    def test_fixed_rate_drops_missed_cycles(self, monotonic_mock):
+        env = Simulation(device=Mock())
+        env.cycle_delay = 0.1
+        env.fixed_rate = True
+
+        for now in (0.0, 0.15):
+            monotonic_mock.return_value = now
+            env._wait_for_next_cycle()
+
+        self.mock_sleep.reset_mock()
+
+        # Next cycle was due at 0.3, two and a half periods too late
+        monotonic_mock.return_value = 0.55
+        env._wait_for_next_cycle()
+
+        self.mock_sleep.assert_not_called()
+        self.assertEqual(env.overruns, 1)
+
+        # The schedule continues on the next period boundary
+        monotonic_mock.return_value = 0.58
+        env._wait_for_next_cycle()
+
+        self.assertAlmostEqual(self.mock_sleep.call_args[0][0], 0.02)
+        self.assertEqual(env.overruns, 1)
+
+    @patch('lewis.core.simulation.monotonic')
+    def test_fixed_rate_catches_up_missed_cycles(self, monotonic_mock):
+        env = Simulation(device=Mock())
+        env.cycle_delay = 0.1
+        env.fixed_rate = True
+        env.overrun_policy = 'catch_up'
+
+        for now in (0.0, 0.15):
+            monotonic_mock.return_value = now
+            env._wait_for_next_cycle()
+
+        self.mock_sleep.reset_mock()
+
+        # Cycles due at 0.3, 0.4 and 0.5 are processed without waiting
+        for now in (0.55, 0.56, 0.57):
+            monotonic_mock.return_value = now
+            env._wait_for_next_cycle()
+
+        self.mock_sleep.assert_not_called()
+        self.assertEqual(env.overruns, 3)
+
+        monotonic_mock.return_value = 0.58
+        env._wait_for_next_cycle()
+
+        self.assertAlmostEqual(self.mock_sleep.call_args[0][0], 0.02)
+
+    def test_virtual_time_advances_in_fixed_steps(self):
+        device_mock = Mock()
+        env = Simulation(device=device_mock)
+        env.cycle_delay = 0.5
+        env.virtual_time = True
+        set_simulation_running(env)
+
+        env._adapters.wait_for_lock_requests = Mock()
+
+        delta = env._process_cycle(0.0)
+        self.assertEqual(delta, 0.5)
+
+        env._process_cycle(delta)
+        device_mock.assert_has_calls([call.process(0.0), call._mark_processed(),
+                                      call.process(0.5), call._mark_processed()])
+        self.assertEqual(env.runtime, 0.5)
+
+        # No waiting for the next cycle, only adapters waiting for the lock go first
+        self.mock_sleep.assert_not_called()
+        self.assertEqual(env._adapters.wait_for_lock_requests.call_count, 2)
+
+    def test_virtual_time_lets_adapters_acquire_lock(self):
+        env = Simulation(device=Mock())
+        env.virtual_time = True
+        set_simulation_running(env)
+
+        device_lock = env._adapters.device_lock
+        adapter_lock = TimedLock(device_lock, RollingStatistics(), RollingStatistics(),
+                                 env._adapters._lock_requests)
+        release = Event()
+
+        def adapter_request():
+            with adapter_lock:
+                release.wait(1.0)
+
+        device_lock.acquire()
+
+        adapter_thread = Thread(target=adapter_request)
+        adapter_thread.start()
+
+        # Wait for the adapter thread to block on the lock
+        while not env._adapters._lock_requests._pending:
+            time.sleep(0.001)
+
+        device_lock.release()
+
+        # After waiting for the next cycle the adapter must hold the lock
+        env._wait_for_next_cycle()
+        adapter_holds_lock = not device_lock.acquire(False)
+
+        if not adapter_holds_lock:
+            device_lock.release()
+
+        release.set()
+        adapter_thread.join()
+
+        self.assertTrue(adapter_holds_lock)
+
+    def test_start_stops_after_duration(self):
+        env = Simulation(device=Mock())
+        env.cycle_delay = 0.5
+        env.virtual_time = True
+
+        env.start(duration=10.0)
+
+        self.assertFalse(env.is_started)
+        self.assertEqual(env.runtime, 10.0)
+        self.assertEqual(env.cycles, 21)
+
+    def test_stats(self):
+        env = Simulation(device=Mock())
+        set_simulation_running(env)
+
+        env._process_cycle(0.5)
+        env._process_cycle(0.5)
+
+        stats = env.stats
+
+        self.assertEqual(stats['cycle']['count'], 2)
+        self.assertEqual(stats['process']['count'], 2)
+        self.assertEqual(stats['lock_wait']['count'], 2)
+        self.assertEqual(stats['adapters'], {})
+
+        env.pause()
+        env._process_cycle(0.5)
+
+        self.assertEqual(env.stats['cycle']['count'], 3)
+        self.assertEqual(env.stats['process']['count'], 2)
+
+    def test_read_write_lock(self):
+        self.assertNotIsInstance(Simulation(device=Mock())._adapters.device_lock, ReadWriteLock)
+        self.assertIsInstance(
+            Simulation(device=Mock(), read_write_lock=True)._adapters.device_lock, ReadWriteLock)
+
+    def test_wake_on_write_ends_waiting_early(self):
+        env = Simulation(device=Mock())
+        env.cycle_delay = 0.5
+        env.wake_on_write = True
+        env.min_wake_interval = 0.02
+
+        env._adapters.cycle_request.set()
+        env._wait_for_next_cycle()
+
+        # Only the minimum interval is spent sleeping, the rest is spent waiting for a request
+        self.mock_sleep.assert_called_once_with(0.02)
+
+        set_simulation_running(env)
+        env._process_device(0.1)
+
+        self.assertFalse(env._adapters.cycle_request.is_set())
+
+    @patch('lewis.core.simulation.monotonic')
+    def test_wake_on_write_does_not_shift_fixed_rate_schedule(self, monotonic_mock):
+        env = Simulation(device=Mock())
+        env.cycle_delay = 0.1
+        env.fixed_rate = True
+        env.wake_on_write = True
+        env.min_wake_interval = 0.0
+
+        monotonic_mock.return_value = 0.0
+        env._wait_for_next_cycle()
+
+        env._adapters.cycle_request.set()
+        monotonic_mock.return_value = 0.12
+        env._wait_for_next_cycle()
+        env._adapters.cycle_request.clear()
+
+        # The next regular cycle is still due at 0.2
+        self.assertAlmostEqual(env._next_cycle, 0.2)
+
+        monotonic_mock.return_value = 0.199
+        env._wait_for_next_cycle()
+
+        self.assertAlmostEqual(env._next_cycle, 0.3)
+
+    def test_idle_after_quiet_cycles(self):
+        device_mock = Mock()
+        device_mock._csm.state = 'idle'
+
+        env = Simulation(device=device_mock)
+        env.idle_cycles = 2
+        env.idle_cycle_delay = 2.0
+        set_simulation_running(env)
+
+        for _ in range(3):
+            env._process_device(0.1)
+
+        self.assertTrue(env.is_idle)
+
+        # While idle, waiting ends when an adapter requests a cycle
+        with patch.object(env._adapters, '_cycle_request') as cycle_request_mock:
+            env.min_wake_interval = 0.0
+            env._wait_for_next_cycle()
+            cycle_request_mock.wait.assert_called_once_with(2.0)
+
+        # A write request from an adapter restores the full rate
+        env._adapters.cycle_request.set()
+        env._process_device(0.1)
+        self.assertFalse(env.is_idle)
+
+        for _ in range(2):
+            env._process_device(0.1)
+
+        self.assertTrue(env.is_idle)
+
+        # So does a change of state
+        device_mock._csm.state = 'moving'
+        env._process_device(0.1)
+        self.assertFalse(env.is_idle)
+
+    def test_idle_disabled_by_default(self):
+        env = Simulation(device=Mock())
+        set_simulation_running(env)
+
+        for _ in range(10):
+            env._process_device(0.1)
+
+        self.assertFalse(env.is_idle)
+
+        self.assertRaises(ValueError, setattr, env, 'idle_cycles', -1)
+        self.assertRaises(ValueError, setattr, env, 'idle_cycle_delay', -1.0)
+
+    def test_min_wake_interval(self):
+        env = Simulation(device=Mock())
+
+        assertRaisesNothing(self, setattr, env, 'min_wake_interval', 0.0)
+        self.assertRaises(ValueError, setattr, env, 'min_wake_interval', -1.0)
+
+    def test_snapshot_restore(self):
+        class TestDevice(object):
+            def _get_snapshot(self):
+                return {'temperature': self.temperature}
+
+            def _restore_snapshot(self, snapshot):
+                self.temperature = snapshot['temperature']
+
+        device = TestDevice()
+        device.temperature = 20.0
+
+        env = Simulation(device=device)
+        env._adapters.device_lock = MagicMock()
+
+        snapshot_id = env.snapshot()
+        self.assertEqual(env.snapshots, [snapshot_id])
+
+        device.temperature = 30.0
+        env.restore(snapshot_id)
+
+        self.assertEqual(device.temperature, 20.0)
+        self.assertEqual(env._adapters.device_lock.__enter__.call_count, 2)
+
+        # A snapshot can not be restored to a different type of device
+        env._device = Mock()
+        self.assertRaises(RuntimeError, env.restore, snapshot_id)
+
+        env.delete_snapshot(snapshot_id)
+        self.assertEqual(env.snapshots, [])
+        self.assertRaises(RuntimeError, env.restore, snapshot_id)
+
+    def test_snapshot_fails_for_unserializable_data(self):
+        device = Mock()
+        device._get_snapshot.return_value = {'lock': Lock()}
+
+        env = Simulation(device=device)
+
+        self.assertRaises(RuntimeError, env.snapshot)
+        self.assertEqual(env.snapshots, [])
+
+    def test_overrun_policy(self):
+        env = Simulation(device=Mock())
+
+        self.assertEqual(env.overrun_policy, 'drop')
+        assertRaisesNothing(self, setattr, env, 'overrun_policy', 'catch_up')
+        self.assertEqual(env.overrun_policy, 'catch_up')
+
+        self.assertRaises(ValueError, setattr, env, 'overrun_policy', 'invalid')
+
     def test_None_control_server_is_None(self):
         env = Simulation(device=Mock(), control_server=None)
 
@@ -248,7 +561,7 @@ class TestSimulation(unittest.TestCase):
         self.assertRaises(RuntimeError, setattr, env, 'control_server', '127.0.0.1:10003')
 
     def test_set_parameters(self):
-        class TestDevice(object):
+        class TestDevice(Device):
             foo = 10
             bar = 'str'
 
@@ -267,6 +580,17 @@ class TestSimulation(unittest.TestCase):
         self.assertRaises(RuntimeError, sim.set_device_parameters, {'not_existing': 45})
         self.assertRaises(RuntimeError, sim.set_device_parameters, {'baz': 4})
 
+    def test_set_parameters_marks_device_changed_under_lock(self):
+        device = Mock(foo=10)
+        sim = Simulation(device=device)
+        lock = sim._adapters.device_lock
+
+        device._mark_changed.side_effect = lambda *members: self.assertTrue(lock.locked())
+
+        sim.set_device_parameters({'foo': 5})
+
+        device._mark_changed.assert_called_once_with('foo')
+
     def test_setups_empty(self):
         sim = Simulation(device=Mock(), device_builder=None)
 
@@ -297,3 +621,37 @@ class TestSimulation(unittest.TestCase):
 
         self.assertEqual(sim._device, 'foo')
         self.assertRaises(RuntimeError, sim.switch_setup, 'bar')
+
+    def test_switch_setup_uses_pool(self):
+        builder = Mock()
+        builder.setups = {'foo': None}
+
+        with patch('lewis.core.simulation.DevicePool') as pool_type_mock:
+            sim = Simulation(device=Mock(), device_builder=builder, pooled_setups=['foo'])
+
+        pool_mock = pool_type_mock.return_value
+        pool_mock.fill.assert_called_once_with()
+        pool_mock.take.return_value = ('pooled_device', {'stream': 'binding'})
+
+        with patch.object(sim._adapters, 'set_device') as set_device_mock:
+            sim.switch_setup('foo')
+
+            set_device_mock.assert_called_once_with('pooled_device', {'stream': 'binding'})
+
+        self.assertEqual(sim._device, 'pooled_device')
+        builder.create_device.assert_not_called()
+
+    def test_switch_setup_binds_device_under_lock(self):
+        builder = Mock()
+        builder.setups = {'foo': None}
+
+        sim = Simulation(device=Mock(), device_builder=builder)
+        lock = sim._adapters.device_lock
+
+        with patch.object(sim._adapters, 'set_device') as set_device_mock:
+            set_device_mock.side_effect = lambda *args: self.assertTrue(lock.locked())
+            sim.switch_setup('foo')
+
+            set_device_mock.assert_called_once_with(builder.create_device.return_value, None)
+
+        self.assertRaises(ValueError, Simulation, device=Mock(), pooled_setups=['foo'])
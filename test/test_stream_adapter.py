@@ -0,0 +1,789 @@
+# -*- coding: utf-8 -*-
+# *********************************************************************
+# lewis - a library for creating hardware device simulators
+# Copyright (C) 2016-2017 European Spallation Source ERIC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# *********************************************************************
+
+import errno
+import os
+import re
+import shutil
+import socket
+import tempfile
+import unittest
+from threading import Lock
+from mock import Mock, patch
+
+from lewis.adapters.stream import Cmd, Var, Func, CommandIndex, StreamInterface, \
+    StreamAdapter, StreamHandlerBase, StreamServer, AsyncioStreamServer, TerminatorFraming, \
+    TimeoutFraming, FixedLengthFraming, LengthFieldFraming, asyncio, asyncore, pty, \
+    _get_literal_prefix, _has_top_level_alternation
+from lewis.core.exceptions import LewisException
+from lewis.core.logging import has_log
+from lewis.core.simulation import Simulation
+from lewis.devices import Device
+
+
+class DummyDevice(Device):
+    speed = 1
+
+
+class DummyInterface(StreamInterface):
+    commands = [
+        Var('speed', read_pattern=r'^S\?$', write_pattern=r'^S=([0-9]+)$',
+            argument_mappings=(int,)),
+        Cmd('fail', r'^F$', read_only=True),
+    ]
+
+    def fail(self):
+        raise RuntimeError('Failure')
+
+    def handle_error(self, request, error):
+        return 'ERR {}'.format(error)
+
+
+@has_log
+class DummyHandler(StreamHandlerBase):
+    """
+    Minimal handler that processes requests without a connection.
+    """
+
+    def __init__(self, target):
+        self._target = target
+        self._stream_server = Mock(device_lock=Lock())
+        self._framing = target.get_framing()
+        self._buffer = bytearray()
+
+
+class TestLiteralPrefix(unittest.TestCase):
+    def _prefix(self, pattern, flags=0):
+        return _get_literal_prefix(re.compile(pattern, flags))
+
+    def test_literals(self):
+        self.assertEqual(self._prefix(b'^ABC$'), b'ABC')
+        self.assertEqual(self._prefix(b'ABC'), b'ABC')
+        self.assertEqual(self._prefix(b'^T=([0-9]+)$'), b'T=')
+        self.assertEqual(self._prefix(b'^.*'), b'')
+
+    def test_escapes(self):
+        self.assertEqual(self._prefix(b'^S\\?$'), b'S?')
+        self.assertEqual(self._prefix(b'^A\\.B\\|C'), b'A.B|C')
+        self.assertEqual(self._prefix(b'^A\\d+'), b'A')
+        self.assertEqual(self._prefix(b'^\\w'), b'')
+
+    def test_optional_literals(self):
+        self.assertEqual(self._prefix(b'^AB?C'), b'A')
+        self.assertEqual(self._prefix(b'^AB*C'), b'A')
+        self.assertEqual(self._prefix(b'^AB{0,2}C'), b'A')
+        self.assertEqual(self._prefix(b'^AB+C'), b'AB')
+        self.assertEqual(self._prefix(b'^A(B)?C'), b'A')
+        self.assertEqual(self._prefix(b'^A\\??B'), b'A')
+
+    def test_alternation(self):
+        self.assertEqual(self._prefix(b'^AB|^CD'), b'')
+        self.assertEqual(self._prefix(b'AB|AC'), b'')
+        self.assertEqual(self._prefix(b'^A(B|C)'), b'A')
+        self.assertEqual(self._prefix(b'^(AB|CD)'), b'')
+
+    def test_flags(self):
+        self.assertEqual(self._prefix(b'^AB', re.IGNORECASE), b'')
+        self.assertEqual(self._prefix(b'(?i)^AB'), b'')
+        self.assertEqual(self._prefix(b'(?x)^A B'), b'')
+
+    def test_top_level_alternation(self):
+        self.assertTrue(_has_top_level_alternation('A|B'))
+        self.assertTrue(_has_top_level_alternation('(A)|B'))
+        self.assertFalse(_has_top_level_alternation('A(B|C)'))
+        self.assertFalse(_has_top_level_alternation('A\\|B'))
+        self.assertFalse(_has_top_level_alternation('A[|]B'))
+        self.assertFalse(_has_top_level_alternation('A[]|]B'))
+        self.assertFalse(_has_top_level_alternation('A[^]|]B'))
+        self.assertFalse(_has_top_level_alternation('A[\\]|]B'))
+
+
+class TestCommandIndex(unittest.TestCase):
+    def test_first_matching_command_is_used(self):
+        commands = [
+            Func(lambda: 1, '^AB$'),
+            Func(lambda: 2, '^.*$'),
+            Func(lambda arg: 3, '^A(.*)$'),
+            Func(lambda: 4, '^B$'),
+        ]
+
+        index = CommandIndex(commands)
+
+        self.assertEqual(index.find(b'AB'), (commands[0], ()))
+        self.assertEqual(index.find(b'AC'), (commands[1], ()))
+        self.assertEqual(index.find(b'B'), (commands[1], ()))
+        self.assertEqual(index.find(b'X'), (commands[1], ()))
+
+    def test_commands_with_prefix_are_only_tried_for_matching_requests(self):
+        commands = [
+            Func(lambda arg: 1, '^A(.*)$'),
+            Func(lambda: 2, '^AB$'),
+            Func(lambda: 3, '^BC$'),
+        ]
+
+        index = CommandIndex(commands)
+
+        self.assertEqual(index.find(b'AB'), (commands[0], (b'B',)))
+        self.assertEqual(index.find(b'BC'), (commands[2], ()))
+        self.assertEqual(index.find(b'BD'), (None, None))
+        self.assertEqual(index.find(b'C'), (None, None))
+        self.assertEqual(index.find(b''), (None, None))
+
+    def test_commands_without_prefix_keep_their_position(self):
+        commands = [
+            Func(lambda: 1, '^(?:X|AB)$'),
+            Func(lambda: 2, '^AB$'),
+        ]
+
+        index = CommandIndex(commands)
+
+        self.assertEqual(index.find(b'AB'), (commands[0], ()))
+        self.assertEqual(index.find(b'X'), (commands[0], ()))
+
+
+class TestHandleRequests(unittest.TestCase):
+    def setUp(self):
+        self.interface = DummyInterface()
+        self.interface.device = DummyDevice()
+
+        self.handler = DummyHandler(self.interface)
+
+    def test_batch_is_processed_in_order(self):
+        replies = self.handler._handle_requests([b'S?', b'S=5', b'S?'])
+
+        self.assertEqual(replies, ['1', None, '5'])
+        self.assertEqual(self.interface.device.speed, 5)
+
+    def test_errors_only_affect_their_request(self):
+        replies = self.handler._handle_requests([b'S=3', b'F', b'X', b'S?'])
+
+        self.assertEqual(replies, [None, 'ERR Failure',
+                                   'ERR None of the device\'s commands matched.', '3'])
+
+    def test_cycle_is_only_requested_after_modifications(self):
+        self.handler._handle_requests([b'S?', b'F'])
+        self.handler._stream_server.request_cycle.assert_not_called()
+
+        self.handler._handle_requests([b'S?', b'S=2'])
+        self.handler._stream_server.request_cycle.assert_called_once_with()
+
+    def test_device_is_marked_changed_before_lock_is_released(self):
+        lock = self.handler._stream_server.device_lock
+        events = []
+
+        self.interface.device._mark_changed = lambda: events.append(('mark', lock.locked()))
+        self.handler._stream_server.request_cycle.side_effect = \
+            lambda: events.append(('cycle', lock.locked()))
+
+        self.handler._handle_requests([b'S=2', b'S?'])
+
+        self.assertEqual(events, [('mark', True), ('cycle', False)])
+
+    def test_cached_replies_are_not_used_after_write(self):
+        self.interface.commands = [
+            Var('speed', read_pattern=r'^S\?$', write_pattern=r'^S=([0-9]+)$',
+                argument_mappings=(int,), cached=True)]
+        self.interface.device = DummyDevice()
+
+        self.assertEqual(self.handler._handle_requests([b'S?']), ['1'])
+
+        self.interface.device.speed = 7
+        self.assertEqual(self.handler._handle_requests([b'S?']), ['1'])
+
+        self.assertEqual(self.handler._handle_requests([b'S=4', b'S?']), [None, '4'])
+        self.assertEqual(self.handler._handle_requests([b'S?']), ['4'])
+
+    def test_commands_are_looked_up_again_after_rebinding(self):
+        new_device = DummyDevice()
+        new_device.speed = 9
+
+        interface = self.interface
+        lock = Lock()
+
+        class RebindingLock(object):
+            """Binds the interface to another device right before the lock is acquired."""
+
+            def __enter__(self):
+                if interface.device is not new_device:
+                    interface.device = new_device
+
+                lock.acquire()
+
+            def __exit__(self, exc_type, exc_val, exc_tb):
+                lock.release()
+
+        self.handler._stream_server.device_lock = RebindingLock()
+
+        self.assertEqual(self.handler._handle_requests([b'S=4']), [None])
+        self.assertEqual(new_device.speed, 4)
+        self.assertEqual(self.handler._handle_requests([b'S?']), ['4'])
+
+    def test_cached_replies_are_not_used_after_control_server_write(self):
+        self.interface.commands = [Var('speed', read_pattern=r'^S\?$', cached=True)]
+        self.interface.device = DummyDevice()
+
+        simulation = Simulation(self.interface.device)
+        set_device_parameters = simulation._create_exposed_objects()['simulation'][
+            'set_device_parameters']
+
+        self.assertEqual(self.handler._handle_requests([b'S?']), ['1'])
+
+        set_device_parameters({'speed': 42})
+        self.assertEqual(self.handler._handle_requests([b'S?']), ['42'])
+
+
+class TestFraming(unittest.TestCase):
+    def test_terminator_framing(self):
+        framing = TerminatorFraming('\r\n', '\n')
+
+        self.assertEqual(framing.split(bytearray(b'A\r\nBC\r\nD\r')), ([b'A', b'BC'], 7))
+        self.assertEqual(framing.split(bytearray(b'A\r')), ([], 0))
+        self.assertEqual(framing.split(bytearray(b'\r\n')), ([b''], 2))
+        self.assertEqual(framing.frame_reply(b'X'), b'X\n')
+
+    def test_timeout_framing(self):
+        framing = TimeoutFraming('\r')
+
+        self.assertTrue(framing.read_timeout_completes_frame)
+        self.assertEqual(framing.split(bytearray(b'A\rB')), ([], 0))
+        self.assertEqual(framing.frame_reply(b'X'), b'X\r')
+
+    def test_fixed_length_framing(self):
+        framing = FixedLengthFraming(3)
+
+        self.assertFalse(framing.read_timeout_completes_frame)
+        self.assertEqual(framing.split(bytearray(b'abcdefgh')), ([b'abc', b'def'], 6))
+        self.assertEqual(framing.split(bytearray(b'ab')), ([], 0))
+        self.assertEqual(framing.frame_reply(b'xyz'), b'xyz')
+
+        self.assertRaises(ValueError, FixedLengthFraming, 0)
+
+    def test_length_field_framing(self):
+        framing = LengthFieldFraming(size=2, byteorder='little')
+
+        self.assertEqual(framing.split(bytearray(b'\x02\x00ab\x01\x00c\x05\x00de')),
+                         ([b'ab', b'c'], 7))
+        self.assertEqual(framing.split(bytearray(b'\x02')), ([], 0))
+        self.assertEqual(framing.split(bytearray(b'\x00\x00')), ([b''], 2))
+        self.assertEqual(framing.frame_reply(b'abc'), b'\x03\x00abc')
+
+        self.assertEqual(LengthFieldFraming(size=2).frame_reply(b'abc'), b'\x00\x03abc')
+
+    def test_length_field_framing_with_adjustment(self):
+        framing = LengthFieldFraming(size=1, adjustment=-1)
+
+        self.assertEqual(framing.split(bytearray(b'\x03ab\x02c\x04d')), ([b'ab', b'c'], 5))
+        self.assertEqual(framing.split(bytearray(b'\x00\x01a')), ([b'', b''], 2))
+        self.assertEqual(framing.frame_reply(b'ab'), b'\x03ab')
+
+    def test_length_field_framing_validates_format(self):
+        self.assertRaises(ValueError, LengthFieldFraming, size=3)
+        self.assertRaises(ValueError, LengthFieldFraming, byteorder='middle')
+
+    def test_partial_frames_remain_in_buffer(self):
+        interface = DummyInterface()
+        interface.framing = LengthFieldFraming()
+
+        handler = DummyHandler(interface)
+
+        self.assertEqual(handler._receive(b'\x02a'), [])
+        self.assertEqual(handler._receive(b'b\x01'), [b'ab'])
+        self.assertEqual(handler._receive(b'c'), [b'c'])
+        self.assertEqual(handler._buffer, bytearray())
+
+
+class TestSerialTiming(unittest.TestCase):
+    def setUp(self):
+        self.interface = DummyInterface()
+        self.handler = DummyHandler(self.interface)
+
+    def test_reply_not_delayed_by_default(self):
+        self.assertFalse(self.handler._reply_is_delayed())
+
+    def test_reply_delay(self):
+        self.interface.reply_delay = 10
+
+        self.assertTrue(self.handler._reply_is_delayed())
+        self.assertAlmostEqual(self.handler._get_send_time(b'abcde', 1.0), 1.01)
+
+    def test_baud_rate(self):
+        self.interface.baud_rate = 1000
+
+        self.assertTrue(self.handler._reply_is_delayed())
+        self.assertAlmostEqual(self.handler._get_send_time(b'abcde', 1.0), 1.05)
+
+    def test_replies_are_transmitted_one_after_the_other(self):
+        self.interface.reply_delay = 10
+        self.interface.baud_rate = 1000
+
+        self.assertAlmostEqual(self.handler._get_send_time(b'abcde', 1.0), 1.06)
+        self.assertAlmostEqual(self.handler._get_send_time(b'abcde', 1.0), 1.11)
+
+        # The line is free again, so only delay and transmission time count
+        self.assertAlmostEqual(self.handler._get_send_time(b'abcde', 2.0), 2.06)
+
+    def test_replies_are_framed_and_joined(self):
+        self.assertEqual(self.handler._format_replies(['A', None, 'B']), b'A\rB\r')
+        self.assertEqual(self.handler._format_replies([None]), b'')
+
+
+@unittest.skipIf(asyncore is None, 'The asyncore backend is not available.')
+class TestStreamServerTimers(unittest.TestCase):
+    def setUp(self):
+        self.server = StreamServer('127.0.0.1', 0, DummyInterface(), Lock())
+
+    def tearDown(self):
+        self.server.close()
+
+    @patch('lewis.adapters.stream.monotonic')
+    def test_get_timeout(self, monotonic_mock):
+        monotonic_mock.return_value = 10.0
+
+        self.assertEqual(self.server.get_timeout(0.1), 0.1)
+
+        self.server.call_at(10.05, Mock())
+        self.assertAlmostEqual(self.server.get_timeout(0.1), 0.05)
+        self.assertEqual(self.server.get_timeout(0.01), 0.01)
+
+        self.server.call_at(9.0, Mock())
+        self.assertEqual(self.server.get_timeout(0.1), 0.0)
+
+    @patch('lewis.adapters.stream.monotonic')
+    def test_process_pending_runs_due_timers_in_order(self, monotonic_mock):
+        calls = []
+
+        self.server.call_at(3.0, calls.append, 'c')
+        self.server.call_at(1.0, calls.append, 'a')
+        self.server.call_at(2.0, calls.append, 'b1')
+        self.server.call_at(2.0, calls.append, 'b2')
+
+        monotonic_mock.return_value = 0.5
+        self.server.process_pending()
+        self.assertEqual(calls, [])
+
+        monotonic_mock.return_value = 2.0
+        self.server.process_pending()
+        self.assertEqual(calls, ['a', 'b1', 'b2'])
+
+        monotonic_mock.return_value = 5.0
+        self.server.process_pending()
+        self.assertEqual(calls, ['a', 'b1', 'b2', 'c'])
+        self.assertEqual(self.server.get_timeout(0.1), 0.1)
+
+    @patch('lewis.adapters.stream.monotonic')
+    def test_timers_scheduled_by_callbacks(self, monotonic_mock):
+        monotonic_mock.return_value = 1.0
+        calls = []
+
+        def reschedule():
+            calls.append('first')
+            self.server.call_at(1.0, calls.append, 'second')
+
+        self.server.call_at(1.0, reschedule)
+        self.server.process_pending()
+
+        self.assertEqual(calls, ['first', 'second'])
+
+    def test_close_discards_timers(self):
+        callback = Mock()
+        self.server.call_at(0.0, callback)
+
+        self.server.close()
+        self.server.process_pending()
+
+        callback.assert_not_called()
+
+
+def query(server, client, request, expected_length):
+    """
+    Sends a request via the non-blocking client socket and lets the server handle it until
+    at least ``expected_length`` bytes have been received or about two seconds have passed.
+    """
+    client.sendall(request)
+
+    reply = b''
+    for _ in range(40):
+        server.handle(0.05)
+
+        try:
+            reply += client.recv(1024)
+        except socket.error:
+            pass
+
+        if len(reply) >= expected_length:
+            break
+
+    return reply
+
+
+class TestStreamAdapterEndpoints(unittest.TestCase):
+    def test_invalid_endpoints_raise(self):
+        self.assertRaises(LewisException, StreamAdapter, options={'endpoints': ['9998']})
+        self.assertRaises(LewisException, StreamAdapter,
+                          options={'endpoints': [{'port': 9998, 'terminator': '\n'}]})
+        self.assertRaises(LewisException, StreamAdapter,
+                          options={'endpoints': [{'telnet_mode': True}]})
+
+    def test_endpoint_framing(self):
+        adapter = StreamAdapter(options={'bind_address': '127.0.0.1', 'reuse_port': False})
+        adapter.interface = DummyInterface()
+        adapter.interface.out_terminator = '\n'
+
+        plain = adapter._create_endpoint({'port': 9998})
+        self.assertIsNone(plain.framing)
+        self.assertEqual(plain.address, ('127.0.0.1', 9998))
+
+        telnet = adapter._create_endpoint({'port': 9998, 'telnet_mode': True})
+        self.assertEqual(telnet.framing.split(bytearray(b'A\rB\r\n')), ([b'A\rB'], 5))
+        self.assertEqual(telnet.framing.frame_reply(b'A'), b'A\r\n')
+
+        overridden = adapter._create_endpoint(
+            {'bind_address': '::1', 'port': 9998, 'in_terminator': '\n'})
+        self.assertEqual(overridden.address, ('::1', 9998))
+        self.assertEqual(overridden.framing.split(bytearray(b'A\n')), ([b'A'], 2))
+        self.assertEqual(overridden.framing.frame_reply(b'A'), b'A\n')
+
+
+@unittest.skipIf(asyncore is None, 'The asyncore backend is not available.')
+class TestStreamServerEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.adapter = StreamAdapter(options={
+            'backend': 'asyncore', 'bind_address': '127.0.0.1', 'port': 0,
+            'endpoints': [{'port': 0, 'telnet_mode': True}]})
+        self.adapter.interface = DummyInterface()
+        self.adapter.interface.device = DummyDevice()
+        self.adapter.device_lock = Lock()
+        self.adapter.start_server()
+
+        self.clients = []
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+
+        self.adapter.stop_server()
+
+    def _connect(self, listener_index):
+        address = self.adapter.socket_server._listeners[listener_index].socket.getsockname()
+
+        client = socket.create_connection(address, timeout=1.0)
+        client.setblocking(False)
+        self.clients.append(client)
+
+        return client
+
+    def test_endpoints_use_their_framing(self):
+        default_client = self._connect(0)
+        telnet_client = self._connect(1)
+
+        self.assertEqual(query(self.adapter, default_client, b'S?\r', 2), b'1\r')
+        self.assertEqual(query(self.adapter, telnet_client, b'S=4\r\nS?\r\n', 3), b'4\r\n')
+        self.assertEqual(query(self.adapter, default_client, b'S?\r', 2), b'4\r')
+
+
+@unittest.skipIf(asyncio is None, 'The asyncio backend is not available.')
+class TestAsyncioStreamServer(unittest.TestCase):
+    def setUp(self):
+        self.interface = DummyInterface()
+        self.interface.device = DummyDevice()
+        self.request_cycle = Mock()
+
+        self.server = AsyncioStreamServer('127.0.0.1', 0, self.interface, Lock(),
+                                          self.request_cycle)
+
+        address = self.server._servers[0].sockets[0].getsockname()
+        self.client = socket.create_connection(address, timeout=1.0)
+        self.client.setblocking(False)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.close()
+
+    def test_requests_are_processed(self):
+        self.assertEqual(query(self.server, self.client, b'S?\rF\r', 10), b'1\rERR Failure\r')
+        self.request_cycle.assert_not_called()
+
+        self.assertEqual(query(self.server, self.client, b'S=3\rS?\r', 2), b'3\r')
+        self.assertEqual(self.interface.device.speed, 3)
+        self.request_cycle.assert_called_once_with()
+
+    def test_partial_requests_are_buffered(self):
+        self.client.sendall(b'S')
+        self.server.handle(0.01)
+        self.assertRaises(socket.error, self.client.recv, 1024)
+
+        self.assertEqual(query(self.server, self.client, b'?\r', 2), b'1\r')
+
+    def test_read_timeout(self):
+        self.interface.readtimeout = 50
+
+        self.assertEqual(query(self.server, self.client, b'S', 1),
+                         b'ERR ReadTimeout while waiting for command terminator.\r')
+
+    def test_delayed_replies(self):
+        self.interface.reply_delay = 100
+
+        self.client.sendall(b'S?\r')
+        self.server.handle(0.05)
+        self.assertRaises(socket.error, self.client.recv, 1024)
+
+        self.assertEqual(query(self.server, self.client, b'', 2), b'1\r')
+
+
+class ConnectionLimitTests(object):
+    """
+    Tests for the client limit and idle timeout, which are run for both server backends.
+    """
+
+    def setUp(self):
+        self.interface = DummyInterface()
+        self.interface.device = DummyDevice()
+
+        self.server = None
+        self.clients = []
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+
+        if self.server is not None:
+            self.server.close()
+
+    def _start_server(self, **kwargs):
+        raise NotImplementedError('Tests must create the server.')
+
+    def _get_address(self):
+        raise NotImplementedError('Tests must return the address of the server.')
+
+    def _connect(self):
+        client = socket.create_connection(self._get_address(), timeout=1.0)
+        client.setblocking(False)
+        self.clients.append(client)
+
+        return client
+
+    def _is_closed(self, client, cycles=40):
+        """
+        Lets the server handle events until the client connection has been closed by the
+        server, at most ``cycles`` times.
+        """
+        for _ in range(cycles):
+            self.server.handle(0.05)
+
+            try:
+                if client.recv(1024) == b'':
+                    return True
+            except socket.error as e:
+                if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return True
+
+        return False
+
+    def test_connections_beyond_max_clients_are_closed(self):
+        self._start_server(max_clients=1)
+
+        first = self._connect()
+        self.assertEqual(query(self.server, first, b'S?\r', 2), b'1\r')
+
+        second = self._connect()
+        self.assertTrue(self._is_closed(second))
+
+        self.assertEqual(query(self.server, first, b'S?\r', 2), b'1\r')
+
+    def test_closed_connections_free_their_slot(self):
+        self._start_server(max_clients=1)
+
+        first = self._connect()
+        self.assertEqual(query(self.server, first, b'S?\r', 2), b'1\r')
+
+        first.close()
+        self.clients.remove(first)
+
+        for _ in range(5):
+            self.server.handle(0.01)
+
+        second = self._connect()
+        self.assertEqual(query(self.server, second, b'S?\r', 2), b'1\r')
+
+    def test_idle_connections_are_closed(self):
+        self._start_server(idle_timeout=0.2)
+
+        client = self._connect()
+        self.assertEqual(query(self.server, client, b'S?\r', 2), b'1\r')
+
+        self.assertFalse(self._is_closed(client, cycles=1))
+        self.assertTrue(self._is_closed(client))
+
+    def test_active_connections_are_kept_open(self):
+        self._start_server(idle_timeout=0.3)
+
+        client = self._connect()
+
+        for _ in range(8):
+            self.assertEqual(query(self.server, client, b'S?\r', 2), b'1\r')
+            self.assertFalse(self._is_closed(client, cycles=2))
+
+
+@unittest.skipIf(asyncore is None, 'The asyncore backend is not available.')
+class TestStreamServerConnectionLimits(ConnectionLimitTests, unittest.TestCase):
+    def _start_server(self, **kwargs):
+        self.server = StreamServer('127.0.0.1', 0, self.interface, Lock(), **kwargs)
+
+    def _get_address(self):
+        return self.server._listeners[0].socket.getsockname()
+
+
+@unittest.skipIf(asyncio is None, 'The asyncio backend is not available.')
+class TestAsyncioStreamServerConnectionLimits(ConnectionLimitTests, unittest.TestCase):
+    def _start_server(self, **kwargs):
+        self.server = AsyncioStreamServer('127.0.0.1', 0, self.interface, Lock(), **kwargs)
+
+    def _get_address(self):
+        return self.server._servers[0].sockets[0].getsockname()
+
+
+class TestStreamAdapterTransports(unittest.TestCase):
+    def test_invalid_transport_options_raise(self):
+        self.assertRaises(LewisException, StreamAdapter, options={'transport': 'udp'})
+        self.assertRaises(LewisException, StreamAdapter, options={'transport': 'unix'})
+        self.assertRaises(LewisException, StreamAdapter, options={'backend': 'twisted'})
+        self.assertRaises(LewisException, StreamAdapter, options={
+            'transport': 'pty', 'endpoints': [{'port': 9998}]})
+
+    @unittest.skipIf(asyncore is None, 'The asyncore backend is not available.')
+    def test_pty_requires_asyncio_backend(self):
+        with patch('lewis.adapters.stream.asyncio', None):
+            self.assertRaises(LewisException, StreamAdapter, options={
+                'backend': 'asyncore', 'transport': 'pty'})
+
+
+@unittest.skipIf(not hasattr(socket, 'AF_UNIX'), 'Unix domain sockets are not available.')
+class TestUnixSocketTransport(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        self.path = os.path.join(directory, 'device.sock')
+
+    def _start_adapter(self, backend):
+        adapter = StreamAdapter(options={
+            'backend': backend, 'transport': 'unix', 'path': self.path})
+        adapter.interface = DummyInterface()
+        adapter.interface.device = DummyDevice()
+        adapter.device_lock = Lock()
+        adapter.start_server()
+
+        self.addCleanup(adapter.stop_server)
+
+        return adapter
+
+    def _connect(self):
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(self.path)
+        client.setblocking(False)
+
+        self.addCleanup(client.close)
+
+        return client
+
+    def _create_stale_socket_file(self):
+        stale_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale_socket.bind(self.path)
+        stale_socket.close()
+
+    def _test_round_trip(self, backend):
+        self._create_stale_socket_file()
+
+        adapter = self._start_adapter(backend)
+
+        self.assertEqual(query(adapter, self._connect(), b'S=3\rS?\r', 2), b'3\r')
+
+        adapter.stop_server()
+        self.assertFalse(os.path.exists(self.path))
+
+    @unittest.skipIf(asyncore is None, 'The asyncore backend is not available.')
+    def test_round_trip_asyncore(self):
+        self._test_round_trip('asyncore')
+
+    @unittest.skipIf(asyncio is None, 'The asyncio backend is not available.')
+    def test_round_trip_asyncio(self):
+        self._test_round_trip('asyncio')
+
+    @unittest.skipIf(asyncio is None, 'The asyncio backend is not available.')
+    def test_other_files_are_not_removed(self):
+        with open(self.path, 'w') as regular_file:
+            regular_file.write('data')
+
+        self.assertRaises(socket.error, self._start_adapter, 'asyncio')
+        self.assertTrue(os.path.isfile(self.path))
+
+
+@unittest.skipIf(pty is None or asyncio is None, 'Pseudo-terminals are not available.')
+class TestPtyTransport(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        self.link = os.path.join(directory, 'ttyDevice')
+
+        # A link that was left behind by a previous simulation is replaced
+        os.symlink(os.path.join(directory, 'missing'), self.link)
+
+        self.adapter = StreamAdapter(options={'transport': 'pty', 'path': self.link})
+        self.adapter.interface = DummyInterface()
+        self.adapter.interface.device = DummyDevice()
+        self.adapter.device_lock = Lock()
+        self.adapter.start_server()
+
+        self.addCleanup(self.adapter.stop_server)
+
+    def _query(self, fd, request, expected_length):
+        os.write(fd, request)
+
+        reply = b''
+        for _ in range(40):
+            self.adapter.handle(0.05)
+
+            try:
+                reply += os.read(fd, 1024)
+            except OSError:
+                pass
+
+            if len(reply) >= expected_length:
+                break
+
+        return reply
+
+    def test_round_trip(self):
+        self.assertEqual(os.path.realpath(self.link), self.adapter._server.device_name)
+
+        fd = os.open(self.link, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+
+        try:
+            self.assertEqual(self._query(fd, b'S=4\rS?\r', 2), b'4\r')
+        finally:
+            os.close(fd)
+
+        self.assertIn('Pseudo-terminal: ' + self.adapter._server.device_name,
+                      self.adapter.documentation)
+
+    def test_link_is_removed_on_stop(self):
+        self.adapter.stop_server()
+
+        self.assertFalse(os.path.lexists(self.link))
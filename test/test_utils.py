@@ -18,16 +18,18 @@
 # *********************************************************************
 
 import importlib
+import threading
 import unittest
 from datetime import datetime
 
 from utils import assertRaisesNothing, TestWithPackageStructure
-from mock import patch
+from mock import patch, Mock
 from six import string_types
 
 from lewis.core.utils import dict_strict_update, extract_module_name, \
     get_submodules, get_members, seconds_since, FromOptionalDependency, \
-    format_doc_text, check_limits, is_compatible_with_framework
+    format_doc_text, check_limits, is_compatible_with_framework, RollingStatistics, \
+    ReadWriteLock, read_lock, ConnectionRegistry, LRUCache
 
 from lewis.core.exceptions import LewisException, LimitViolationException
 
@@ -128,6 +130,176 @@ class TestSecondsSince(unittest.TestCase):
         self.assertRaises(TypeError, seconds_since, None)
 
 
+class TestRollingStatistics(unittest.TestCase):
+    def test_empty(self):
+        self.assertEqual(RollingStatistics().summary(), {'count': 0})
+
+    def test_summary(self):
+        stats = RollingStatistics()
+
+        for value in range(100, 0, -1):
+            stats.add(value)
+
+        self.assertEqual(stats.count, 100)
+        self.assertEqual(stats.summary(), {
+            'count': 100, 'mean': 50.5, 'p50': 50, 'p95': 95, 'p99': 99, 'max': 100})
+
+    def test_only_recent_samples_are_kept(self):
+        stats = RollingStatistics(size=10)
+
+        for value in range(100):
+            stats.add(value)
+
+        summary = stats.summary()
+
+        self.assertEqual(summary['count'], 100)
+        self.assertEqual(summary['p50'], 94)
+        self.assertEqual(summary['max'], 99)
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_values_are_created_once(self):
+        cache = LRUCache()
+        factory = Mock(side_effect=lambda: object())
+
+        first = cache.get('a', factory)
+
+        self.assertIs(cache.get('a', factory), first)
+        factory.assert_called_once_with()
+        self.assertEqual(cache.statistics(), {'hits': 1, 'misses': 1, 'size': 1, 'maxsize': 1024})
+
+    def test_least_recently_used_value_is_discarded(self):
+        cache = LRUCache(maxsize=2)
+
+        cache.get('a', lambda: 1)
+        cache.get('b', lambda: 2)
+        cache.get('a', lambda: 3)
+        cache.get('c', lambda: 4)
+
+        self.assertEqual(cache.get('a', lambda: 5), 1)
+        self.assertEqual(cache.get('b', lambda: 6), 6)
+        self.assertEqual(cache.statistics()['size'], 2)
+
+    def test_clear(self):
+        cache = LRUCache()
+        cache.get('a', lambda: 1)
+        cache.clear()
+
+        self.assertEqual(cache.statistics(), {'hits': 0, 'misses': 0, 'size': 0, 'maxsize': 1024})
+        self.assertEqual(cache.get('a', lambda: 2), 2)
+
+
+class TestConnectionRegistry(unittest.TestCase):
+    def test_add_remove(self):
+        connections = ConnectionRegistry()
+
+        self.assertTrue(connections.add('a'))
+        self.assertTrue(connections.add('b'))
+        self.assertEqual(len(connections), 2)
+        self.assertIn('a', connections)
+
+        connections.remove('a')
+        connections.remove('c')
+
+        self.assertEqual(list(connections), ['b'])
+
+    def test_max_connections(self):
+        connections = ConnectionRegistry(max_connections=2)
+
+        self.assertTrue(connections.add('a'))
+        self.assertFalse(connections.is_full)
+        self.assertTrue(connections.add('b'))
+        self.assertTrue(connections.is_full)
+        self.assertFalse(connections.add('c'))
+
+        connections.remove('a')
+        self.assertTrue(connections.add('c'))
+
+    @patch('lewis.core.utils.monotonic')
+    def test_idle_connections(self, monotonic_mock):
+        connections = ConnectionRegistry(idle_timeout=10.0)
+
+        monotonic_mock.return_value = 100.0
+        connections.add('a')
+        connections.add('b')
+
+        monotonic_mock.return_value = 105.0
+        connections.add('c')
+        connections.touch('a')
+
+        monotonic_mock.return_value = 112.0
+        self.assertEqual(connections.idle_connections(), ['b'])
+
+        monotonic_mock.return_value = 120.0
+        self.assertEqual(connections.idle_connections(), ['b', 'c', 'a'])
+
+    def test_idle_timeout_disabled(self):
+        connections = ConnectionRegistry()
+        connections.add('a')
+
+        self.assertEqual(connections.idle_connections(), [])
+
+
+class TestReadWriteLock(unittest.TestCase):
+    def _acquire_in_thread(self, acquire):
+        acquired = threading.Event()
+
+        def target():
+            acquire()
+            acquired.set()
+
+        thread = threading.Thread(target=target)
+        thread.daemon = True
+        thread.start()
+
+        return acquired
+
+    def test_shared_access_is_concurrent(self):
+        lock = ReadWriteLock()
+
+        with lock.read:
+            self.assertTrue(self._acquire_in_thread(lock.acquire_read).wait(1.0))
+
+    def test_exclusive_access_excludes_all(self):
+        lock = ReadWriteLock()
+
+        with lock:
+            reader = self._acquire_in_thread(lock.acquire_read)
+            writer = self._acquire_in_thread(lock.acquire)
+
+            self.assertFalse(reader.wait(0.05))
+            self.assertFalse(writer.wait(0.05))
+
+        self.assertTrue(reader.wait(1.0) or writer.wait(1.0))
+
+    def test_waiting_writers_take_precedence(self):
+        lock = ReadWriteLock()
+
+        lock.acquire_read()
+
+        writer = self._acquire_in_thread(lock.acquire)
+        self.assertFalse(writer.wait(0.05))
+
+        reader = self._acquire_in_thread(lock.acquire_read)
+        self.assertFalse(reader.wait(0.05))
+
+        lock.release_read()
+
+        self.assertTrue(writer.wait(1.0))
+        self.assertFalse(reader.wait(0.05))
+
+        lock.release()
+
+        self.assertTrue(reader.wait(1.0))
+
+    def test_read_lock(self):
+        lock = ReadWriteLock()
+        plain_lock = threading.Lock()
+
+        self.assertIs(read_lock(lock), lock.read)
+        self.assertIs(read_lock(plain_lock), plain_lock)
+
+
 class TestFromOptionalDependency(unittest.TestCase):
     def test_existing_module_works(self):
         a = FromOptionalDependency('time').do_import('sleep')